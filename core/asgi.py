@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+# load the exercise catalog cache before the first request
+from logger.catalog import warm_catalog  # noqa: E402
+
+warm_catalog()
@@ -39,6 +39,36 @@ CSRF_TRUSTED_ORIGINS = [
 
 N8N_WEBHOOK_URL = 'http://143.198.113.171:5678/webhook/workout-agent'
 
+# Background threads that make the outbound n8n webhook calls for trigger_agent.
+# Jobs are also durable in the AgentJob outbox; `manage.py run_agent_outbox`
+# retries failures and recovers jobs from dead processes. Set
+# AGENT_DISPATCH_INLINE = False to leave all dispatching to that worker.
+AGENT_DISPATCH_WORKERS = 4
+AGENT_DISPATCH_INLINE = True
+AGENT_OUTBOX = {
+    'MAX_ATTEMPTS': 8,
+    'BACKOFF_BASE': 5,
+    'BACKOFF_MAX': 15 * 60,
+    'LEASE_SECONDS': 120,
+}
+
+# Unit workout weights are stored in ('kg' or 'lbs'); the CSV importer converts to it
+WEIGHT_UNIT = 'kg'
+
+# Upper bound on items accepted by /api/create-batch-from-agent/
+AGENT_BATCH_MAX_ITEMS = 10000
+
+# How long (seconds) agent callback responses are kept for replaying retried webhooks
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+# Pooled HTTP client for the n8n agents (see logger/agent_client.py for defaults)
+AGENT_HTTP = {
+    'POOL_MAXSIZE': 8,
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 10,
+    'RETRIES': 2,
+}
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -54,6 +84,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'logger.middleware.SQLInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -90,9 +121,88 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # take the write lock when a transaction starts, not on its first write
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 5,
+        },
+    }
+}
+
+# Optional read replica for analytics reads (progress, history, exports,
+# rollups). Only views marked @allow_stale_reads use it, and never within
+# REPLICA_STICKY_SECONDS of a write to the user's data (logger/routers.py).
+# Locally: ANALYTICS_DB_NAME=replica.sqlite3 plus `manage.py simulate_replica_lag`.
+ANALYTICS_DATABASE = 'analytics'
+if os.environ.get('ANALYTICS_DB_NAME'):
+    DATABASES[ANALYTICS_DATABASE] = {
+        **DATABASES['default'],
+        'NAME': os.environ['ANALYTICS_DB_NAME'],
+        # no transaction_mode: BEGIN IMMEDIATE takes a write lock, which a
+        # query_only connection refuses ("attempt to write a readonly database")
+        'OPTIONS': {
+            'timeout': DATABASES['default']['OPTIONS']['timeout'],
+            'init_command': 'PRAGMA query_only=ON',
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['logger.routers.AnalyticsRouter']
+REPLICA_STICKY_SECONDS = 10
+
+# Applied to every new SQLite connection by logger/sqlite.py (WAL, busy
+# timeout, synchronous=NORMAL, mmap/cache sizes); override individual pragmas here
+SQLITE_PRAGMAS = {}
+
+# Fraction of requests whose SQL is instrumented by logger/middleware.py
+# (query count, SQL time, Server-Timing header, JSON lines on the
+# "logger.sql" logger). A SELECT repeated SQL_N_PLUS_ONE_THRESHOLD times in
+# one request is logged as a likely N+1 with the line of code that issued it.
+# Per-request lines are logged at DEBUG and N+1 suspects at WARNING; lower the
+# "logger.sql" level below to see every sampled request.
+SQL_INSTRUMENTATION_SAMPLE_RATE = 1.0 if DEBUG else 0.05
+SQL_N_PLUS_ONE_THRESHOLD = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'logger.sql': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+
+# Cache
+# Shared across worker processes so cache version keys (e.g. the exercise
+# catalog in logger/catalog.py) stay consistent between them.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.django_cache',
     }
 }
 
+# How often (seconds) each process re-checks the shared catalog version
+CATALOG_CACHE_RECHECK_SECONDS = 2
+
+# Upper bound (seconds) on how long a cached home dashboard is kept; entries
+# are versioned per user, so this only limits storage, not staleness
+DASHBOARD_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+# Share of a set's volume/sets/reps credited to the exercise's primary and
+# secondary muscle groups in the MuscleGroupVolume rollups
+MUSCLE_GROUP_WEIGHTS = {
+    'primary': 1.0,
+    'secondary': 0.5,
+}
+
+# Background threads that generate resized pump pic variants after upload
+# (see logger/images.py); `manage.py process_pictures` backfills the rest
+PICTURE_VARIANT_WORKERS = 2
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -144,3 +254,10 @@ LOGOUT_REDIRECT_URL = 'login'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Pump pics are served by logger.views.serve_media (owner check + caching
+# headers). Set MEDIA_ACCEL to 'nginx' (X-Accel-Redirect to an internal
+# location at MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT) or 'apache'
+# (X-Sendfile) to let the front-end server send the file body.
+MEDIA_ACCEL = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
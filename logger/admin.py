@@ -1,8 +1,10 @@
 from django.contrib import admin
+from django.db import transaction
 from .models import (
     MuscleGroup, Equipment, Exercise, Workout, WorkoutExercise, 
-    MealEntry, DailyLog, BaseExercise, SavedWorkout, UserProfile
+    MealEntry, DailyLog, BaseExercise, SavedWorkout, UserProfile, AgentJob, PersonalRecord
 )
+from .utils import link_meal_to_daily_log, unlink_meal_from_daily_logs
 
 
 # Register your models here.
@@ -32,7 +34,7 @@ class BaseExerciseAdmin(admin.ModelAdmin):
     inlines = [ExerciseInline]
 
     def primary_muscle_group_display(self, obj):
-        return obj.primary_muscle_group.name
+        return obj.primary_muscle_group.name if obj.primary_muscle_group else None
     primary_muscle_group_display.short_description = "Primary Muscle"
 
 
@@ -77,6 +79,25 @@ class MealEntryAdmin(admin.ModelAdmin):
     list_filter = ("date", "user")
     ordering = ("-date",)
 
+    # keep DailyLog macro totals in step with admin edits
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            if change:
+                unlink_meal_from_daily_logs(MealEntry.objects.get(pk=obj.pk))
+            super().save_model(request, obj, form, change)
+            link_meal_to_daily_log(obj)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            unlink_meal_from_daily_logs(obj)
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for meal in queryset:
+                unlink_meal_from_daily_logs(meal)
+            super().delete_queryset(request, queryset)
+
 
 @admin.register(DailyLog)
 class DailyLogAdmin(admin.ModelAdmin):
@@ -87,3 +108,19 @@ class DailyLogAdmin(admin.ModelAdmin):
     search_fields = ("user__username",)
     list_filter = ("date", "user")
     ordering = ("-date",)
+
+
+@admin.register(AgentJob)
+class AgentJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "agent_type", "user", "status", "n8n_status", "created_at")
+    search_fields = ("user__username",)
+    list_filter = ("status", "agent_type")
+    ordering = ("-created_at",)
+
+
+@admin.register(PersonalRecord)
+class PersonalRecordAdmin(admin.ModelAdmin):
+    list_display = ("user", "exercise", "record_type", "value", "weight", "reps", "date")
+    search_fields = ("user__username", "exercise__name")
+    list_filter = ("record_type",)
+    ordering = ("user", "exercise__name")
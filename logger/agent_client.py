@@ -0,0 +1,174 @@
+"""
+Shared HTTP client for calls to the n8n agents.
+
+One pooled, keep-alive requests.Session per process, with bounded connection
+pools per host, separate connect/read timeouts and a jittered retry policy.
+Request, error, retry and latency counters are kept per agent type, and the
+connection pools report how many connections they opened versus requests
+served (see agent_http_stats, shown by /api/cache-stats/ and the
+run_agent_outbox stats lines). Tuned through settings.AGENT_HTTP.
+"""
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+WORKOUT_AGENT_URL = 'http://143.198.113.171:5678/webhook/workout-agent'
+MEAL_AGENT_URL = 'http://143.198.113.171:5678/webhook/meal-agent'
+
+AGENT_URLS = {
+    'workout': WORKOUT_AGENT_URL,
+    'meal': MEAL_AGENT_URL,
+}
+
+DEFAULTS = {
+    'POOL_CONNECTIONS': 4,      # number of per-host pools kept
+    'POOL_MAXSIZE': 8,          # keep-alive connections per host
+    'POOL_BLOCK': True,         # wait for a free connection instead of exceeding POOL_MAXSIZE
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 10,
+    'RETRIES': 2,
+    'BACKOFF_FACTOR': 0.3,
+    'BACKOFF_JITTER': 0.3,
+}
+
+
+_retry_count = threading.local()
+
+
+class CountingRetry(Retry):
+    """Retry policy that counts the retries taken by the current thread's request"""
+
+    def increment(self, *args, **kwargs):
+        new_retry = super().increment(*args, **kwargs)  # raises once retries are exhausted
+        _retry_count.value = getattr(_retry_count, 'value', 0) + 1
+        return new_retry
+
+
+class AgentStats:
+    """Thread-safe request/error/retry/latency counters for one agent type"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, latency, error, retries=0):
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+            self.retries += retries
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'retries': self.retries,
+                'avg_latency_ms': round(self.total_latency / self.requests * 1000, 1) if self.requests else 0.0,
+                'max_latency_ms': round(self.max_latency * 1000, 1),
+            }
+
+
+class AgentClient:
+    def __init__(self, options=None):
+        self.options = {**DEFAULTS, **(options or {})}
+        self.session = requests.Session()
+        retry = CountingRetry(
+            total=self.options['RETRIES'],
+            connect=self.options['RETRIES'],
+            # never replay a POST whose request may already have reached n8n
+            read=0,
+            status=self.options['RETRIES'],
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({'POST'}),
+            backoff_factor=self.options['BACKOFF_FACTOR'],
+            backoff_jitter=self.options['BACKOFF_JITTER'],
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.options['POOL_CONNECTIONS'],
+            pool_maxsize=self.options['POOL_MAXSIZE'],
+            pool_block=self.options['POOL_BLOCK'],
+            max_retries=retry,
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.timeout = (self.options['CONNECT_TIMEOUT'], self.options['READ_TIMEOUT'])
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def _stats_for(self, agent_type):
+        with self._stats_lock:
+            return self._stats.setdefault(agent_type, AgentStats())
+
+    def post(self, agent_type, payload):
+        """
+        POST a payload to the given agent's webhook. Raises requests exceptions
+        like requests.post; non-2xx responses count as errors in the stats.
+        """
+        stats = self._stats_for(agent_type)
+        _retry_count.value = 0
+        started = time.monotonic()
+        try:
+            response = self.session.post(AGENT_URLS[agent_type], json=payload, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            stats.record(time.monotonic() - started, error=True, retries=_retry_count.value)
+            raise
+        stats.record(time.monotonic() - started, error=not response.ok, retries=_retry_count.value)
+        return response
+
+    def stats(self):
+        """{agent_type: {'requests', 'errors', 'retries', 'avg_latency_ms', 'max_latency_ms'}} for this process"""
+        with self._stats_lock:
+            items = list(self._stats.items())
+        return {agent_type: s.snapshot() for agent_type, s in items}
+
+    def pool_stats(self):
+        """Connection pool usage: hosts pooled, connections opened and requests sent over them"""
+        pools = self.session.get_adapter('http://').poolmanager.pools
+        hosts = opened = sent = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue    # evicted since keys() was taken
+            hosts += 1
+            opened += pool.num_connections
+            sent += pool.num_requests
+        return {
+            'hosts': hosts,
+            'maxsize_per_host': self.options['POOL_MAXSIZE'],
+            'connections_opened': opened,
+            'requests': sent,
+            # requests that went out on an already-open keep-alive connection
+            'reused': max(sent - opened, 0),
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_agent_client():
+    """The process-wide AgentClient, built from settings.AGENT_HTTP on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = AgentClient(getattr(settings, 'AGENT_HTTP', None))
+    return _client
+
+
+def agent_http_stats():
+    """Counters of this process's agent client, or {} if it hasn't made a call yet"""
+    if _client is None:
+        return {}
+    return {'agents': _client.stats(), 'pool': _client.pool_stats()}
@@ -0,0 +1,230 @@
+"""
+Background dispatch of agent requests to n8n.
+
+trigger_agent records an AgentJob and returns immediately. The AgentJob table
+is a durable outbox: a job is only handed to n8n after a dispatcher leases it
+with a conditional UPDATE, and failed sends are rescheduled with exponential
+backoff instead of being dropped. Two dispatchers share the outbox:
+
+* the in-process thread pool, which sends a new job as soon as trigger_agent
+  commits (skipped when settings.AGENT_DISPATCH_INLINE is False), and
+* ``manage.py run_agent_outbox``, which drains anything queued, retried or
+  left behind by a dead process once its lease expires.
+
+HTTP goes through the pooled client in agent_client.py. n8n echoes ``job_id``
+back to the create-*-from-agent callbacks, which mark the job completed and
+link what it produced.
+"""
+import logging
+import random
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Avg, Count, F, Min, Q
+from django.utils import timezone
+
+from .agent_client import get_agent_client
+from .models import AgentJob
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_DEFAULTS = {
+    'MAX_ATTEMPTS': 8,
+    'BACKOFF_BASE': 5,        # seconds before the first retry, doubled per attempt
+    'BACKOFF_MAX': 15 * 60,
+    'LEASE_SECONDS': 120,     # must outlast the agent client's timeouts + retries
+}
+
+
+def outbox_option(name):
+    return {**OUTBOX_DEFAULTS, **getattr(settings, 'AGENT_OUTBOX', {})}[name]
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'AGENT_DISPATCH_WORKERS', 4),
+                    thread_name_prefix='agent-dispatch',
+                )
+    return _executor
+
+
+def enqueue_agent_job(job):
+    """
+    Hand a saved AgentJob to the in-process dispatcher once the current
+    transaction commits. The row itself is the durable record; if this process
+    dies first, run_agent_outbox picks it up.
+    """
+    if getattr(settings, 'AGENT_DISPATCH_INLINE', True):
+        transaction.on_commit(lambda: _get_executor().submit(dispatch_agent_job, job.pk))
+
+
+def claim_agent_jobs(limit, job_ids=None):
+    """
+    Lease up to ``limit`` due jobs for this caller and return them.
+    The lease is taken with a conditional UPDATE, so concurrent dispatchers
+    (threads or processes) never claim the same row twice.
+    """
+    now = timezone.now()
+    due = AgentJob.objects.filter(status=AgentJob.STATUS_QUEUED).filter(
+        Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lt=now)
+    )
+    if job_ids is not None:
+        due = due.filter(pk__in=job_ids)
+    else:
+        due = due.filter(next_attempt_at__lte=now)
+    candidate_ids = list(due.order_by('next_attempt_at').values_list('pk', flat=True)[:limit])
+    if not candidate_ids:
+        return []
+
+    token = uuid.uuid4().hex
+    due.filter(pk__in=candidate_ids).update(
+        lease_token=token,
+        lease_expires_at=now + timedelta(seconds=outbox_option('LEASE_SECONDS')),
+        updated_at=now,
+    )
+    return list(AgentJob.objects.filter(pk__in=candidate_ids, lease_token=token))
+
+
+def _backoff_seconds(attempts):
+    delay = min(outbox_option('BACKOFF_BASE') * 2 ** max(attempts - 1, 0), outbox_option('BACKOFF_MAX'))
+    # jitter over the upper half so a burst of failures doesn't retry in lockstep
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _release(job, **fields):
+    """Update a leased job only if we still hold its lease"""
+    return AgentJob.objects.filter(pk=job.pk, lease_token=job.lease_token).update(
+        lease_token='', lease_expires_at=None, updated_at=timezone.now(), **fields
+    )
+
+
+def send_agent_job(job):
+    """Send one leased job to its n8n webhook and record the outcome"""
+    error = None
+    fields = {}
+    try:
+        response = get_agent_client().post(job.agent_type, job.payload)
+        fields = {'n8n_status': response.status_code, 'n8n_response': response.text[:500]}
+        if not response.ok:
+            error = f'n8n returned HTTP {response.status_code}'
+    except requests.exceptions.RequestException as e:
+        error = f'Request error: {e}'
+
+    now = timezone.now()
+    if error is None:
+        # a callback may have completed the job already; only move it forward from queued
+        AgentJob.objects.filter(pk=job.pk, lease_token=job.lease_token, status=AgentJob.STATUS_QUEUED).update(
+            status=AgentJob.STATUS_DISPATCHED, dispatched_at=now, error='',
+            lease_token='', lease_expires_at=None, updated_at=now, **fields
+        )
+        return True
+
+    attempts = job.attempts + 1
+    logger.warning("Agent job %s attempt %s failed: %s", job.pk, attempts, error)
+    if attempts >= outbox_option('MAX_ATTEMPTS'):
+        _release(job, attempts=attempts, status=AgentJob.STATUS_FAILED, error=error, **fields)
+    else:
+        _release(job, attempts=attempts, error=error,
+                 next_attempt_at=now + timedelta(seconds=_backoff_seconds(attempts)), **fields)
+    return False
+
+
+def dispatch_agent_job(job_id):
+    """Lease and send a single job (runs on a dispatcher thread)"""
+    close_old_connections()
+    try:
+        for job in claim_agent_jobs(1, job_ids=[job_id]):
+            send_agent_job(job)
+    except Exception:
+        logger.exception("Agent job %s crashed in the dispatcher", job_id)
+    finally:
+        # dispatcher threads own their connection; don't leak it between jobs
+        connection.close()
+
+
+def _send_on_worker_thread(job):
+    try:
+        return send_agent_job(job)
+    except Exception:
+        logger.exception("Agent job %s crashed in the dispatcher", job.pk)
+        return False
+    finally:
+        connection.close()
+
+
+def dispatch_outbox_batch(executor, batch_size):
+    """Claim one batch of due jobs and send them concurrently. Returns (claimed, sent)"""
+    jobs = claim_agent_jobs(batch_size)
+    if not jobs:
+        return 0, 0
+    results = list(executor.map(_send_on_worker_thread, jobs))
+    return len(jobs), sum(results)
+
+
+def outbox_stats():
+    """Queue depth per status, lag of the oldest due job and recent dispatch lag"""
+    now = timezone.now()
+    depth = dict(AgentJob.objects.values_list('status').annotate(n=Count('pk')).order_by())
+    oldest_due = AgentJob.objects.filter(
+        status=AgentJob.STATUS_QUEUED, next_attempt_at__lte=now
+    ).aggregate(oldest=Min('created_at'))['oldest']
+    recent = AgentJob.objects.filter(dispatched_at__gte=now - timedelta(hours=1)).aggregate(
+        lag=Avg(F('dispatched_at') - F('created_at'))
+    )['lag']
+    return {
+        'depth': {key: depth.get(key, 0) for key, _ in AgentJob.STATUS_CHOICES},
+        'oldest_queued_seconds': round((now - oldest_due).total_seconds(), 1) if oldest_due else 0.0,
+        'avg_dispatch_lag_seconds_1h': round(recent.total_seconds(), 2) if recent else 0.0,
+    }
+
+
+def complete_agent_job(job_id, workout=None, meal=None, error=None):
+    """Record the outcome of an agent callback on its job, if the callback carried one"""
+    try:
+        job_id = int(job_id)
+    except (TypeError, ValueError):
+        return 0
+    if error:
+        fields = {'status': AgentJob.STATUS_FAILED, 'error': str(error)[:2000]}
+    else:
+        fields = {'status': AgentJob.STATUS_COMPLETED, 'workout': workout, 'meal': meal}
+    return AgentJob.objects.filter(pk=job_id).exclude(status=AgentJob.STATUS_COMPLETED).update(
+        updated_at=timezone.now(), **fields
+    )
+
+
+def complete_agent_jobs(outcomes):
+    """
+    Bulk form of complete_agent_job for batch callbacks:
+    outcomes maps job_id -> {'workout': ...} or {'meal': ...}. Two queries total.
+    """
+    ids = {}
+    for job_id, result in outcomes.items():
+        try:
+            ids[int(job_id)] = result
+        except (TypeError, ValueError):
+            continue
+    jobs = AgentJob.objects.filter(pk__in=ids).exclude(status=AgentJob.STATUS_COMPLETED)
+    now = timezone.now()
+    updated = []
+    for job in jobs:
+        job.status = AgentJob.STATUS_COMPLETED
+        job.workout = ids[job.pk].get('workout')
+        job.meal = ids[job.pk].get('meal')
+        job.updated_at = now
+        updated.append(job)
+    AgentJob.objects.bulk_update(updated, ['status', 'workout', 'meal', 'updated_at'])
+    return len(updated)
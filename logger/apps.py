@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class LoggerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'logger'
+
+    def ready(self):
+        # connect catalog cache invalidation (and other model signal handlers)
+        from . import signals  # noqa: F401
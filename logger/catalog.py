@@ -0,0 +1,177 @@
+"""
+Process-wide cache of the exercise catalog (MuscleGroup, Equipment,
+BaseExercise, Exercise).
+
+The catalog changes rarely, so each process keeps an immutable snapshot in
+memory. A version token stored in the Django cache is bumped whenever a catalog
+row changes (see signals.py); every process compares its snapshot against that
+token and reloads when it moves, so all workers sharing the cache backend stay
+consistent.
+"""
+import logging
+import threading
+import time
+import uuid
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+
+from .models import MuscleGroup, Equipment, BaseExercise, Exercise
+from .routers import PRIMARY
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = 'logger:catalog:version'
+
+
+def normalize_name(name):
+    """Case- and whitespace-insensitive key used for catalog name lookups"""
+    return ' '.join((name or '').split()).casefold()
+
+
+class ExerciseInfo(NamedTuple):
+    """Denormalized exercise metadata, so callers never join through BaseExercise"""
+    id: int
+    name: str
+    base_exercise_id: int
+    primary_muscle_group_id: int
+    primary_muscle_group: str
+    secondary_muscle_group_ids: tuple
+    secondary_muscle_groups: tuple
+    equipment_id: int
+    equipment: str
+
+
+class Catalog:
+    """Immutable snapshot of the catalog tables at a given version"""
+
+    def __init__(self, version):
+        self.version = version
+        self.muscle_groups = {}     # normalized name -> id
+        self.equipment = {}         # normalized name -> id
+        self.base_exercises = {}    # normalized name -> id
+        self.exercises = {}         # normalized name -> id
+        self.exercise_variants = {} # (base_exercise_id, equipment_id) -> lowest exercise id
+        self.exercise_info = {}     # exercise id -> ExerciseInfo
+
+    @classmethod
+    def load(cls, version):
+        """
+        Build a snapshot with one query per catalog table. Always read from the
+        primary: the snapshot is shared process-wide under the current version,
+        so it must not come from a lagging replica in a stale-read view.
+        """
+        catalog = cls(version)
+
+        muscle_names = {}
+        for pk, name in MuscleGroup.objects.using(PRIMARY).order_by('id').values_list('id', 'name'):
+            muscle_names[pk] = name
+            catalog.muscle_groups.setdefault(normalize_name(name), pk)
+
+        equipment_names = {}
+        for pk, name in Equipment.objects.using(PRIMARY).order_by('id').values_list('id', 'name'):
+            equipment_names[pk] = name
+            catalog.equipment.setdefault(normalize_name(name), pk)
+
+        secondaries = {}
+        through = BaseExercise.secondary_muscle_groups.through
+        for base_id, mg_id in through.objects.using(PRIMARY).order_by('id').values_list('baseexercise_id', 'musclegroup_id'):
+            secondaries.setdefault(base_id, []).append(mg_id)
+
+        primaries = {}
+        for pk, name, mg_id in BaseExercise.objects.using(PRIMARY).order_by('id').values_list('id', 'name', 'primary_muscle_group_id'):
+            primaries[pk] = mg_id
+            catalog.base_exercises.setdefault(normalize_name(name), pk)
+
+        rows = Exercise.objects.using(PRIMARY).order_by('id').values_list('id', 'name', 'base_exercise_id', 'equipment_id')
+        for pk, name, base_id, eq_id in rows:
+            catalog.exercises.setdefault(normalize_name(name), pk)
+            catalog.exercise_variants.setdefault((base_id, eq_id), pk)
+            primary_id = primaries.get(base_id)
+            secondary_ids = tuple(secondaries.get(base_id, ()))
+            catalog.exercise_info[pk] = ExerciseInfo(
+                id=pk,
+                name=name,
+                base_exercise_id=base_id,
+                primary_muscle_group_id=primary_id,
+                primary_muscle_group=muscle_names.get(primary_id),
+                secondary_muscle_group_ids=secondary_ids,
+                secondary_muscle_groups=tuple(muscle_names[mg] for mg in secondary_ids if mg in muscle_names),
+                equipment_id=eq_id,
+                equipment=equipment_names.get(eq_id),
+            )
+        return catalog
+
+
+_lock = threading.Lock()
+_snapshot = None
+_checked_at = 0.0
+
+
+def _recheck_seconds():
+    return getattr(settings, 'CATALOG_CACHE_RECHECK_SECONDS', 2)
+
+
+def current_catalog_version():
+    """The shared catalog version token; changes whenever any catalog row does"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # first process up (or the key was evicted): publish a token so others agree
+        cache.add(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def get_catalog(force_check=False):
+    """
+    Return the current catalog snapshot, reloading it if another process
+    (or this one) bumped the shared version since it was built.
+    The shared version is consulted at most every CATALOG_CACHE_RECHECK_SECONDS.
+    """
+    global _snapshot, _checked_at
+    snapshot = _snapshot
+    now = time.monotonic()
+    if snapshot is not None and not force_check and now - _checked_at < _recheck_seconds():
+        return snapshot
+
+    with _lock:
+        version = current_catalog_version()
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = Catalog.load(version)
+        _checked_at = now
+        return _snapshot
+
+
+def get_exercise_info(exercise_id):
+    """
+    Metadata for one exercise. On a miss the shared version is checked right away
+    in case the exercise was created by another process; returns None if still unknown.
+    """
+    info = get_catalog().exercise_info.get(exercise_id)
+    if info is None:
+        info = get_catalog(force_check=True).exercise_info.get(exercise_id)
+    return info
+
+
+def _bump_version():
+    global _snapshot
+    cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    _snapshot = None
+
+
+def invalidate_catalog():
+    """
+    Mark the catalog stale in every process. Deferred until the surrounding
+    transaction commits so no process can cache rows that end up rolled back.
+    """
+    transaction.on_commit(_bump_version)
+
+
+def warm_catalog():
+    """Load the catalog ahead of the first request; safe to call before migrations"""
+    try:
+        get_catalog(force_check=True)
+    except DatabaseError:
+        logger.warning("Exercise catalog not warmed: database is not ready")
@@ -0,0 +1,112 @@
+"""
+Conditional GET for the JSON API, keyed on the per-user data version.
+
+The version is the user's cache generation (user_cache.py), which moves on
+every committed write to their workouts, sets, meals and ExerciseProgress rows.
+@etag_by_user_version turns it, plus the catalog version and everything the
+response varies on, into a weak ETag *before* the view body runs, so a poll
+whose If-None-Match still matches is answered 304 from two cache reads and no
+database queries at all.
+
+The generation is read before the view's queries, so a write racing the
+request can only make the tag older than the body, never newer: the next poll
+then simply misses and refetches. A replica's copy has no such bound: it can
+lag the generation by any amount, and a body read from it would keep its tag
+after replication catches up. So while a @allow_stale_reads view reads from
+the replica (routers.read_alias), requests get neither a 304 nor an ETag;
+inside the sticky window after a write they read the primary and are tagged.
+"""
+import functools
+import hashlib
+import threading
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .catalog import current_catalog_version
+from .routers import PRIMARY, read_alias
+from .user_cache import get_user_generation
+
+
+class ConditionalStats:
+    """Per-process count of conditional API responses, per view"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, view_name, not_modified):
+        with self._lock:
+            counts = self._counts.setdefault(view_name, [0, 0])
+            counts[0 if not_modified else 1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = {name: tuple(c) for name, c in self._counts.items()}
+        views = {}
+        for name, (not_modified, full) in sorted(counts.items()):
+            total = not_modified + full
+            views[name] = {
+                'not_modified': not_modified,
+                'full': full,
+                'not_modified_pct': round(100.0 * not_modified / total, 2) if total else 0.0,
+            }
+        not_modified = sum(c[0] for c in counts.values())
+        total = not_modified + sum(c[1] for c in counts.values())
+        return {
+            'not_modified': not_modified,
+            'requests': total,
+            'not_modified_pct': round(100.0 * not_modified / total, 2) if total else 0.0,
+            'views': views,
+        }
+
+
+conditional_stats = ConditionalStats()
+
+
+def _request_user_id(request):
+    return request.user.pk if request.user.is_authenticated else None
+
+
+def user_version_etag(request, user_id, view_name):
+    """Weak ETag for this view, query string and renderer at the user's current data version"""
+    renderer = getattr(getattr(request, 'accepted_renderer', None), 'format', '')
+    digest = hashlib.blake2b(
+        f"{view_name}|{user_id}|{request.get_full_path()}|{renderer}|{current_catalog_version()}".encode(),
+        digest_size=8,
+    ).hexdigest()
+    return f'W/"{get_user_generation(user_id)}-{digest}"'
+
+
+def etag_by_user_version(view=None, user_id=_request_user_id):
+    """
+    Answer GETs with 304 while the user's data version is unchanged.
+    ``user_id(request)`` names whose data the view returns (the requesting user
+    by default); returning None skips conditional handling, as does a read
+    routed to the replica. Apply inside @api_view/@permission_classes so
+    authentication has already run.
+    """
+    def decorator(view):
+        view_name = view.__name__
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            owner = user_id(request) if request.method in ('GET', 'HEAD') else None
+            if owner is None or read_alias() != PRIMARY:
+                return view(request, *args, **kwargs)
+
+            etag = user_version_etag(request, owner, view_name)
+            not_modified = get_conditional_response(request, etag=etag)
+            conditional_stats.record(view_name, not_modified is not None)
+            if not_modified is not None:
+                # the client holds the only copy, so it must revalidate every time
+                patch_cache_control(not_modified, private=True, no_cache=True)
+                return not_modified
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+
+    return decorator(view) if view is not None else decorator
@@ -0,0 +1,69 @@
+"""
+Cached data for the home dashboard.
+
+The context is built once per (user, date, generation) from the primary and
+stored in the shared cache; any write to the user's workouts, meals, daily
+log, pictures or staged workout bumps the generation (see user_cache.py), so
+repeat loads are served without touching the database.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .catalog import get_exercise_info
+from .queries import (
+    daily_log_meals, daily_log_workouts, daily_logs, personal_records_by_recency, recent_pictures, staged_workouts
+)
+from .routers import primary_reads
+from .user_cache import HitCounter, get_user_generation
+
+home_cache_stats = HitCounter()
+
+
+def personal_record_rows(user, limit=8):
+    """One row per exercise with its records, most recently improved first"""
+    rows = {}
+    for record in personal_records_by_recency(user):
+        if record.exercise_id not in rows:
+            if len(rows) >= limit:
+                continue
+            info = get_exercise_info(record.exercise_id)
+            rows[record.exercise_id] = {'exercise': info.name if info else record.exercise_id}
+        rows[record.exercise_id][record.record_type] = record
+    return list(rows.values())
+
+
+def build_home_context(user, day):
+    """Query everything the home template needs, fully evaluated so it can be cached"""
+    daily_log = daily_logs(user, day).first()
+    if daily_log:
+        workouts = list(daily_log_workouts(daily_log))
+        meals = list(daily_log_meals(daily_log))
+    else:
+        workouts, meals = [], []
+    pictures = list(recent_pictures(user))
+
+    staged = staged_workouts(user).first()
+    staged_data = staged.data if staged else None
+
+    return {
+        "daily_log": daily_log,
+        "workouts": workouts,
+        "meals": meals,
+        "staged_workout": staged_data,
+        "pictures": pictures,
+        "personal_records": personal_record_rows(user),
+    }
+
+
+def get_home_context(user, day):
+    """Home dashboard context from the cache, rebuilding it on a miss. Returns (context, hit)"""
+    key = f'logger:home:{user.pk}:{day.isoformat()}:{get_user_generation(user.pk)}'
+    context = cache.get(key)
+    hit = context is not None
+    if not hit:
+        # cached under the current generation, so it must be built from the primary
+        with primary_reads():
+            context = build_home_context(user, day)
+        cache.set(key, context, timeout=getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 24 * 60 * 60))
+    home_cache_stats.record(hit)
+    return context, hit
@@ -0,0 +1,129 @@
+"""
+Streaming exports of workouts, workout exercises, meals and progress.
+
+Rows are read with QuerySet.iterator(chunk_size=...) and encoded as CSV or
+NDJSON one chunk at a time, optionally gzip-compressed on the fly, so memory
+stays flat however long the history is. Used by the /export/ view and by
+``manage.py export_data`` (which can also split all users into parallel shards).
+"""
+import csv
+import gzip
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import ExerciseProgress, MealEntry, Workout, WorkoutExercise
+
+EXPORT_CHUNK_SIZE = 2000
+
+DATASETS = {
+    'workouts': (
+        Workout,
+        ['id', 'user_id', 'name', 'date', 'notes', 'created_at'],
+    ),
+    'exercises': (
+        WorkoutExercise,
+        ['id', 'user_id', 'workout_id', 'workout__date', 'exercise_id', 'exercise__name',
+         'order', 'sets', 'reps', 'weight', 'rest_seconds', 'notes'],
+    ),
+    'meals': (
+        MealEntry,
+        ['id', 'user_id', 'name', 'calories', 'protein', 'carbs', 'fats', 'date', 'created_at'],
+    ),
+    'progress': (
+        ExerciseProgress,
+        ['id', 'user_id', 'exercise_id', 'exercise__name', 'date', 'total_volume',
+         'avg_weight', 'total_sets', 'total_reps', 'one_rep_max_est'],
+    ),
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def export_rows(dataset, user_ids=None, chunk_size=EXPORT_CHUNK_SIZE, using=None):
+    """Stream one dataset as tuples in DATASETS column order, in primary key order"""
+    model, columns = DATASETS[dataset]
+    # using=None leaves the choice to the database router
+    queryset = model.objects.using(using).order_by('pk')
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    return queryset.values_list(*columns).iterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    """File-like object whose write() just returns the line, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(dataset, user_ids, using):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(DATASETS[dataset][1])
+    for row in export_rows(dataset, user_ids, using=using):
+        yield writer.writerow(row)
+
+
+def _ndjson_lines(datasets, user_ids, using):
+    for dataset in datasets:
+        columns = DATASETS[dataset][1]
+        for row in export_rows(dataset, user_ids, using=using):
+            record = dict(zip(columns, row))
+            record['dataset'] = dataset
+            yield json.dumps(record, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n'
+
+
+def export_lines(datasets, fmt, user_ids=None, using=None):
+    """
+    Text lines for the export. CSV holds a single dataset (one header); NDJSON
+    can interleave several, tagging every record with its "dataset".
+    Rows are read lazily, so pass ``using`` to pin the database alias.
+    """
+    if fmt == 'csv':
+        if len(datasets) != 1:
+            raise ValueError('CSV exports contain exactly one dataset')
+        return _csv_lines(datasets[0], user_ids, using)
+    if fmt == 'ndjson':
+        return _ndjson_lines(datasets, user_ids, using)
+    raise ValueError(f'Unknown export format: {fmt}')
+
+
+def encode_chunks(lines, compress=False, buffer_size=64 * 1024):
+    """Batch lines into ~buffer_size byte chunks, gzip-compressing them incrementally if asked"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    buffer, size = [], 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= buffer_size:
+            chunk = b''.join(buffer)
+            buffer, size = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = b''.join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def export_filename(datasets, fmt, compress=False, suffix=''):
+    name = '-'.join(datasets) if len(datasets) < len(DATASETS) else 'all'
+    return f"{name}{suffix}.{fmt}{'.gz' if compress else ''}"
+
+
+def write_export(path, datasets, fmt, user_ids=None, compress=False):
+    """Write an export to a file without holding it in memory; returns the number of lines written"""
+    opener = gzip.open if compress else open
+    lines = 0
+    with opener(path, 'wt', encoding='utf-8', newline='') as handle:
+        for line in export_lines(datasets, fmt, user_ids):
+            handle.write(line)
+            lines += 1
+    return lines
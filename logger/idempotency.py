@@ -0,0 +1,90 @@
+"""
+Idempotency for the agent callback endpoints.
+
+n8n retries webhooks, and every retry used to create another workout/meal.
+Callers may send an ``Idempotency-Key`` header (or ``idempotency_key`` field);
+without one, the key is a hash of the canonical JSON payload. The first
+successful response is stored under that key in a uniquely indexed table and
+replayed for repeats until it expires: one indexed lookup, no writes.
+Expired keys are removed by ``manage.py purge_idempotency_keys``.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+
+
+def canonical_payload_hash(data):
+    """sha256 of the payload as canonical JSON (sorted keys, no whitespace)"""
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':'), cls=DjangoJSONEncoder)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def idempotency_key_for(request, endpoint):
+    """Storage key for a request, namespaced by endpoint so keys never collide across callbacks"""
+    client_key = request.META.get(IDEMPOTENCY_HEADER)
+    if not client_key and hasattr(request.data, 'get'):
+        client_key = request.data.get('idempotency_key')
+    if not client_key:
+        client_key = 'payload:' + canonical_payload_hash(request.data)
+    return hashlib.sha256(f'{endpoint}:{client_key}'.encode()).hexdigest()
+
+
+def _replay(key):
+    stored = IdempotencyKey.objects.filter(key=key, expires_at__gt=timezone.now()).first()
+    if stored is None:
+        return None
+    response = Response(stored.response_body, status=stored.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(endpoint):
+    """
+    Decorator for DRF function views (apply below @api_view). Successful (2xx)
+    responses are stored atomically with the view's writes; a concurrent
+    duplicate loses on the unique key, rolls back and replays the winner.
+    Errors are not stored, so a retry after a failure runs again.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = idempotency_key_for(request, endpoint)
+            replay = _replay(key)
+            if replay is not None:
+                return replay
+
+            try:
+                with transaction.atomic():
+                    response = view(request, *args, **kwargs)
+                    if not 200 <= response.status_code < 300:
+                        transaction.set_rollback(response.status_code >= 500)
+                        return response
+                    now = timezone.now()
+                    # an expired row for the same key would block the insert
+                    IdempotencyKey.objects.filter(key=key, expires_at__lte=now).delete()
+                    IdempotencyKey.objects.create(
+                        key=key,
+                        endpoint=endpoint,
+                        response_status=response.status_code,
+                        response_body=response.data,
+                        expires_at=now + timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)),
+                    )
+                    return response
+            except IntegrityError:
+                replay = _replay(key)
+                if replay is None:
+                    raise
+                return replay
+        return wrapper
+    return decorator
@@ -0,0 +1,118 @@
+"""
+Resized variants for pump pics.
+
+Phone photos are several MB, so the dashboard serves small WebP/JPEG copies
+instead of the originals. After an upload commits, the picture is handed to a
+small background thread pool that writes a grid thumbnail and a medium
+variant in both formats. Variants are re-encoded from pixels only, so EXIF
+(GPS location, camera data) is dropped after applying its orientation.
+Pictures whose processing never ran (dead process, older uploads) are
+picked up by ``manage.py process_pictures``.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Picture
+
+logger = logging.getLogger(__name__)
+
+# variant name -> longest edge in pixels
+VARIANT_SIZES = {
+    'thumb': 320,
+    'medium': 1280,
+}
+
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+VARIANT_FIELDS = [f'{size}_{fmt}' for size in VARIANT_SIZES for fmt in VARIANT_FORMATS]
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'PICTURE_VARIANT_WORKERS', 2),
+                    thread_name_prefix='picture-variants',
+                )
+    return _executor
+
+
+def enqueue_picture_variants(picture):
+    """Generate a picture's variants in the background once the current transaction commits"""
+    transaction.on_commit(lambda: _get_executor().submit(_process_in_thread, picture.pk))
+
+
+def _process_in_thread(picture_id):
+    close_old_connections()
+    try:
+        picture = Picture.objects.filter(pk=picture_id).first()
+        if picture is not None:
+            generate_variants(picture)
+    except Exception:
+        logger.exception("Generating variants for picture %s failed", picture_id)
+    finally:
+        close_old_connections()
+
+
+def render_variant(image, max_edge, fmt):
+    """Encode a resized copy of an (already oriented) image; no metadata is carried over"""
+    pil_format, options = VARIANT_FORMATS[fmt]
+    variant = image.copy()
+    variant.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    if pil_format == 'JPEG' and variant.mode != 'RGB':
+        variant = variant.convert('RGB')
+    elif variant.mode not in ('RGB', 'RGBA'):
+        variant = variant.convert('RGBA' if 'A' in variant.getbands() else 'RGB')
+    buffer = io.BytesIO()
+    variant.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def generate_variants(picture):
+    """
+    Write every variant for a picture, replacing any previous ones, and mark it
+    processed. Returns None without writing anything if the picture was deleted
+    or given a new image while its variants were being rendered.
+    """
+    with picture.image.open('rb') as handle:
+        image = Image.open(handle)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+
+    stem = os.path.splitext(os.path.basename(picture.image.name))[0]
+    rendered = [
+        (f'{size}_{fmt}', f'{stem}_{size}.{fmt}', render_variant(image, max_edge, fmt))
+        for size, max_edge in VARIANT_SIZES.items()
+        for fmt in VARIANT_FORMATS
+    ]
+    # files are stored and their references acquired in one transaction (see storage.py);
+    # replaced variant files are released through the media reference counts
+    with transaction.atomic():
+        # re-checked under the write lock: files stored for a deleted picture would
+        # hold no reference, and nothing would ever collect them
+        if not Picture.objects.select_for_update().filter(pk=picture.pk, image=picture.image.name).exists():
+            logger.info("Picture %s changed while rendering its variants; skipped", picture.pk)
+            return None
+        for field_name, name, data in rendered:
+            getattr(picture, field_name).save(name, ContentFile(data), save=False)
+        picture.variants_processed_at = timezone.now()
+        picture.save(update_fields=[*VARIANT_FIELDS, 'variants_processed_at'])
+    return picture
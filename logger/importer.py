@@ -0,0 +1,249 @@
+"""
+Bulk import of workout logs exported from other trackers (Strong/Hevy-style CSV).
+
+These exports have one row per set. The file is parsed as a stream; contiguous
+rows with the same date and workout name become one workout, and each
+exercise's sets collapse into one WorkoutExercise (set count, mean reps and a
+volume-weighted mean weight, so sets x reps x weight keeps the logged volume).
+Weights are converted to settings.WEIGHT_UNIT from the unit in the weight
+header or a per-row unit column, and equipment-suffixed names such as
+"Bench Press (Barbell)" map onto the existing "Bench Press" movement.
+A workout whose date and name the user already has is skipped, so re-importing
+an export (or a newer export overlapping an older one) adds nothing twice.
+Workouts are written through ingest.bulk_create_workouts in chunks, one
+transaction each: catalog resolution, DailyLog links, ExerciseProgress,
+personal records and rollups are all applied in bulk per chunk, never per row.
+"""
+import csv
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+
+from .ingest import bulk_create_workouts
+from .models import Workout
+
+IMPORT_CHUNK_SIZE = 500
+
+# canonical field -> accepted (lower-cased) CSV headers
+COLUMN_ALIASES = {
+    'date': ('date', 'start_time', 'workout date', 'workout_date'),
+    'workout_name': ('workout name', 'workout_name', 'title'),
+    'exercise': ('exercise name', 'exercise_name', 'exercise_title', 'exercise'),
+    'weight': ('weight', 'weight_kg', 'weight (kg)', 'weight_lbs', 'weight (lbs)'),
+    'weight_unit': ('weight unit', 'weight_unit'),
+    'reps': ('reps',),
+    'notes': ('notes', 'exercise_notes'),
+    'workout_notes': ('workout notes', 'workout_notes', 'description'),
+}
+
+# units the weight column can be in; anything else rejects the file
+WEIGHT_UNITS = {
+    'kg': 'kg', 'kgs': 'kg', 'kilograms': 'kg',
+    'lb': 'lbs', 'lbs': 'lbs', 'pounds': 'lbs',
+}
+KG_PER_LB = 0.45359237
+
+DATE_FORMATS = (
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d',
+    '%d %b %Y, %H:%M',
+    '%d %b %Y',
+    '%m/%d/%Y %H:%M',
+    '%m/%d/%Y',
+)
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    skipped: int = 0
+    duplicates: int = 0
+    workouts: int = 0
+    exercises: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'skipped': self.skipped,
+            'duplicates': self.duplicates,
+            'workouts': self.workouts,
+            'exercises': self.exercises,
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+def parse_date(value):
+    value = (value or '').strip()
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _number(value):
+    try:
+        return float(value) if value not in (None, '') else 0.0
+    except ValueError:
+        return 0.0
+
+
+def _column_map(fieldnames):
+    headers = {name.strip().lower(): name for name in fieldnames or ()}
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        columns[field] = next((headers[alias] for alias in aliases if alias in headers), None)
+    missing = [field for field in ('date', 'exercise', 'reps') if columns[field] is None]
+    if missing:
+        raise ImportFormatError(f"CSV is missing required column(s): {', '.join(missing)}")
+    return columns
+
+
+def weight_unit():
+    """The unit weights are stored in (settings.WEIGHT_UNIT, 'kg' or 'lbs')"""
+    return getattr(settings, 'WEIGHT_UNIT', 'kg')
+
+
+def _header_unit(header):
+    """Unit named by a header such as 'weight_lbs' or 'Weight (kg)', or None for a bare 'weight'"""
+    header = (header or '').strip().lower()
+    for unit in ('kg', 'lbs'):
+        if header.endswith((f'_{unit}', f'({unit})')):
+            return unit
+    return None
+
+
+def _unit(value):
+    unit = WEIGHT_UNITS.get(value.strip().lower())
+    if unit is None:
+        raise ImportFormatError(f"Unknown weight unit: {value!r} (expected kg or lbs)")
+    return unit
+
+
+def convert_weight(weight, unit):
+    """A weight in ``unit`` converted to weight_unit()"""
+    target = weight_unit()
+    if unit == target or not weight:
+        return weight
+    return weight * KG_PER_LB if unit == 'lbs' else weight / KG_PER_LB
+
+
+def split_equipment(name):
+    """
+    Strong/Hevy-style names carry the equipment in parentheses:
+    'Bench Press (Barbell)' -> ('Bench Press', 'Barbell'); other names -> (name, None).
+    """
+    if name.endswith(')') and '(' in name:
+        base = name[:name.rindex('(')].strip()
+        equipment = name[name.rindex('(') + 1:-1].strip()
+        if base and equipment:
+            return base, equipment
+    return name, None
+
+
+def _workout_payload(name, day, notes, exercise_sets):
+    exercises = []
+    for exercise_name, sets in exercise_sets.items():
+        total_reps = sum(reps for reps, _, _ in sets)
+        volume = sum(reps * weight for reps, weight, _ in sets)
+        # 'Bench Press (Barbell)' is the Barbell variant of the existing
+        # 'Bench Press' movement, which also supplies its muscle groups
+        base_name, equipment = split_equipment(exercise_name)
+        exercises.append({
+            'name': exercise_name,
+            'base_exercise': base_name,
+            'sets': len(sets),
+            'reps': max(round(total_reps / len(sets)), 1),
+            'weight': round(volume / total_reps, 2) if volume and total_reps else None,
+            'muscle_group': None,
+            'equipment': equipment,
+            'notes': '; '.join(dict.fromkeys(note for _, _, note in sets if note)) or None,
+        })
+    return {'workout_name': name, 'workout_date': day, 'notes': notes, 'exercises': exercises}
+
+
+def iter_workouts(lines, result):
+    """
+    Workout payloads (AIWorkoutCreateSerializer-shaped dicts) from CSV text lines.
+    Expects each workout's rows to be contiguous, as tracker exports are.
+    """
+    reader = csv.DictReader(lines)
+    columns = _column_map(reader.fieldnames)
+    # a unit in the weight header wins; otherwise a per-row unit column; otherwise ours
+    column_unit = _header_unit(columns['weight'])
+
+    def get(row, field):
+        column = columns[field]
+        return (row.get(column) or '').strip() if column else ''
+
+    current_key, notes, exercise_sets = None, '', {}
+    for row in reader:
+        result.rows += 1
+        day = parse_date(get(row, 'date'))
+        exercise = get(row, 'exercise')
+        reps = int(_number(get(row, 'reps')))
+        if day is None or not exercise or reps <= 0:
+            # rest timers, cardio-only rows and unparseable dates
+            result.skipped += 1
+            continue
+
+        key = (day, get(row, 'workout_name') or 'Imported workout')
+        if key != current_key:
+            if exercise_sets:
+                yield _workout_payload(current_key[1], current_key[0], notes, exercise_sets)
+            current_key, notes, exercise_sets = key, get(row, 'workout_notes'), {}
+        unit = column_unit or (_unit(get(row, 'weight_unit')) if get(row, 'weight_unit') else weight_unit())
+        weight = convert_weight(_number(get(row, 'weight')), unit)
+        exercise_sets.setdefault(exercise, []).append((reps, weight, get(row, 'notes')))
+
+    if exercise_sets:
+        yield _workout_payload(current_key[1], current_key[0], notes, exercise_sets)
+
+
+def import_workouts(user, lines, chunk_size=IMPORT_CHUNK_SIZE):
+    """Import a tracker CSV (any iterable of text lines) for one user; returns an ImportResult"""
+    result = ImportResult()
+    started = time.perf_counter()
+    chunk = []
+    for payload in iter_workouts(lines, result):
+        chunk.append((user, payload))
+        if len(chunk) >= chunk_size:
+            _flush(chunk, result)
+            chunk = []
+    _flush(chunk, result)
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def _flush(chunk, result):
+    if not chunk:
+        return
+    # one query per chunk: the (date, name) pairs this user already has on those days
+    user = chunk[0][0]
+    existing = set(Workout.objects.filter(
+        user=user, date__in={payload['workout_date'] for _, payload in chunk}
+    ).values_list('date', 'name'))
+    fresh = [entry for entry in chunk if (entry[1]['workout_date'], entry[1]['workout_name']) not in existing]
+    result.duplicates += len(chunk) - len(fresh)
+    if fresh:
+        bulk_create_workouts(fresh)
+        result.workouts += len(fresh)
+        result.exercises += sum(len(payload['exercises']) for _, payload in fresh)
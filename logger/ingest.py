@@ -0,0 +1,120 @@
+"""
+Bulk ingestion of agent workouts and meals.
+
+The single-item callbacks do a DailyLog get_or_create, M2M add and progress
+update per object. The helpers here take already-validated payloads for any
+number of users and days, and write them with a fixed number of queries:
+one bulk insert per table, one DailyLog lookup/insert, one M2M link insert per
+relation, a chunked macro-totals refresh and one ExerciseProgress upsert.
+"""
+from django.db import transaction
+
+from .models import DailyLog, MealEntry, Workout, WorkoutExercise
+from .records import apply_record_candidates
+from .rollups import apply_rollup_entries
+from .user_cache import bump_user_generation
+from .utils import apply_progress_entries, build_workout_exercises, refresh_daily_totals, resolve_exercises
+
+
+def get_or_create_daily_logs(keys):
+    """
+    {(user_id, date): DailyLog id} for every requested key, creating the
+    missing logs with one bulk insert.
+    """
+    keys = set(keys)
+    if not keys:
+        return {}
+
+    def lookup():
+        rows = DailyLog.objects.filter(
+            user_id__in={k[0] for k in keys}, date__in={k[1] for k in keys}
+        ).values_list('user_id', 'date', 'id')
+        return {(user_id, day): pk for user_id, day, pk in rows if (user_id, day) in keys}
+
+    found = lookup()
+    missing = keys - found.keys()
+    if missing:
+        DailyLog.objects.bulk_create(
+            [DailyLog(user_id=user_id, date=day) for user_id, day in missing], ignore_conflicts=True
+        )
+        found = lookup()
+    return found
+
+
+def bulk_create_workouts(entries):
+    """
+    Create workouts from (user, validated AIWorkoutCreateSerializer data) pairs,
+    link them to their DailyLogs and fold them into ExerciseProgress.
+    Returns the saved Workout objects in input order.
+    """
+    if not entries:
+        return []
+    # outside the transaction, so a catalog reload never runs under the write lock
+    exercise_ids = resolve_exercises([ex for _, data in entries for ex in data['exercises']])
+    with transaction.atomic():
+        workouts = Workout.objects.bulk_create([
+            Workout(
+                user=user,
+                name=data['workout_name'],
+                date=data.get('workout_date'),
+                notes=data.get('notes') or '',
+            )
+            for user, data in entries
+        ])
+
+        rows = []
+        for workout, (_, data) in zip(workouts, entries):
+            rows.extend(build_workout_exercises(workout, data['exercises'], exercise_ids))
+        WorkoutExercise.objects.bulk_create(rows)
+
+        log_ids = get_or_create_daily_logs((w.user_id, w.date) for w in workouts)
+        DailyLog.workouts.through.objects.bulk_create([
+            DailyLog.workouts.through(dailylog_id=log_ids[(w.user_id, w.date)], workout_id=w.pk)
+            for w in workouts
+        ], ignore_conflicts=True)
+
+        apply_progress_entries(
+            (row.user_id, row.exercise_id, row.workout.date, row.sets, row.reps, row.weight) for row in rows
+        )
+        apply_record_candidates(
+            (row.user_id, row.exercise_id, row.workout_id, row.workout.date, row.reps, row.weight) for row in rows
+        )
+        apply_rollup_entries(
+            (row.user_id, row.exercise_id, row.workout.date, row.sets, row.reps, row.weight) for row in rows
+        )
+        # bulk_create sends no signals, so invalidate the users' cached data here
+        bump_user_generation(*{w.user_id for w in workouts})
+    return workouts
+
+
+def bulk_create_meals(entries):
+    """
+    Create meals from (user, validated AIMealCreateSerializer data) pairs, link
+    them to their DailyLogs and refresh those logs' macro totals.
+    Returns the saved MealEntry objects in input order.
+    """
+    if not entries:
+        return []
+    with transaction.atomic():
+        meals = MealEntry.objects.bulk_create([
+            MealEntry(
+                user=user,
+                name=data.get('meal_name'),
+                calories=data.get('calories') or 0,
+                protein=data.get('protein') or 0,
+                carbs=data.get('carbs') or 0,
+                fats=data.get('fats') or 0,
+                date=data.get('meal_date'),
+            )
+            for user, data in entries
+        ])
+
+        log_ids = get_or_create_daily_logs((m.user_id, m.date) for m in meals)
+        DailyLog.meals.through.objects.bulk_create([
+            DailyLog.meals.through(dailylog_id=log_ids[(m.user_id, m.date)], mealentry_id=m.pk)
+            for m in meals
+        ], ignore_conflicts=True)
+
+        refresh_daily_totals({log_ids[(m.user_id, m.date)] for m in meals})
+        bump_user_generation(*{m.user_id for m in meals})
+    return meals
@@ -0,0 +1,93 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from logger import views
+
+
+EXERCISES = ["Bench Press", "Squat", "Deadlift", "Overhead Press", "Barbell Row", "Pull Up", "Lunge", "Curl"]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the single-item agent callbacks with the batch callback on the same "
+        "generated payloads. Everything runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=10000, help="Payloads per run (split evenly between workouts and meals)")
+        parser.add_argument('--single-items', type=int, default=None,
+                            help="Payloads for the single-item run (defaults to --items; lower it to keep the run short)")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        factory = APIRequestFactory()
+        single_items = options['single_items'] or options['items']
+
+        single = self._run(single_items, lambda user, items: self._single(factory, items))
+        batch = self._run(options['items'], lambda user, items: self._batch(factory, items))
+
+        for label, (count, seconds) in (("single-item", single), ("batch", batch)):
+            self.stdout.write(f"{label:12} {count:6d} items in {seconds:8.2f}s  ->  {count / seconds:9.1f} items/s")
+        speedup = (batch[0] / batch[1]) / (single[0] / single[1])
+        self.stdout.write(self.style.SUCCESS(f"batch throughput is {speedup:.1f}x the single-item path"))
+
+    def _payloads(self, user, n):
+        start = date.today() - timedelta(days=n)
+        items = []
+        for i in range(n):
+            day = (start + timedelta(days=i // 2)).isoformat()
+            if i % 2:
+                items.append(('meal', {
+                    'user_id': user.pk, 'meal_name': f'Meal {i}', 'calories': random.randint(200, 900),
+                    'protein': random.randint(10, 60), 'carbs': random.randint(10, 100),
+                    'fats': random.randint(5, 40), 'meal_date': day,
+                }))
+            else:
+                items.append(('workout', {
+                    'user_id': user.pk, 'workout_name': f'Workout {i}', 'workout_date': day,
+                    'exercises': [
+                        {'name': name, 'sets': random.randint(2, 5), 'reps': random.randint(3, 12),
+                         'weight': random.randint(20, 150), 'muscle_group': 'General'}
+                        for name in random.sample(EXERCISES, 4)
+                    ],
+                }))
+        return items
+
+    def _run(self, n, ingest):
+        elapsed = 0.0
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(f'ingest-bench-{time.time_ns()}')
+                items = self._payloads(user, n)
+                started = time.perf_counter()
+                ingest(user, items)
+                elapsed = time.perf_counter() - started
+                raise _Rollback
+        except _Rollback:
+            pass
+        return n, elapsed
+
+    def _single(self, factory, items):
+        for kind, payload in items:
+            view = views.create_meal_from_agent if kind == 'meal' else views.create_workout_from_agent
+            response = view(factory.post('/', payload, format='json'))
+            assert response.status_code == 201, response.data
+
+    def _batch(self, factory, items):
+        body = {
+            'workouts': [p for kind, p in items if kind == 'workout'],
+            'meals': [p for kind, p in items if kind == 'meal'],
+        }
+        response = views.create_batch_from_agent(factory.post('/', body, format='json'))
+        assert response.status_code == 201, response.data
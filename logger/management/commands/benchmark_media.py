@@ -0,0 +1,71 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+from django.views.static import serve
+
+from logger import views
+from logger.models import Picture
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare serving a pump pic through the old static() route with the media view: "
+        "full responses, 304 revalidations, byte ranges and X-Accel-Redirect offload."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--picture', type=int, help="Picture id to serve (defaults to the latest upload)")
+        parser.add_argument('--field', default='image', help="Which file of the picture to serve")
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        pictures = Picture.objects.select_related('user').order_by('-pk')
+        picture = pictures.filter(pk=options['picture']).first() if options['picture'] else pictures.first()
+        if picture is None:
+            raise CommandError("No picture to serve; upload one or pass --picture")
+        name = getattr(picture, options['field']).name
+        if not name:
+            raise CommandError(f"Picture {picture.pk} has no {options['field']} file")
+
+        factory = RequestFactory()
+        path = settings.MEDIA_URL + name
+        probe = self._request(factory, path, picture.user)
+        etag = views.serve_media(probe, name=name)['ETag']
+
+        def static_route(**headers):
+            return lambda: serve(self._request(factory, path, picture.user, **headers), name, document_root=settings.MEDIA_ROOT)
+
+        def media_view(**headers):
+            return lambda: views.serve_media(self._request(factory, path, picture.user, **headers), name=name)
+
+        runs = [
+            ("static() full", static_route()),
+            ("media view full", media_view()),
+            ("media view 304", media_view(HTTP_IF_NONE_MATCH=etag)),
+            ("media view range 64KB", media_view(HTTP_RANGE='bytes=0-65535')),
+        ]
+        results = [(label, self._time(call, options['requests'])) for label, call in runs]
+        with override_settings(MEDIA_ACCEL='nginx'):
+            results.append(("media view X-Accel", self._time(media_view(), options['requests'])))
+
+        baseline = results[0][1]
+        self.stdout.write(f"Serving {name} ({picture.image.size if options['field'] == 'image' else '?'} bytes), {options['requests']} requests each")
+        for label, (rate, status, body) in results:
+            self.stdout.write(f"  {label:24} {rate:9.0f} req/s  status {status}  body {body} bytes  ({rate / baseline[0]:.1f}x)")
+
+    def _request(self, factory, path, user, **headers):
+        request = factory.get(path, **headers)
+        request.user = user
+        return request
+
+    def _time(self, call, count):
+        started = time.perf_counter()
+        status = body = 0
+        for _ in range(count):
+            response = call()
+            status = response.status_code
+            body = len(b''.join(response)) if response.streaming else len(response.content)
+            response.close()
+        return count / (time.perf_counter() - started), status, body
@@ -0,0 +1,138 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from logger.sqlite import DEFAULT_PRAGMAS, apply_pragmas
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entry (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    volume REAL NOT NULL,
+    notes TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entry_user ON entry (user_id);
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure reader and writer throughput on a scratch SQLite file with concurrent threads, "
+        "with the stock settings (rollback journal, deferred BEGIN) and with logger/sqlite.py's pragmas plus BEGIN IMMEDIATE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5.0, help="Duration of each run")
+        parser.add_argument('--seed-rows', type=int, default=20000)
+        parser.add_argument('--timeout', type=float, default=5.0, help="Busy timeout for both runs, in seconds")
+
+    def handle(self, *args, **options):
+        profiles = [
+            ("stock", {}, 'BEGIN'),
+            ("tuned", {**DEFAULT_PRAGMAS, 'busy_timeout': int(options['timeout'] * 1000)}, 'BEGIN IMMEDIATE'),
+        ]
+        results = []
+        for label, pragmas, begin in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self._seed(path, options['seed_rows'])
+                results.append((label, self._run(path, pragmas, begin, options)))
+
+        for label, stats in results:
+            self.stdout.write(
+                f"{label:6}  writes {stats['writes'] / stats['seconds']:8.1f}/s  "
+                f"reads {stats['reads'] / stats['seconds']:9.1f}/s  "
+                f"locked errors {stats['errors']:5d}  p95 write {stats['p95_write_ms']:7.1f} ms"
+            )
+        stock, tuned = results[0][1], results[1][1]
+        self.stdout.write(self.style.SUCCESS(
+            f"tuned vs stock: writes {self._ratio(tuned['writes'], stock['writes'])}, "
+            f"reads {self._ratio(tuned['reads'], stock['reads'])}"
+        ))
+
+    def _ratio(self, new, old):
+        return f"{new / old:.1f}x" if old else "n/a (stock completed none)"
+
+    def _seed(self, path, rows):
+        conn = sqlite3.connect(path)
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            'INSERT INTO entry (user_id, volume, notes) VALUES (?, ?, ?)',
+            ((random.randint(1, 50), random.random() * 1000, 'seed') for _ in range(rows)),
+        )
+        conn.commit()
+        conn.close()
+
+    def _connect(self, path, pragmas, timeout):
+        conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        if pragmas:
+            apply_pragmas(conn.cursor(), pragmas)
+        return conn
+
+    def _run(self, path, pragmas, begin, options):
+        stop = threading.Event()
+        lock = threading.Lock()
+        stats = {'writes': 0, 'reads': 0, 'errors': 0, 'write_times': []}
+
+        def writer():
+            conn = self._connect(path, pragmas, options['timeout'])
+            writes, errors, times = 0, 0, []
+            while not stop.is_set():
+                user_id = random.randint(1, 50)
+                started = time.perf_counter()
+                try:
+                    # read-then-write, like the progress/total upserts
+                    conn.execute(begin)
+                    conn.execute('SELECT COALESCE(SUM(volume), 0) FROM entry WHERE user_id = ?', (user_id,)).fetchone()
+                    conn.execute('INSERT INTO entry (user_id, volume, notes) VALUES (?, ?, ?)',
+                                 (user_id, random.random() * 1000, 'bench'))
+                    conn.execute('COMMIT')
+                    writes += 1
+                    times.append(time.perf_counter() - started)
+                except sqlite3.OperationalError:
+                    errors += 1
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+            conn.close()
+            with lock:
+                stats['writes'] += writes
+                stats['errors'] += errors
+                stats['write_times'].extend(times)
+
+        def reader():
+            conn = self._connect(path, pragmas, options['timeout'])
+            reads, errors = 0, 0
+            while not stop.is_set():
+                try:
+                    conn.execute(
+                        'SELECT COUNT(*), AVG(volume) FROM entry WHERE user_id = ?', (random.randint(1, 50),)
+                    ).fetchone()
+                    reads += 1
+                except sqlite3.OperationalError:
+                    errors += 1
+            conn.close()
+            with lock:
+                stats['reads'] += reads
+                stats['errors'] += errors
+
+        threads = [threading.Thread(target=writer) for _ in range(options['writers'])]
+        threads += [threading.Thread(target=reader) for _ in range(options['readers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        stats['seconds'] = time.perf_counter() - started
+
+        times = sorted(stats.pop('write_times'))
+        stats['p95_write_ms'] = times[int(len(times) * 0.95)] * 1000 if times else 0.0
+        return stats
@@ -0,0 +1,85 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from logger.models import DailyLog, ExerciseProgress, MealEntry, Workout
+from logger.queries import (
+    daily_log_meals, daily_log_workouts, daily_logs, personal_records_by_recency, progress_exercise_choices,
+    recent_pictures, recent_progress, recent_workouts, staged_workouts,
+)
+from logger.serializers import workout_exercise_detail_queryset
+
+# Temp B-tree sorts accepted on purpose, by label. Each is bounded by something
+# small, so no index is worth its write cost; scans are never excused.
+ACCEPTED_SORTS = {
+    "home: daily log workouts": "one day's workouts, reached through the M2M table",
+    "home: daily log meals": "one day's meals, reached through the M2M table",
+    "progress: exercise dropdown": "one row per exercise the user has logged, ordered by a joined name",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Print EXPLAIN QUERY PLAN for the per-user queries behind home, progress, "
+        "get_recent_workouts and the serializers, flagging full scans and temp B-tree sorts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="User id to plan against (defaults to the first user)")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("This command reads SQLite's EXPLAIN QUERY PLAN output.")
+
+        user = User.objects.filter(pk=options['user']).first() if options['user'] else User.objects.first()
+        user_id = user.pk if user else 0
+        today = timezone.localdate()
+        exercise_id = (
+            ExerciseProgress.objects.filter(user_id=user_id).values_list('exercise_id', flat=True).first() or 0
+        )
+        workout_ids = list(Workout.objects.filter(user_id=user_id).values_list('pk', flat=True)[:5]) or [0]
+        # the M2M queries need a DailyLog; plan against an unsaved stand-in when the user has none today
+        daily_log = daily_logs(user_id, today).first() or DailyLog(pk=0, user_id=user_id, date=today)
+
+        # the same querysets the views run (logger/queries.py)
+        queries = [
+            ("home: daily log", daily_logs(user_id, today)),
+            ("home: daily log workouts", daily_log_workouts(daily_log)),
+            ("home: daily log meals", daily_log_meals(daily_log)),
+            ("home: pictures", recent_pictures(user_id)),
+            ("home: staged workout", staged_workouts(user_id)[:1]),
+            ("home: personal records", personal_records_by_recency(user_id)),
+            ("progress: recent progress", recent_progress(user_id)),
+            ("progress: exercise history",
+             ExerciseProgress.objects.filter(user_id=user_id, exercise_id=exercise_id).order_by('date')),
+            ("progress: exercise dropdown", progress_exercise_choices(user_id)),
+            ("get_recent_workouts", recent_workouts(user_id)),
+            ("meals by user/date", MealEntry.objects.filter(user_id=user_id, date=today)),
+            ("serializers: workout exercises (prefetch)",
+             workout_exercise_detail_queryset().filter(workout_id__in=workout_ids)),
+        ]
+
+        problems = 0
+        for label, queryset in queries:
+            plan = queryset.explain()
+            flagged = [
+                line for line in plan.splitlines()
+                if ('SCAN' in line and 'USING' not in line and 'INDEX' not in line)
+                or ('TEMP B-TREE' in line and label not in ACCEPTED_SORTS)
+            ]
+            if flagged:
+                status = self.style.WARNING("CHECK")
+            elif 'TEMP B-TREE' in plan:
+                status = self.style.SUCCESS(f"OK, sort accepted: {ACCEPTED_SORTS[label]}")
+            else:
+                status = self.style.SUCCESS("OK")
+            problems += bool(flagged)
+            self.stdout.write(f"[{status}] {label}")
+            for line in plan.splitlines():
+                self.stdout.write(f"    {line}")
+
+        if problems:
+            self.stdout.write(self.style.WARNING(f"{problems} queries scan or sort without an index."))
+        else:
+            self.stdout.write(self.style.SUCCESS("All hot queries are served by an index."))
@@ -0,0 +1,75 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from logger.export import DATASETS, FORMATS, export_filename, write_export
+
+
+def _export_shard(path, datasets, fmt, user_ids, compress):
+    lines = write_export(path, datasets, fmt, user_ids=user_ids, compress=compress)
+    connections.close_all()
+    return path, lines
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream workouts, exercises, meals and progress to CSV or NDJSON files, optionally gzipped. "
+        "With --shards, users are split across that many worker processes, one file per shard."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', default='all', choices=[*DATASETS, 'all'])
+        parser.add_argument('--format', default='ndjson', choices=list(FORMATS))
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--user', type=int, action='append', help="Only export this user id (repeatable)")
+        parser.add_argument('--shards', type=int, default=1, help="Parallel worker processes, each exporting a slice of users")
+        parser.add_argument('--output-dir', default='.')
+
+    def handle(self, *args, **options):
+        fmt = options['format']
+        if options['dataset'] == 'all':
+            if fmt == 'csv':
+                raise CommandError("CSV exports need a single --dataset")
+            datasets = list(DATASETS)
+        else:
+            datasets = [options['dataset']]
+        output_dir = Path(options['output_dir'])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        shards = max(options['shards'], 1)
+
+        started = time.perf_counter()
+        if shards == 1:
+            path = output_dir / export_filename(datasets, fmt, options['gzip'])
+            results = [(path, write_export(path, datasets, fmt, user_ids=options['user'], compress=options['gzip']))]
+        else:
+            user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+            if options['user']:
+                user_ids = user_ids.filter(pk__in=options['user'])
+            user_ids = list(user_ids)
+            slices = [user_ids[shard::shards] for shard in range(shards)]
+            # workers open their own connections; don't hand them this process's
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=shards, initializer=django.setup) as pool:
+                futures = [
+                    pool.submit(
+                        _export_shard,
+                        output_dir / export_filename(datasets, fmt, options['gzip'], suffix=f'-shard{shard:02d}'),
+                        datasets, fmt, users, options['gzip'],
+                    )
+                    for shard, users in enumerate(slices) if users
+                ]
+                results = [future.result() for future in futures]
+
+        elapsed = time.perf_counter() - started
+        total = 0
+        for path, lines in results:
+            total += lines
+            self.stdout.write(f"  {path}: {lines} lines")
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {total} lines to {len(results)} file(s) in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} lines/s)."
+        ))
@@ -0,0 +1,31 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from logger.importer import IMPORT_CHUNK_SIZE, ImportFormatError, import_workouts
+
+
+class Command(BaseCommand):
+    help = "Import a Strong/Hevy-style workout CSV export for one user, streaming it in chunked bulk transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file exported from another tracker")
+        parser.add_argument('--user', required=True, help="User id or username to import for")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help="Workouts per transaction")
+
+    def handle(self, *args, **options):
+        lookup = {'pk': options['user']} if options['user'].isdigit() else {'username': options['user']}
+        try:
+            user = User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} not found")
+
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as handle:
+                result = import_workouts(user, handle, chunk_size=options['chunk_size'])
+        except (OSError, ImportFormatError) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.workouts} workouts ({result.exercises} exercises) from {result.rows} rows, "
+            f"skipped {result.skipped} rows and {result.duplicates} already imported workouts, in {result.seconds:.2f}s ({result.rows_per_second:.0f} rows/s)."
+        ))
@@ -0,0 +1,70 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, Sum
+
+from logger.media import collect_garbage, rebuild_refcounts, reference_counts
+from logger.models import MediaBlob
+from logger.storage import picture_storage
+
+
+def _mb(size):
+    return f"{(size or 0) / (1024 * 1024):.1f} MB"
+
+
+class Command(BaseCommand):
+    help = "Report disk space saved by deduplicated pump pic storage; optionally rebuild refcounts and collect orphaned files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Recount references from the Picture table first")
+        parser.add_argument('--gc', action='store_true', help="Delete files under pump_pics/ that no blob references")
+        parser.add_argument('--min-age', type=int, default=3600, help="Only collect files older than this many seconds")
+        parser.add_argument('--dry-run', action='store_true', help="With --gc, list orphaned files without deleting them")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            blobs, references = rebuild_refcounts()
+            self.stdout.write(f"Rebuilt reference counts: {blobs} files, {references} references.")
+
+        totals = MediaBlob.objects.aggregate(
+            files=Count('id'),
+            references=Sum('refcount'),
+            stored=Sum('size'),
+            logical=Sum(F('size') * F('refcount')),
+        )
+        stored, logical = totals['stored'] or 0, totals['logical'] or 0
+        self.stdout.write(f"Files stored:       {totals['files']}")
+        self.stdout.write(f"References:         {totals['references'] or 0}")
+        self.stdout.write(f"Bytes on disk:      {_mb(stored)}")
+        self.stdout.write(f"Without dedup:      {_mb(logical)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved by dedup:     {_mb(logical - stored)}"
+            + (f" ({(logical - stored) / logical:.1%})" if logical else "")
+        ))
+
+        if options['gc']:
+            self._collect(options['min_age'], options['dry_run'])
+
+    def _collect(self, min_age, dry_run):
+        storage = picture_storage()
+        root = storage.path('pump_pics')
+        cutoff = time.time() - min_age
+        orphans = []
+        known = set(MediaBlob.objects.values_list('name', flat=True))
+        # a file a Picture still points at is never an orphan, even if its blob row is missing
+        known |= reference_counts().keys()
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+                if name not in known and os.path.getmtime(path) < cutoff:
+                    orphans.append(name)
+
+        if dry_run:
+            for name in orphans:
+                self.stdout.write(f"  orphan: {name}")
+            self.stdout.write(f"{len(orphans)} orphaned files (dry run).")
+            return
+        freed = collect_garbage(orphans)
+        self.stdout.write(self.style.SUCCESS(f"Collected {len(orphans)} orphaned files, freed {_mb(freed)}."))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from logger.images import generate_variants
+from logger.models import Picture
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/JPEG variants for pictures that don't have them yet (backfill)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Regenerate variants for every picture")
+        parser.add_argument('--user', type=int, help="Only process this user's pictures")
+        parser.add_argument('--limit', type=int, help="Stop after this many pictures")
+
+    def handle(self, *args, **options):
+        pictures = Picture.objects.order_by('pk')
+        if not options['all']:
+            pictures = pictures.filter(variants_processed_at__isnull=True)
+        if options['user']:
+            pictures = pictures.filter(user_id=options['user'])
+        if options['limit']:
+            pictures = pictures[:options['limit']]
+
+        started = time.perf_counter()
+        done = failed = 0
+        for picture in pictures.iterator(chunk_size=100):
+            try:
+                generate_variants(picture)
+                done += 1
+            except (OSError, ValueError) as exc:
+                # missing or unreadable originals; leave them unprocessed
+                failed += 1
+                self.stderr.write(f"  picture {picture.pk} ({picture.image.name}): {exc}")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {done} pictures ({failed} failed) in {elapsed:.2f}s."
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from logger.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete expired agent callback idempotency keys in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted = 0
+        while True:
+            # short transactions: each batch deletes by primary key via the expires_at index
+            ids = list(
+                IdempotencyKey.objects.filter(expires_at__lte=now)
+                .values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} expired idempotency keys."))
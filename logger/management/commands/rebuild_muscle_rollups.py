@@ -0,0 +1,60 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from logger.models import MuscleGroupVolume, WorkoutExercise
+from logger.rollups import fold_rollup_entries
+from logger.user_cache import bump_user_generation
+
+
+class Command(BaseCommand):
+    help = "Rebuild the weekly/monthly MuscleGroupVolume rollups from every logged set, one user at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="Only rebuild this user id")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Sets read per query")
+
+    def handle(self, *args, **options):
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+        if options['user']:
+            user_ids = user_ids.filter(pk=options['user'])
+
+        users = sets_read = rows_written = 0
+        for user_id in user_ids.iterator():
+            sets = (
+                WorkoutExercise.objects.filter(user_id=user_id)
+                .values_list('user_id', 'exercise_id', 'workout__date', 'sets', 'reps', 'weight')
+            )
+            deltas = {}
+            for chunk in self._chunks(sets.iterator(chunk_size=options['chunk_size']), options['chunk_size']):
+                fold_rollup_entries(chunk, deltas=deltas)
+                sets_read += len(chunk)
+
+            rows = [
+                MuscleGroupVolume(
+                    user_id=key[0], muscle_group_id=key[1], period=key[2], period_start=key[3],
+                    volume=volume, sets=set_count, reps=reps,
+                )
+                for key, (volume, set_count, reps) in deltas.items()
+                if set_count >= 1e-6
+            ]
+            with transaction.atomic():
+                MuscleGroupVolume.objects.filter(user_id=user_id).delete()
+                MuscleGroupVolume.objects.bulk_create(rows, batch_size=500)
+                bump_user_generation(user_id)
+            users += 1
+            rows_written += len(rows)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rows_written} rollup rows from {sets_read} sets for {users} users."
+        ))
+
+    def _chunks(self, iterable, size):
+        chunk = []
+        for item in iterable:
+            chunk.append(item)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from logger.models import PersonalRecord, WorkoutExercise
+from logger.records import fold_record_candidates
+from logger.user_cache import bump_user_generation
+
+
+class Command(BaseCommand):
+    help = "Rebuild the PersonalRecord table from every logged set, one user at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="Only rebuild this user id")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+        if options['user']:
+            user_ids = user_ids.filter(pk=options['user'])
+
+        users = records = 0
+        for user_id in user_ids.iterator():
+            sets = (
+                WorkoutExercise.objects.filter(user_id=user_id, weight__gt=0)
+                .order_by('workout__date', 'id')
+                .values_list('user_id', 'exercise_id', 'workout_id', 'workout__date', 'reps', 'weight')
+            )
+            best = fold_record_candidates(sets.iterator(chunk_size=options['chunk_size']))
+            with transaction.atomic():
+                PersonalRecord.objects.filter(user_id=user_id).delete()
+                PersonalRecord.objects.bulk_create(best.values(), batch_size=500)
+                bump_user_generation(user_id)
+            users += 1
+            records += len(best)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {records} personal records for {users} users."))
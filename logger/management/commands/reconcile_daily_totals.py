@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum, Value
+from django.db.models.functions import Coalesce
+
+from logger.models import DailyLog
+from logger.user_cache import bump_user_generation
+from logger.utils import MACRO_TOTAL_FIELDS
+
+
+class Command(BaseCommand):
+    help = "Recompute DailyLog macro totals from linked meals and fix any rows that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="Only reconcile this user id")
+        parser.add_argument('--since', help="Only reconcile logs on or after this date (YYYY-MM-DD)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without writing")
+
+    def handle(self, *args, **options):
+        logs = DailyLog.objects.order_by('pk')
+        if options['user']:
+            logs = logs.filter(user_id=options['user'])
+        if options['since']:
+            logs = logs.filter(date__gte=options['since'])
+
+        # one aggregate query over the meals M2M for every log
+        logs = logs.annotate(**{
+            f'actual_{total}': Coalesce(Sum(f'meals__{field}'), Value(0))
+            for field, total in MACRO_TOTAL_FIELDS.items()
+        })
+
+        checked = 0
+        drifted = []
+        fixed = 0
+        for log in logs.iterator(chunk_size=options['batch_size']):
+            checked += 1
+            changed = False
+            for total in MACRO_TOTAL_FIELDS.values():
+                actual = getattr(log, f'actual_{total}')
+                if getattr(log, total) != actual:
+                    setattr(log, total, actual)
+                    changed = True
+            if changed:
+                drifted.append(log)
+            if len(drifted) >= options['batch_size']:
+                fixed += self._flush(drifted, options['dry_run'])
+                drifted = []
+        fixed += self._flush(drifted, options['dry_run'])
+
+        verb = "would fix" if options['dry_run'] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} daily logs, {verb} {fixed}."))
+
+    def _flush(self, logs, dry_run):
+        if logs and not dry_run:
+            with transaction.atomic():
+                DailyLog.objects.bulk_update(logs, list(MACRO_TOTAL_FIELDS.values()))
+                bump_user_generation(*{log.user_id for log in logs})
+        return len(logs)
@@ -0,0 +1,57 @@
+import json
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from logger.agent_client import agent_http_stats
+from logger.agents import dispatch_outbox_batch, outbox_stats
+
+
+class Command(BaseCommand):
+    help = "Drain the AgentJob outbox: lease due jobs in batches, send them to n8n concurrently, retry failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--concurrency', type=int, default=8, help="Parallel webhook calls per batch")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when the outbox is empty")
+        parser.add_argument('--stats-interval', type=float, default=60.0, help="Seconds between queue depth/lag log lines")
+        parser.add_argument('--once', action='store_true', help="Drain what is due now and exit")
+        parser.add_argument('--stats', action='store_true', help="Print queue depth and dispatch lag as JSON and exit")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(outbox_stats()))
+            return
+
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        claimed_total = sent_total = 0
+        last_stats = 0.0
+        with ThreadPoolExecutor(max_workers=options['concurrency'], thread_name_prefix='agent-outbox') as executor:
+            while not self._stopping:
+                claimed, sent = dispatch_outbox_batch(executor, options['batch_size'])
+                claimed_total += claimed
+                sent_total += sent
+
+                if time.monotonic() - last_stats >= options['stats_interval']:
+                    last_stats = time.monotonic()
+                    self.stdout.write(
+                        f"outbox {json.dumps(outbox_stats())} http {json.dumps(agent_http_stats())} "
+                        f"claimed={claimed_total} sent={sent_total}"
+                    )
+
+                if claimed < options['batch_size']:
+                    # outbox drained (for now)
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+
+        self.stdout.write(f"http {json.dumps(agent_http_stats())}")
+        self.stdout.write(self.style.SUCCESS(f"Outbox worker stopped: claimed {claimed_total}, sent {sent_total}."))
+
+    def _stop(self, signum, frame):
+        self._stopping = True
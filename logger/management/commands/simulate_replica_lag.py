@@ -0,0 +1,80 @@
+import sqlite3
+import time
+from collections import deque
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from logger.routers import analytics_alias
+
+
+class Command(BaseCommand):
+    help = (
+        "Local stand-in for replication: snapshot the primary SQLite file every --interval seconds "
+        "and publish each snapshot to the analytics SQLite file --lag seconds later."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lag', type=float, default=2.0, help="Replication delay in seconds")
+        parser.add_argument('--interval', type=float, default=0.5, help="Seconds between snapshots")
+        parser.add_argument('--duration', type=float, help="Stop after this many seconds (default: run until interrupted)")
+        parser.add_argument('--once', action='store_true', help="Copy the primary to the replica once, with no lag, and exit")
+
+    def handle(self, *args, **options):
+        alias = analytics_alias()
+        if alias is None:
+            raise CommandError("No analytics database configured; set ANALYTICS_DB_NAME to a second SQLite file")
+        primary_path = connections['default'].settings_dict['NAME']
+        replica_path = connections[alias].settings_dict['NAME']
+        if connections['default'].vendor != 'sqlite' or connections[alias].vendor != 'sqlite':
+            raise CommandError("The lag simulator only works with two SQLite databases")
+
+        if options['once']:
+            self._publish(self._snapshot(primary_path), replica_path)
+            self.stdout.write(self.style.SUCCESS(f"Copied {primary_path} -> {replica_path}"))
+            return
+
+        self.stdout.write(
+            f"Replicating {primary_path} -> {replica_path} with {options['lag']}s lag (Ctrl-C to stop)"
+        )
+        pending = deque()
+        started = time.monotonic()
+        published = 0
+        try:
+            while options['duration'] is None or time.monotonic() - started < options['duration']:
+                now = time.monotonic()
+                pending.append((now, self._snapshot(primary_path)))
+                # publish the newest snapshot that is at least `lag` old
+                due = None
+                while pending and now - pending[0][0] >= options['lag']:
+                    if due is not None:
+                        due.close()
+                    due = pending.popleft()[1]
+                if due is not None:
+                    self._publish(due, replica_path)
+                    due.close()
+                    published += 1
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for _, snapshot in pending:
+                snapshot.close()
+        self.stdout.write(self.style.SUCCESS(f"Published {published} snapshots."))
+
+    def _snapshot(self, path):
+        # the test runner's in-memory databases are named by URI
+        source = sqlite3.connect(path, uri=str(path).startswith('file:'))
+        snapshot = sqlite3.connect(':memory:')
+        try:
+            source.backup(snapshot)
+        finally:
+            source.close()
+        return snapshot
+
+    def _publish(self, snapshot, replica_path):
+        replica = sqlite3.connect(replica_path, timeout=30)
+        try:
+            snapshot.backup(replica)
+        finally:
+            replica.close()
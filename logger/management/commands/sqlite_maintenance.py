@@ -0,0 +1,40 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = "Run PRAGMA optimize and checkpoint the WAL on a SQLite database (safe to schedule, e.g. hourly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--checkpoint', default='TRUNCATE', choices=['PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'],
+                            help="wal_checkpoint mode; TRUNCATE also shrinks the -wal file to zero")
+        parser.add_argument('--analyze', action='store_true', help="Run a full ANALYZE instead of relying on optimize")
+        parser.add_argument('--vacuum', action='store_true', help="VACUUM the database (takes an exclusive lock)")
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"Database '{options['database']}' is not SQLite")
+        wal_path = f"{connection.settings_dict['NAME']}-wal"
+
+        wal_before = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+            if options['analyze']:
+                cursor.execute('ANALYZE')
+            cursor.execute('PRAGMA optimize')
+            if options['vacuum']:
+                cursor.execute('VACUUM')
+            cursor.execute(f"PRAGMA wal_checkpoint({options['checkpoint']})")
+            busy, log_frames, checkpointed = cursor.fetchone()
+        wal_after = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+
+        self.stdout.write(f"journal_mode={journal_mode}")
+        self.stdout.write(f"checkpoint: busy={busy} log_frames={log_frames} checkpointed={checkpointed}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Optimized; WAL {wal_before / 1024:.0f} KiB -> {wal_after / 1024:.0f} KiB."
+        ))
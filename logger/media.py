@@ -0,0 +1,119 @@
+"""
+Reference counting for content-addressed Picture files.
+
+Every file name stored on a Picture (original and variants) holds one
+reference in MediaBlob. signals.py acquires references when a Picture saves
+new names and releases them when names are replaced or the Picture is
+deleted. When a blob's count reaches zero its row is removed and the file is
+deleted after commit, unless an upload of the same bytes acquired it again in
+the meantime: collect_garbage re-checks the count and unlinks inside one
+transaction, which serializes with the locked existence check in
+ContentAddressedStorage._save (see storage.py).
+``manage.py media_storage_report`` shows the space saved and can rebuild the
+counts from the Picture table; migration 0015 did so once for pictures
+uploaded before the counts existed.
+"""
+import logging
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import MediaBlob, Picture
+from .storage import picture_storage
+
+logger = logging.getLogger(__name__)
+
+PICTURE_FILE_FIELDS = ('image', 'thumb_webp', 'thumb_jpeg', 'medium_webp', 'medium_jpeg')
+
+
+def picture_file_names(picture):
+    """Names of every file a Picture references, empty fields skipped"""
+    return [getattr(picture, field).name for field in PICTURE_FILE_FIELDS if getattr(picture, field).name]
+
+
+def _blob_size(name):
+    try:
+        return picture_storage().size(name)
+    except OSError:
+        return 0
+
+
+def acquire(names):
+    """Add one reference per occurrence of each name"""
+    with transaction.atomic():
+        for name, count in Counter(names).items():
+            if MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + count):
+                continue
+            blob, created = MediaBlob.objects.get_or_create(
+                name=name, defaults={'refcount': count, 'size': _blob_size(name)}
+            )
+            if not created:
+                MediaBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + count)
+
+
+def release(names):
+    """Drop one reference per occurrence; blobs left unreferenced are deleted with their files"""
+    counts = Counter(names)
+    if not counts:
+        return
+    with transaction.atomic():
+        for name, count in counts.items():
+            MediaBlob.objects.filter(name=name).update(refcount=F('refcount') - count)
+        dead = list(MediaBlob.objects.filter(name__in=counts, refcount__lte=0).values_list('name', flat=True))
+        if dead:
+            MediaBlob.objects.filter(name__in=dead, refcount__lte=0).delete()
+            transaction.on_commit(lambda: collect_garbage(dead))
+
+
+def collect_garbage(names):
+    """Delete files for these names that no blob references any more; returns bytes freed"""
+    storage = picture_storage()
+    freed = 0
+    with transaction.atomic():
+        # unlink while holding the lock, so no upload can reuse a file between the check and the delete
+        still_used = set(
+            MediaBlob.objects.select_for_update()
+            .filter(name__in=names, refcount__gt=0)
+            .values_list('name', flat=True)
+        )
+        for name in names:
+            if name in still_used:
+                continue
+            try:
+                size = storage.size(name)
+                storage.delete(name)
+                freed += size
+            except OSError:
+                logger.warning("Could not delete unreferenced media file %s", name)
+    return freed
+
+
+def reference_counts(picture_model=Picture):
+    """Counter of file name -> references held by Picture rows"""
+    counts = Counter()
+    for row in picture_model.objects.values_list(*PICTURE_FILE_FIELDS).iterator(chunk_size=1000):
+        counts.update(name for name in row if name)
+    return counts
+
+
+def rebuild_refcounts(picture_model=Picture, blob_model=MediaBlob):
+    """
+    Recount every reference from the Picture table; returns (blobs, references).
+    The models can be passed in so a data migration can run it on historical models.
+    """
+    counts = reference_counts(picture_model)
+    with transaction.atomic():
+        existing = set(blob_model.objects.values_list('name', flat=True))
+        stale = list(existing - counts.keys())
+        for start in range(0, len(stale), 500):
+            blob_model.objects.filter(name__in=stale[start:start + 500]).delete()
+        blob_model.objects.bulk_create(
+            [blob_model(name=name, refcount=0, size=_blob_size(name)) for name in counts if name not in existing],
+            batch_size=500,
+        )
+        blobs = list(blob_model.objects.all())
+        for blob in blobs:
+            blob.refcount = counts[blob.name]
+        blob_model.objects.bulk_update(blobs, ['refcount'], batch_size=500)
+    return len(counts), sum(counts.values())
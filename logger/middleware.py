@@ -0,0 +1,148 @@
+"""
+Per-request SQL instrumentation.
+
+SQLInstrumentationMiddleware installs a connection.execute_wrapper on every
+database alias for a sampled fraction of requests (SQL_INSTRUMENTATION_SAMPLE_RATE)
+and records the query count, total SQL time and how often each query template
+repeats. Sampled responses get a ``Server-Timing: db;dur=...`` header and one
+JSON line at DEBUG on the "logger.sql" logger. A SELECT template repeated
+SQL_N_PLUS_ONE_THRESHOLD times or more is logged at WARNING as a likely N+1,
+together with the first frame of project code that issued it.
+
+Unsampled requests cost one random() call. Queries a StreamingHttpResponse
+makes after the view returns (e.g. exports) are not counted.
+"""
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('logger.sql')
+
+_IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+_THIS_FILE = os.path.normcase(os.path.abspath(__file__))
+
+
+def sql_template(sql):
+    """Collapse parameter lists and inlined literals so repeats of one query compare equal"""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _STRING.sub('?', sql)
+    return _NUMBER.sub('?', sql)
+
+
+def _project_frame():
+    """First frame outside Django, third-party packages and this module, as 'path:line in func'"""
+    root = os.path.normcase(str(settings.BASE_DIR))
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.normcase(os.path.abspath(frame.f_code.co_filename))
+        if filename.startswith(root) and filename != _THIS_FILE and 'site-packages' not in filename:
+            return f"{os.path.relpath(filename, root)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+class QueryRecorder:
+    """execute_wrapper that tallies queries per normalized template"""
+
+    def __init__(self, n_plus_one_threshold):
+        self.threshold = n_plus_one_threshold
+        self.count = 0
+        self.seconds = 0.0
+        self.templates = {}     # template -> [count, seconds, origin]
+        self._normalized = {}   # raw sql -> template, so repeats skip the regexes
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            template = self._normalized.get(sql)
+            if template is None:
+                template = self._normalized[sql] = sql_template(sql)
+            stats = self.templates.setdefault(template, [0, 0.0, None])
+            stats[0] += 1
+            stats[1] += elapsed
+            if stats[0] == self.threshold and stats[2] is None:
+                # walk the stack only once a template actually repeats enough to matter
+                stats[2] = _project_frame()
+
+    def repeated(self):
+        """(template, count, seconds, origin) for templates run more than once, most frequent first"""
+        rows = [(template, *stats) for template, stats in self.templates.items() if stats[0] > 1]
+        return sorted(rows, key=lambda row: (-row[1], -row[2]))
+
+    def n_plus_one(self):
+        return [
+            row for row in self.repeated()
+            if row[1] >= self.threshold and row[0].lstrip().upper().startswith('SELECT')
+        ]
+
+
+class SQLInstrumentationMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'SQL_INSTRUMENTATION_SAMPLE_RATE', 0.0)
+        self.threshold = getattr(settings, 'SQL_N_PLUS_ONE_THRESHOLD', 5)
+
+    def __call__(self, request):
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        recorder = QueryRecorder(self.threshold)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = recorder.seconds * 1000
+
+        timing = f'db;dur={db_ms:.1f};desc="{recorder.count} queries", app;dur={total_ms:.1f}'
+        existing = response.get('Server-Timing')
+        response['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+        self._log(request, response, recorder, db_ms, total_ms)
+        return response
+
+    def _log(self, request, response, recorder, db_ms, total_ms):
+        match = getattr(request, 'resolver_match', None)
+        repeated = recorder.repeated()
+        suspects = recorder.n_plus_one()
+        record = {
+            'event': 'sql',
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(db_ms, 2),
+            'total_ms': round(total_ms, 2),
+            'repeated': [
+                {'sql': template[:300], 'count': count, 'ms': round(seconds * 1000, 2)}
+                for template, count, seconds, _ in repeated[:5]
+            ],
+        }
+        logger.debug(json.dumps(record, separators=(',', ':')))
+        for template, count, seconds, origin in suspects:
+            logger.warning(json.dumps({
+                'event': 'n_plus_one',
+                'path': request.path,
+                'view': record['view'],
+                'count': count,
+                'ms': round(seconds * 1000, 2),
+                'origin': origin,
+                'sql': template[:300],
+            }, separators=(',', ':')))
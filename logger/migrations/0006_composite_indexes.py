@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0005_picture'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='workoutexercise',
+            options={'ordering': ['order', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='exerciseprogress',
+            index=models.Index(fields=['user', '-date'], name='progress_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mealentry',
+            index=models.Index(fields=['user', '-date', '-created_at'], name='meal_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='picture',
+            index=models.Index(fields=['user', '-uploaded_at'], name='picture_user_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['user', '-date', '-created_at'], name='workout_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workoutexercise',
+            index=models.Index(fields=['workout', 'order'], name='workoutex_workout_order_idx'),
+        ),
+    ]
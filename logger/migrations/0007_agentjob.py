@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0006_composite_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgentJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('agent_type', models.CharField(choices=[('workout', 'Workout'), ('meal', 'Meal')], max_length=12)),
+                ('payload', models.JSONField()),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('dispatched', 'Dispatched'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=12)),
+                ('n8n_status', models.PositiveIntegerField(blank=True, null=True)),
+                ('n8n_response', models.TextField(blank=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('meal', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='agent_jobs', to='logger.mealentry')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('workout', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='agent_jobs', to='logger.workout')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
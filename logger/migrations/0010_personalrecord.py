@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0009_idempotencykey'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonalRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('record_type', models.CharField(choices=[('one_rep_max', 'Estimated 1RM'), ('heaviest_weight', 'Heaviest weight'), ('best_set_volume', 'Best set volume')], max_length=20)),
+                ('value', models.FloatField()),
+                ('weight', models.FloatField()),
+                ('reps', models.PositiveIntegerField()),
+                ('date', models.DateField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='logger.exercise')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('workout', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='personal_records', to='logger.workout')),
+            ],
+            options={
+                'ordering': ['exercise__name', 'record_type'],
+                'unique_together': {('user', 'exercise', 'record_type')},
+            },
+        ),
+    ]
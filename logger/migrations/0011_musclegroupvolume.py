@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0010_personalrecord'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MuscleGroupVolume',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'Week'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('volume', models.FloatField(default=0)),
+                ('sets', models.FloatField(default=0)),
+                ('reps', models.FloatField(default=0)),
+                ('muscle_group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='logger.musclegroup')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['period_start'],
+                'indexes': [models.Index(fields=['user', 'period', 'period_start'], name='musclevol_user_period_idx')],
+                'unique_together': {('user', 'muscle_group', 'period', 'period_start')},
+            },
+        ),
+    ]
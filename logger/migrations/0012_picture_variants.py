@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0011_musclegroupvolume'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='picture',
+            name='medium_jpeg',
+            field=models.ImageField(blank=True, upload_to='pump_pics/variants/'),
+        ),
+        migrations.AddField(
+            model_name='picture',
+            name='medium_webp',
+            field=models.ImageField(blank=True, upload_to='pump_pics/variants/'),
+        ),
+        migrations.AddField(
+            model_name='picture',
+            name='thumb_jpeg',
+            field=models.ImageField(blank=True, upload_to='pump_pics/variants/'),
+        ),
+        migrations.AddField(
+            model_name='picture',
+            name='thumb_webp',
+            field=models.ImageField(blank=True, upload_to='pump_pics/variants/'),
+        ),
+        migrations.AddField(
+            model_name='picture',
+            name='variants_processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:31
+
+import logger.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0012_picture_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField(default=0)),
+                ('refcount', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='picture',
+            name='image',
+            field=models.ImageField(storage=logger.storage.picture_storage, upload_to='pump_pics/'),
+        ),
+        migrations.AlterField(
+            model_name='picture',
+            name='medium_jpeg',
+            field=models.ImageField(blank=True, storage=logger.storage.picture_storage, upload_to='pump_pics/variants/'),
+        ),
+        migrations.AlterField(
+            model_name='picture',
+            name='medium_webp',
+            field=models.ImageField(blank=True, storage=logger.storage.picture_storage, upload_to='pump_pics/variants/'),
+        ),
+        migrations.AlterField(
+            model_name='picture',
+            name='thumb_jpeg',
+            field=models.ImageField(blank=True, storage=logger.storage.picture_storage, upload_to='pump_pics/variants/'),
+        ),
+        migrations.AlterField(
+            model_name='picture',
+            name='thumb_webp',
+            field=models.ImageField(blank=True, storage=logger.storage.picture_storage, upload_to='pump_pics/variants/'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0013_content_addressed_media'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='workout',
+            name='workout_user_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['user', '-date', '-created_at', '-id'], name='workout_user_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+def backfill_refcounts(apps, schema_editor):
+    # pictures uploaded before 0013 have no MediaBlob rows: without them GC
+    # would treat their files as orphans and deletes would never free them
+    from logger.media import rebuild_refcounts
+
+    rebuild_refcounts(apps.get_model('logger', 'Picture'), apps.get_model('logger', 'MediaBlob'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0014_workout_keyset_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_refcounts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 12:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0015_backfill_media_blobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='personalrecord',
+            index=models.Index(fields=['user', '-updated_at'], name='record_user_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 12:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0016_personalrecord_recency_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='baseexercise',
+            name='primary_muscle_group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='primary_exercises', to='logger.musclegroup'),
+        ),
+    ]
@@ -1,5 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User 
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .storage import picture_storage
 
 
 class MuscleGroup(models.Model):
@@ -14,7 +18,8 @@ class Equipment(models.Model):
     
 class BaseExercise(models.Model):
     name = models.CharField(max_length=100, unique=True)
-    primary_muscle_group = models.ForeignKey(MuscleGroup, on_delete=models.CASCADE, related_name='primary_exercises')
+    # null for movements imported without a muscle group (see importer.py)
+    primary_muscle_group = models.ForeignKey(MuscleGroup, null=True, blank=True, on_delete=models.CASCADE, related_name='primary_exercises')
     secondary_muscle_groups = models.ManyToManyField(MuscleGroup, blank=True, related_name='secondary_exercises')
 
     def __str__(self):
@@ -48,6 +53,10 @@ class Workout(models.Model):
         return f"{self.name} - {self.date}"
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            # id last, so keyset pagination's (-date, -created_at, -id) seek and order come from the index
+            models.Index(fields=['user', '-date', '-created_at', '-id'], name='workout_user_date_id_idx'),
+        ]
 
 
 class StageWorkout(models.Model):
@@ -70,6 +79,12 @@ class WorkoutExercise(models.Model):
     notes = models.TextField(blank=True)
     order = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        ordering = ['order', 'id']
+        indexes = [
+            models.Index(fields=['workout', 'order'], name='workoutex_workout_order_idx'),
+        ]
+
 
 class ExerciseProgress(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -84,13 +99,88 @@ class ExerciseProgress(models.Model):
 
     class Meta:
         ordering = ['-date']
+        # the unique_together index already serves (user, exercise, date) lookups
         unique_together = ('user', 'exercise', 'date')
+        indexes = [
+            models.Index(fields=['user', '-date'], name='progress_user_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.exercise.name} ({self.date})"
 
     
 
+class PersonalRecord(models.Model):
+    """
+    A user's best set for one exercise, per record type. Maintained alongside
+    ExerciseProgress and recomputed when the workout holding it is deleted
+    (see records.py).
+    """
+    ONE_REP_MAX = "one_rep_max"
+    HEAVIEST_WEIGHT = "heaviest_weight"
+    BEST_SET_VOLUME = "best_set_volume"
+    RECORD_TYPE_CHOICES = (
+        (ONE_REP_MAX, "Estimated 1RM"),
+        (HEAVIEST_WEIGHT, "Heaviest weight"),
+        (BEST_SET_VOLUME, "Best set volume"),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE)
+    record_type = models.CharField(max_length=20, choices=RECORD_TYPE_CHOICES)
+    value = models.FloatField()
+    weight = models.FloatField()
+    reps = models.PositiveIntegerField()
+    date = models.DateField()
+    # nulled when the workout is deleted, which marks the record for recompute
+    workout = models.ForeignKey(Workout, null=True, blank=True, on_delete=models.SET_NULL, related_name='personal_records')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['exercise__name', 'record_type']
+        unique_together = ('user', 'exercise', 'record_type')
+        indexes = [
+            # home lists the most recently set records first
+            models.Index(fields=['user', '-updated_at'], name='record_user_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.exercise.name} {self.record_type}: {self.value:g}"
+
+
+class MuscleGroupVolume(models.Model):
+    """
+    Materialized training volume per (user, muscle group, week or month),
+    kept up to date on workout create/delete (see rollups.py). Secondary
+    muscle groups are credited with a fraction of each set, so sets and reps
+    are stored as floats.
+    """
+    WEEK = "week"
+    MONTH = "month"
+    PERIOD_CHOICES = (
+        (WEEK, "Week"),
+        (MONTH, "Month"),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    muscle_group = models.ForeignKey(MuscleGroup, on_delete=models.CASCADE)
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateField()  # Monday of the week / first of the month
+    volume = models.FloatField(default=0)
+    sets = models.FloatField(default=0)
+    reps = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ['period_start']
+        unique_together = ('user', 'muscle_group', 'period', 'period_start')
+        indexes = [
+            models.Index(fields=['user', 'period', 'period_start'], name='musclevol_user_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.muscle_group.name} {self.period} of {self.period_start}"
+
+
 class SavedWorkout(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
@@ -117,6 +207,9 @@ class MealEntry(models.Model):
         return f"{self.name} - {self.calories} cal ({self.date})"
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['user', '-date', '-created_at'], name='meal_user_date_idx'),
+        ]
 
 class DailyLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -157,9 +250,97 @@ class UserProfile(models.Model):
     
 class Picture(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    image = models.ImageField(upload_to='pump_pics/')
+    # files are content-addressed and shared between duplicate uploads (see storage.py / media.py)
+    image = models.ImageField(upload_to='pump_pics/', storage=picture_storage)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # resized, EXIF-stripped copies generated in the background (see images.py)
+    thumb_webp = models.ImageField(upload_to='pump_pics/variants/', storage=picture_storage, blank=True)
+    thumb_jpeg = models.ImageField(upload_to='pump_pics/variants/', storage=picture_storage, blank=True)
+    medium_webp = models.ImageField(upload_to='pump_pics/variants/', storage=picture_storage, blank=True)
+    medium_jpeg = models.ImageField(upload_to='pump_pics/variants/', storage=picture_storage, blank=True)
+    variants_processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-uploaded_at'], name='picture_user_uploaded_idx'),
+        ]
 
     def __str__(self):
         return f"Pump Pic by {self.user.username} at {self.uploaded_at:%Y-%m-%d %H:%M}"
-    
\ No newline at end of file
+
+    def save(self, *args, **kwargs):
+        # storing a file and acquiring its reference (post_save) commit together, see storage.py
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+
+class MediaBlob(models.Model):
+    """Reference count for a content-addressed media file shared by one or more Pictures"""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField(default=0)
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
+
+
+class AgentJob(models.Model):
+    """
+    One trigger_agent request, tracked from queueing through the n8n callback.
+    Doubles as the dispatch outbox: queued rows are leased by a dispatcher and
+    rescheduled with backoff until n8n accepts them (see agents.py).
+    """
+    STATUS_QUEUED = "queued"
+    STATUS_DISPATCHED = "dispatched"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_DISPATCHED, "Dispatched"),
+        (STATUS_COMPLETED, "Completed"),
+        (STATUS_FAILED, "Failed"),
+    )
+    AGENT_CHOICES = (
+        ("workout", "Workout"),
+        ("meal", "Meal"),
+    )
+
+    user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    agent_type = models.CharField(max_length=12, choices=AGENT_CHOICES)
+    payload = models.JSONField()
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    n8n_status = models.PositiveIntegerField(null=True, blank=True)
+    n8n_response = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    workout = models.ForeignKey(Workout, null=True, blank=True, on_delete=models.SET_NULL, related_name='agent_jobs')
+    meal = models.ForeignKey(MealEntry, null=True, blank=True, on_delete=models.SET_NULL, related_name='agent_jobs')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    lease_token = models.CharField(max_length=32, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='agentjob_outbox_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.agent_type} agent job #{self.pk} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """Stored response for an agent callback, so retried webhooks replay it instead of writing again."""
+    key = models.CharField(max_length=64, unique=True)
+    endpoint = models.CharField(max_length=100)
+    response_status = models.PositiveIntegerField()
+    response_body = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.endpoint} {self.key[:12]}… ({self.response_status})"
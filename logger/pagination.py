@@ -0,0 +1,60 @@
+"""
+Keyset (cursor) pagination for workout history.
+
+Pages are walked in Workout.Meta.ordering order (-date, -created_at) with id
+as the tie-breaker, so each page is "rows after the last one I saw". The
+(user, -date, -created_at, -id) index serves both the seek (via the sargable
+``date <= cursor date`` bound) and the ordering, so a deep page reads about
+as many index entries as the first, unlike OFFSET which scans every skipped
+row. Cursors are opaque base64 tokens.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(workout):
+    position = [workout.date.isoformat(), workout.created_at.isoformat(), workout.pk]
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(date, created_at, id) from a cursor token; raises InvalidCursor on anything malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        day, created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return date.fromisoformat(day), datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def workouts_after(queryset, cursor):
+    """Workouts strictly after the cursor position in (-date, -created_at, -id) order"""
+    day, created_at, pk = decode_cursor(cursor)
+    # the OR alone can't bound an index range; date__lte gives SQLite a seek start
+    return queryset.filter(date__lte=day).filter(
+        Q(date__lt=day)
+        | Q(date=day, created_at__lt=created_at)
+        | Q(date=day, created_at=created_at, pk__lt=pk)
+    )
+
+
+def keyset_page(queryset, cursor=None, page_size=20):
+    """
+    One page of workouts plus the cursor for the next page (None on the last page).
+    Fetches page_size + 1 rows to know whether another page exists.
+    """
+    queryset = queryset.order_by('-date', '-created_at', '-pk')
+    if cursor:
+        queryset = workouts_after(queryset, cursor)
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    return rows, encode_cursor(rows[-1]) if has_more else None
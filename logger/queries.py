@@ -0,0 +1,51 @@
+"""
+Querysets behind the per-user hot pages (home, progress, recent workouts).
+
+The views build their queries from these helpers, and
+``manage.py explain_hot_queries`` plans the very same querysets, so the report
+always reflects what production runs.
+"""
+from .models import DailyLog, ExerciseProgress, PersonalRecord, Picture, StageWorkout, Workout
+from .serializers import workout_detail_queryset
+
+
+def daily_logs(user, day):
+    return DailyLog.objects.filter(user=user, date=day)
+
+
+def daily_log_workouts(daily_log):
+    return workout_detail_queryset(daily_log.workouts.all()).order_by('-date', '-created_at')
+
+
+def daily_log_meals(daily_log):
+    return daily_log.meals.all().order_by('-date', '-created_at')
+
+
+def recent_pictures(user, limit=9):
+    return Picture.objects.filter(user=user).order_by('-uploaded_at')[:limit]
+
+
+def staged_workouts(user):
+    return StageWorkout.objects.filter(user=user).order_by('pk')
+
+
+def personal_records_by_recency(user):
+    return PersonalRecord.objects.filter(user=user).order_by('-updated_at')
+
+
+def recent_progress(user, limit=50):
+    return ExerciseProgress.objects.filter(user=user).select_related('exercise').order_by('-date')[:limit]
+
+
+def progress_exercise_choices(user):
+    """(exercise id, name) pairs for the progress page's dropdown"""
+    return (
+        ExerciseProgress.objects.filter(user=user)
+        .order_by('exercise__name')
+        .values_list('exercise__id', 'exercise__name')
+        .distinct()
+    )
+
+
+def recent_workouts(user, limit=5):
+    return workout_detail_queryset(Workout.objects.filter(user=user))[:limit]
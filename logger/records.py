@@ -0,0 +1,126 @@
+"""
+Personal records per (user, exercise, record type).
+
+New sets are folded into PersonalRecord from the same write paths that update
+ExerciseProgress, so reading a user's bests is one indexed row per exercise.
+Deleting the workout that holds a record nulls its ``workout`` FK; the
+post_delete handler in signals.py then recomputes just those records from
+the remaining sets. ``manage.py rebuild_personal_records`` rebuilds from scratch.
+"""
+from django.db import transaction
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+from .models import PersonalRecord, WorkoutExercise
+
+RECORD_UPDATE_FIELDS = ['value', 'weight', 'reps', 'date', 'workout', 'updated_at']
+
+
+def record_values(reps, weight):
+    """{record_type: value} for one set, or {} for unweighted sets"""
+    weight = float(weight or 0)
+    reps = reps or 0
+    if weight <= 0:
+        return {}
+    return {
+        # same Epley estimate as ExerciseProgress.one_rep_max_est
+        PersonalRecord.ONE_REP_MAX: weight * (1 + reps / 30.0),
+        PersonalRecord.HEAVIEST_WEIGHT: weight,
+        PersonalRecord.BEST_SET_VOLUME: weight * reps,
+    }
+
+
+def fold_record_candidates(candidates, best=None):
+    """
+    Fold (user_id, exercise_id, workout_id, date, reps, weight) sets into the best
+    PersonalRecord per key. Earlier candidates win ties, so feed them oldest first.
+    """
+    best = {} if best is None else best
+    for user_id, exercise_id, workout_id, day, reps, weight in candidates:
+        for record_type, value in record_values(reps, weight).items():
+            key = (user_id, exercise_id, record_type)
+            current = best.get(key)
+            if current is None or value > current.value:
+                best[key] = PersonalRecord(
+                    user_id=user_id, exercise_id=exercise_id, record_type=record_type,
+                    value=value, weight=float(weight), reps=reps or 0, date=day, workout_id=workout_id,
+                )
+    return best
+
+
+def apply_record_candidates(candidates):
+    """
+    Raise records that the new sets beat: one query to load the current records
+    for the touched keys and one upsert for the ones that improved.
+    """
+    best = fold_record_candidates(candidates)
+    if not best:
+        return []
+
+    # compare and write in one transaction so a concurrent writer can't slip a
+    # better record in between and have it overwritten by this worse one
+    with transaction.atomic():
+        existing = {
+            (r.user_id, r.exercise_id, r.record_type): r.value
+            for r in PersonalRecord.objects.select_for_update().filter(
+                user_id__in={key[0] for key in best},
+                exercise_id__in={key[1] for key in best},
+            ).only('user_id', 'exercise_id', 'record_type', 'value')
+        }
+        improved = [record for key, record in best.items() if key not in existing or record.value > existing[key]]
+        if improved:
+            PersonalRecord.objects.bulk_create(
+                improved,
+                update_conflicts=True,
+                unique_fields=['user', 'exercise', 'record_type'],
+                update_fields=RECORD_UPDATE_FIELDS,
+            )
+    return improved
+
+
+_RECORD_ORDERING = {
+    PersonalRecord.ONE_REP_MAX: Cast('weight', FloatField()) * (1 + F('reps') / 30.0),
+    PersonalRecord.HEAVIEST_WEIGHT: Cast('weight', FloatField()),
+    PersonalRecord.BEST_SET_VOLUME: Cast('weight', FloatField()) * F('reps'),
+}
+
+
+def recompute_records(records):
+    """
+    Targeted recompute for records that lost their workout: for each one, the
+    best remaining set is a single ordered query over that user's sets of the
+    exercise. Records with no remaining weighted set are deleted.
+    """
+    updated, removed = [], []
+    for record in records:
+        row = (
+            WorkoutExercise.objects.filter(user_id=record.user_id, exercise_id=record.exercise_id, weight__gt=0)
+            .annotate(record_value=_RECORD_ORDERING[record.record_type])
+            .order_by('-record_value', 'workout__date', 'id')
+            .values('record_value', 'weight', 'reps', 'workout_id', 'workout__date')
+            .first()
+        )
+        if row is None:
+            removed.append(record.pk)
+            continue
+        record.value = row['record_value']
+        record.weight = float(row['weight'])
+        record.reps = row['reps']
+        record.workout_id = row['workout_id']
+        record.date = row['workout__date']
+        updated.append(record)
+
+    with transaction.atomic():
+        if removed:
+            PersonalRecord.objects.filter(pk__in=removed).delete()
+        if updated:
+            PersonalRecord.objects.bulk_update(updated, ['value', 'weight', 'reps', 'workout', 'date'])
+    return updated, removed
+
+
+def recompute_orphaned_records(user_id):
+    """Recompute every record of this user whose workout has been deleted"""
+    orphaned = list(PersonalRecord.objects.filter(user_id=user_id, workout__isnull=True))
+    if orphaned:
+        recompute_records(orphaned)
+    return len(orphaned)
@@ -0,0 +1,156 @@
+"""
+Weekly and monthly training volume per muscle group.
+
+Working this out per request means joining every WorkoutExercise through
+Exercise and BaseExercise to the primary and secondary muscle groups. Instead,
+MuscleGroupVolume rows are adjusted whenever a workout is created (alongside
+ExerciseProgress) or deleted (pre_delete in signals.py), using the muscle
+mapping from the in-memory catalog (or one join query for exercises the
+catalog hasn't seen yet), so reads only touch the rollup table.
+``manage.py rebuild_muscle_rollups`` rebuilds it from scratch.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+
+from .catalog import get_exercise_info
+from .models import BaseExercise, Exercise, MuscleGroupVolume
+
+ROLLUP_UPDATE_FIELDS = ['volume', 'sets', 'reps']
+
+
+def muscle_group_weights():
+    weights = getattr(settings, 'MUSCLE_GROUP_WEIGHTS', {})
+    return weights.get('primary', 1.0), weights.get('secondary', 0.5)
+
+
+def period_starts(day):
+    """(period, period_start) pairs a date rolls up into; weeks start on Monday like TruncWeek"""
+    return (
+        (MuscleGroupVolume.WEEK, day - timedelta(days=day.weekday())),
+        (MuscleGroupVolume.MONTH, day.replace(day=1)),
+    )
+
+
+def exercise_muscle_groups(exercise_ids):
+    """
+    {exercise_id: (primary_muscle_group_id, secondary_muscle_group_ids)}. Served
+    from the catalog; exercises it doesn't know yet (e.g. created earlier in the
+    current transaction, whose catalog bump waits for commit) cost two queries.
+    """
+    groups, missing = {}, []
+    for exercise_id in exercise_ids:
+        info = get_exercise_info(exercise_id)
+        if info is None:
+            missing.append(exercise_id)
+        else:
+            groups[exercise_id] = (info.primary_muscle_group_id, info.secondary_muscle_group_ids)
+    if missing:
+        rows = list(Exercise.objects.filter(id__in=missing).values_list(
+            'id', 'base_exercise_id', 'base_exercise__primary_muscle_group_id'
+        ))
+        secondaries = {}
+        through = BaseExercise.secondary_muscle_groups.through
+        for base_id, mg_id in through.objects.filter(
+            baseexercise_id__in={base_id for _, base_id, _ in rows}
+        ).order_by('id').values_list('baseexercise_id', 'musclegroup_id'):
+            secondaries.setdefault(base_id, []).append(mg_id)
+        for exercise_id, base_id, primary_id in rows:
+            groups[exercise_id] = (primary_id, tuple(secondaries.get(base_id, ())))
+    return groups
+
+
+def fold_rollup_entries(entries, sign=1, deltas=None):
+    """
+    Fold (user_id, exercise_id, date, sets, reps, weight) entries into volume/sets/reps
+    deltas per (user_id, muscle_group_id, period, period_start). sign=-1 removes them.
+    """
+    deltas = {} if deltas is None else deltas
+    entries = list(entries)
+    muscle_groups = exercise_muscle_groups({entry[1] for entry in entries})
+    primary_weight, secondary_weight = muscle_group_weights()
+    for user_id, exercise_id, day, sets, reps, weight in entries:
+        if day is None:
+            continue
+        sets = sets or 0
+        total_reps = (reps or 0) * sets
+        volume = float(weight or 0) * total_reps
+
+        # every WorkoutExercise has an exercise, so this lookup can't miss
+        primary_id, secondary_ids = muscle_groups[exercise_id]
+        shares = []
+        if primary_id is not None:
+            shares.append((primary_id, primary_weight))
+        shares.extend((mg, secondary_weight) for mg in secondary_ids)
+
+        for muscle_group_id, share in shares:
+            share *= sign
+            for period, start in period_starts(day):
+                delta = deltas.setdefault((user_id, muscle_group_id, period, start), [0.0, 0.0, 0.0])
+                delta[0] += volume * share
+                delta[1] += sets * share
+                delta[2] += total_reps * share
+    return deltas
+
+
+def apply_rollup_deltas(deltas):
+    """
+    Add folded deltas to MuscleGroupVolume: one query to load the touched rows,
+    one upsert, and one delete for rows emptied by removed workouts.
+    """
+    if not deltas:
+        return
+    # read-modify-write in one transaction (BEGIN IMMEDIATE / row locks), so
+    # concurrent workouts in the same period can't lose each other's deltas
+    with transaction.atomic():
+        existing = {
+            (r.user_id, r.muscle_group_id, r.period, r.period_start): r
+            for r in MuscleGroupVolume.objects.select_for_update().filter(
+                user_id__in={key[0] for key in deltas},
+                muscle_group_id__in={key[1] for key in deltas},
+                period_start__in={key[3] for key in deltas},
+            )
+        }
+
+        rows, emptied = [], []
+        for key, (volume, sets, reps) in deltas.items():
+            row = existing.get(key)
+            if row is None:
+                row = MuscleGroupVolume(user_id=key[0], muscle_group_id=key[1], period=key[2], period_start=key[3])
+            row.volume += volume
+            row.sets += sets
+            row.reps += reps
+            # float shares don't always cancel exactly; anything this small is an empty period
+            if row.sets < 1e-6:
+                if row.pk:
+                    emptied.append(row.pk)
+            else:
+                rows.append(row)
+
+        if emptied:
+            MuscleGroupVolume.objects.filter(pk__in=emptied).delete()
+        if rows:
+            MuscleGroupVolume.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['user', 'muscle_group', 'period', 'period_start'],
+                update_fields=ROLLUP_UPDATE_FIELDS,
+            )
+
+
+def apply_rollup_entries(entries, sign=1):
+    apply_rollup_deltas(fold_rollup_entries(entries, sign=sign))
+
+
+def remove_workout_from_rollups(workout):
+    """Subtract a workout's sets from the rollups; call before its WorkoutExercises are deleted"""
+    apply_rollup_entries(
+        (
+            (workout.user_id, exercise_id, workout.date, sets, reps, weight)
+            for exercise_id, sets, reps, weight in workout.workoutexercise_set.values_list(
+                'exercise_id', 'sets', 'reps', 'weight'
+            )
+        ),
+        sign=-1,
+    )
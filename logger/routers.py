@@ -0,0 +1,102 @@
+"""
+Routing of read-heavy analytics queries to a replica.
+
+Writes, and reads by default, go to the primary ("default"). Views that can
+tolerate slightly stale data opt in with @allow_stale_reads. While such a view
+runs, reads are sent to settings.ANALYTICS_DATABASE (when that alias is
+configured), except:
+
+* for REPLICA_STICKY_SECONDS after any write to the user's data (marked by
+  user_cache.bump_user_generation), so users see their own writes, and
+* inside a transaction on the primary.
+
+Locally, point ANALYTICS_DB_NAME at a second SQLite file and run
+``manage.py simulate_replica_lag`` to copy the primary into it with a delay.
+"""
+import contextlib
+import contextvars
+import functools
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+PRIMARY = 'default'
+
+_stale_reads = contextvars.ContextVar('logger_stale_reads', default=False)
+
+
+def analytics_alias():
+    alias = getattr(settings, 'ANALYTICS_DATABASE', 'analytics')
+    return alias if alias in settings.DATABASES else None
+
+
+def _last_write_key(user_id):
+    return f'logger:user:{user_id}:last_write'
+
+
+def mark_user_write(user_id):
+    """Pin this user's stale-read views to the primary for the sticky window"""
+    cache.set(_last_write_key(user_id), time.time(), timeout=getattr(settings, 'REPLICA_STICKY_SECONDS', 10))
+
+
+def recently_wrote(user_id):
+    last_write = cache.get(_last_write_key(user_id))
+    return last_write is not None and time.time() - last_write < getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+
+def read_alias():
+    """Alias reads should use right now; pass it to .using() for querysets evaluated after the view returns"""
+    alias = analytics_alias()
+    if alias and _stale_reads.get() and not connections[PRIMARY].in_atomic_block:
+        return alias
+    return PRIMARY
+
+
+def allow_stale_reads(view):
+    """
+    Let a view's reads go to the analytics replica, unless the requesting user
+    wrote within the sticky window. Apply outside @api_view/@login_required.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        user = getattr(request, 'user', None)
+        sticky = user is not None and user.is_authenticated and recently_wrote(user.pk)
+        token = _stale_reads.set(not sticky)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _stale_reads.reset(token)
+    return wrapper
+
+
+@contextlib.contextmanager
+def primary_reads():
+    """
+    Read from the primary inside this block even in a stale-read view. Use it
+    when filling caches keyed on the current version of the data, which must
+    never hold a replica's older copy.
+    """
+    token = _stale_reads.set(False)
+    try:
+        yield
+    finally:
+        _stale_reads.reset(token)
+
+
+class AnalyticsRouter:
+    """Primary for writes and migrations; the analytics replica only for opted-in reads"""
+
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica is a copy of the primary, so objects from either relate freely
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
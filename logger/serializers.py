@@ -1,10 +1,14 @@
 from rest_framework import serializers
 from .models import (
-    MuscleGroup, Equipment, BaseExercise, Exercise, Workout, WorkoutExercise,
-    MealEntry, DailyLog
+    MuscleGroup, Equipment, Exercise, Workout, WorkoutExercise,
+    MealEntry, DailyLog, AgentJob, PersonalRecord
 )
+from .utils import resolve_exercises, build_workout_exercises
+from .catalog import get_exercise_info
 from datetime import date
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Prefetch
 
 
 # --- Basic Model Serializers ---
@@ -24,10 +28,12 @@ class EquipmentSerializer(serializers.ModelSerializer):
 
 
 class ExerciseSerializer(serializers.ModelSerializer):
-    """Convert Exercise objects to/from JSON with related data"""
-    primary_muscle_group_name = serializers.CharField(source='primary_muscle_group.name', read_only=True)
-    equipment_name = serializers.CharField(source='equipment.name', read_only=True)
+    """Convert Exercise objects to/from JSON with related data (read from the catalog cache)"""
+    primary_muscle_group = serializers.SerializerMethodField()
+    primary_muscle_group_name = serializers.SerializerMethodField()
+    secondary_muscle_groups = serializers.SerializerMethodField()
     secondary_muscle_groups_names = serializers.SerializerMethodField()
+    equipment_name = serializers.SerializerMethodField()
 
     class Meta:
         model = Exercise
@@ -37,16 +43,38 @@ class ExerciseSerializer(serializers.ModelSerializer):
             'equipment', 'equipment_name'
         ]
 
+    def _info(self, obj):
+        return get_exercise_info(obj.id)
+
+    def get_primary_muscle_group(self, obj):
+        info = self._info(obj)
+        return info.primary_muscle_group_id if info else obj.base_exercise.primary_muscle_group_id
+
+    def get_primary_muscle_group_name(self, obj):
+        info = self._info(obj)
+        if info:
+            return info.primary_muscle_group
+        return obj.primary_muscle_group.name if obj.primary_muscle_group else None
+
+    def get_secondary_muscle_groups(self, obj):
+        info = self._info(obj)
+        return list(info.secondary_muscle_group_ids) if info else [mg.id for mg in obj.secondary_muscle_groups]
+
     def get_secondary_muscle_groups_names(self, obj):
         """Get list of secondary muscle group names"""
-        return [mg.name for mg in obj.secondary_muscle_groups.all()]
+        info = self._info(obj)
+        return list(info.secondary_muscle_groups) if info else [mg.name for mg in obj.secondary_muscle_groups]
+
+    def get_equipment_name(self, obj):
+        info = self._info(obj)
+        return info.equipment if info else obj.equipment.name
 
 
 class WorkoutExerciseSerializer(serializers.ModelSerializer):
-    """Convert WorkoutExercise junction table to/from JSON"""
-    exercise_name = serializers.CharField(source='exercise.name', read_only=True)
-    primary_muscle_group = serializers.CharField(source='exercise.primary_muscle_group.name', read_only=True)
-    equipment = serializers.CharField(source='exercise.equipment.name', read_only=True)
+    """Convert WorkoutExercise junction table to/from JSON (exercise metadata from the catalog cache)"""
+    exercise_name = serializers.SerializerMethodField()
+    primary_muscle_group = serializers.SerializerMethodField()
+    equipment = serializers.SerializerMethodField()
 
     class Meta:
         model = WorkoutExercise
@@ -55,6 +83,21 @@ class WorkoutExerciseSerializer(serializers.ModelSerializer):
             'sets', 'reps', 'weight', 'rest_seconds', 'notes', 'order'
         ]
 
+    def get_exercise_name(self, obj):
+        info = get_exercise_info(obj.exercise_id)
+        return info.name if info else obj.exercise.name
+
+    def get_primary_muscle_group(self, obj):
+        info = get_exercise_info(obj.exercise_id)
+        if info:
+            return info.primary_muscle_group
+        muscle_group = obj.exercise.primary_muscle_group
+        return muscle_group.name if muscle_group else None
+
+    def get_equipment(self, obj):
+        info = get_exercise_info(obj.exercise_id)
+        return info.equipment if info else obj.exercise.equipment.name
+
 
 class WorkoutSerializer(serializers.ModelSerializer):
     """Convert Workout objects to/from JSON with all exercises included"""
@@ -70,9 +113,35 @@ class WorkoutSerializer(serializers.ModelSerializer):
 
     def get_exercise_count(self, obj):
         """Count how many exercises are in this workout"""
+        # use the annotation / prefetch from workout_detail_queryset when present
+        if hasattr(obj, 'exercise_count'):
+            return obj.exercise_count
+        prefetched = getattr(obj, '_prefetched_objects_cache', {})
+        if 'workoutexercise_set' in prefetched:
+            return len(prefetched['workoutexercise_set'])
         return obj.workoutexercise_set.count()
 
 
+def workout_exercise_detail_queryset():
+    """WorkoutExercise rows with the catalog rows WorkoutSerializer reads joined in"""
+    return WorkoutExercise.objects.select_related(
+        'exercise__base_exercise__primary_muscle_group', 'exercise__equipment'
+    )
+
+
+def workout_detail_queryset(queryset=None):
+    """
+    Workouts ready for WorkoutSerializer (and templates walking workoutexercise_set):
+    exercises are prefetched with their catalog rows joined in and the exercise
+    count is annotated, so serializing any number of workouts costs two queries.
+    """
+    if queryset is None:
+        queryset = Workout.objects.all()
+    return queryset.prefetch_related(
+        Prefetch('workoutexercise_set', queryset=workout_exercise_detail_queryset())
+    ).annotate(exercise_count=Count('workoutexercise'))
+
+
 # --- AI Workout Creation Serializer ---
 
 class ExerciseInputSerializer(serializers.Serializer):
@@ -126,53 +195,19 @@ class AIWorkoutCreateSerializer(serializers.Serializer):
         except User.DoesNotExist:
             user = User.objects.first()
 
-        # create the workout
-        workout = Workout.objects.create(
-            user=user,
-            name=workout_name,
-            date=workout_date,
-            notes=notes
-        )
-
-        # create or link exercises properly
-        for order, ex in enumerate(exercises_data):
-            mg = self._get_or_create_muscle_group(ex.get('muscle_group', 'General'))
-            eq = self._get_or_create_equipment(ex.get('equipment', 'Bodyweight'))
-
-            # base exercise represents generic movement
-            base_ex, _ = BaseExercise.objects.get_or_create(
-                name=ex['name'],
-                defaults={'primary_muscle_group': mg}
-            )
-
-            # leaf Exercise is instance with specific equipment
-            exercise, _ = Exercise.objects.get_or_create(
-                name=ex['name'],
-                defaults={'base_exercise': base_ex, 'equipment': eq}
-            )
-
-            WorkoutExercise.objects.create(
+        # catalog lookups + inserts are a fixed number of queries per payload;
+        # resolved first so a catalog reload never runs under the write lock
+        exercise_ids = resolve_exercises(exercises_data)
+        with transaction.atomic():
+            workout = Workout.objects.create(
                 user=user,
-                name=ex['name'],
-                workout=workout,
-                exercise=exercise,
-                sets=int(ex.get('sets', 3)),
-                reps=int(ex.get('reps', 10)),
-                weight=float(ex['weight']) if ex.get('weight') is not None else None,
-                rest_seconds=int(ex['rest_seconds']) if ex.get('rest_seconds') else None,
-                notes=ex.get('notes') or "",
-                order=order
+                name=workout_name,
+                date=workout_date,
+                notes=notes
             )
+            WorkoutExercise.objects.bulk_create(build_workout_exercises(workout, exercises_data, exercise_ids))
         return workout
 
-    def _get_or_create_muscle_group(self, name):
-        mg, _ = MuscleGroup.objects.get_or_create(name=name)
-        return mg
-
-    def _get_or_create_equipment(self, name):
-        eq, _ = Equipment.objects.get_or_create(name=name)
-        return eq
-
 
 # --- Meal and Daily Log Serializers ---
 
@@ -221,5 +256,36 @@ class AIMealCreateSerializer(serializers.Serializer):
             fats=validated_data.get('fats') or 0,
             date=meal_date,
         )
-    
-    
\ No newline at end of file
+
+
+# --- Agent Job Serializers ---
+
+class AgentJobSerializer(serializers.ModelSerializer):
+    """Status of a queued agent request, with the workout or meal it produced"""
+    workout = WorkoutSerializer(read_only=True)
+    meal = MealEntrySerializer(read_only=True)
+
+    class Meta:
+        model = AgentJob
+        fields = [
+            'id', 'agent_type', 'status', 'n8n_status', 'error',
+            'workout', 'meal', 'created_at', 'updated_at'
+        ]
+
+
+# --- Personal Record Serializers ---
+
+class PersonalRecordSerializer(serializers.ModelSerializer):
+    """A user's best set for one exercise and record type (exercise name from the catalog cache)"""
+    exercise_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PersonalRecord
+        fields = [
+            'exercise', 'exercise_name', 'record_type', 'value',
+            'weight', 'reps', 'date', 'workout', 'updated_at'
+        ]
+
+    def get_exercise_name(self, obj):
+        info = get_exercise_info(obj.exercise_id)
+        return info.name if info else obj.exercise.name
@@ -0,0 +1,129 @@
+"""
+HTTP serving of pump pic files.
+
+The media view answers conditional requests from a stat() alone: content-
+addressed names carry their sha256, which is used directly as a strong ETag,
+and Last-Modified comes from the file's mtime. Byte ranges are served by
+seeking into the file. With settings.MEDIA_ACCEL set, Python only checks
+ownership and sets headers, and the front-end server sends the body:
+
+* ``'nginx'``: ``X-Accel-Redirect`` to MEDIA_ACCEL_PREFIX + name (an
+  ``internal`` location aliased to MEDIA_ROOT), or
+* ``'apache'``: ``X-Sendfile`` with the absolute path (mod_xsendfile).
+"""
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+HASH_NAME_RE = re.compile(r'^[0-9a-f]{64}$')
+RANGE_CHUNK_SIZE = 64 * 1024
+
+# content-addressed files never change, so browsers may keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'private, no-cache'
+
+
+def file_etag(name, stat):
+    """Strong ETag: the content hash for content-addressed names, else size and mtime"""
+    stem = os.path.splitext(posixpath.basename(name))[0]
+    if HASH_NAME_RE.match(stem):
+        return quote_etag(stem)
+    return quote_etag(f'{stat.st_size:x}-{stat.st_mtime_ns:x}')
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single "bytes=" range, None to ignore the header
+    (absent, malformed or multi-range), or False when it can't be satisfied.
+    """
+    match = RANGE_RE.match((header or '').strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        # suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+def _iter_range(path, start, length):
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        while length > 0:
+            data = handle.read(min(RANGE_CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def _accel_response(name, path):
+    accel = getattr(settings, 'MEDIA_ACCEL', None)
+    if accel == 'nginx':
+        response = HttpResponse()
+        prefix = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + name
+        return response
+    if accel == 'apache':
+        response = HttpResponse()
+        response['X-Sendfile'] = path
+        return response
+    return None
+
+
+def file_response(request, storage, name):
+    """
+    Response for one stored file, honouring If-None-Match/If-Modified-Since,
+    Range/If-Range and the MEDIA_ACCEL offload setting. Raises OSError if missing.
+    """
+    path = storage.path(name)
+    stat = os.stat(path)
+    etag = file_etag(name, stat)
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        response = _accel_response(name, path)
+        if response is not None:
+            # the front-end server handles ranges itself
+            response['Content-Type'] = content_type
+        else:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), stat.st_size)
+            if_range = request.META.get('HTTP_IF_RANGE')
+            if byte_range is not None and if_range and if_range not in (etag, http_date(last_modified)):
+                byte_range = None
+            if byte_range is False:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{stat.st_size}'
+            elif byte_range:
+                start, end = byte_range
+                length = end - start + 1
+                response = StreamingHttpResponse(_iter_range(path, start, length), status=206, content_type=content_type)
+                response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+                response['Content-Length'] = str(length)
+            else:
+                response = FileResponse(open(path, 'rb'), content_type=content_type)
+                response.block_size = RANGE_CHUNK_SIZE
+                response['Content-Length'] = str(stat.st_size)
+            response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    stem = os.path.splitext(posixpath.basename(name))[0]
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if HASH_NAME_RE.match(stem) else REVALIDATE_CACHE_CONTROL
+    return response
@@ -0,0 +1,99 @@
+from collections import Counter
+
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from .catalog import invalidate_catalog
+from .media import acquire, picture_file_names, release
+from .records import recompute_orphaned_records
+from .rollups import remove_workout_from_rollups
+from .sqlite import configure_connection
+from .models import (
+    MuscleGroup, Equipment, BaseExercise, Exercise,
+    DailyLog, Workout, WorkoutExercise, MealEntry, Picture, StageWorkout, ExerciseProgress
+)
+from .user_cache import bump_user_generation
+
+
+# --- SQLite connection pragmas ---
+
+connection_created.connect(configure_connection, dispatch_uid='sqlite_pragmas')
+
+
+CATALOG_MODELS = (MuscleGroup, Equipment, BaseExercise, Exercise)
+
+
+def _catalog_changed(sender, **kwargs):
+    invalidate_catalog()
+
+
+for _model in CATALOG_MODELS:
+    post_save.connect(_catalog_changed, sender=_model, dispatch_uid=f'catalog_save_{_model.__name__}')
+    post_delete.connect(_catalog_changed, sender=_model, dispatch_uid=f'catalog_delete_{_model.__name__}')
+
+
+@receiver(m2m_changed, sender=BaseExercise.secondary_muscle_groups.through, dispatch_uid='catalog_secondary_muscles')
+def _secondary_muscles_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_catalog()
+
+
+# --- Per-user cache generations (home dashboard, API ETags) ---
+
+USER_DATA_MODELS = (DailyLog, Workout, WorkoutExercise, MealEntry, Picture, StageWorkout, ExerciseProgress)
+
+
+def _user_data_changed(sender, instance, **kwargs):
+    bump_user_generation(instance.user_id)
+
+
+for _model in USER_DATA_MODELS:
+    post_save.connect(_user_data_changed, sender=_model, dispatch_uid=f'user_gen_save_{_model.__name__}')
+    post_delete.connect(_user_data_changed, sender=_model, dispatch_uid=f'user_gen_delete_{_model.__name__}')
+
+
+@receiver(m2m_changed, sender=DailyLog.workouts.through, dispatch_uid='user_gen_daily_workouts')
+@receiver(m2m_changed, sender=DailyLog.meals.through, dispatch_uid='user_gen_daily_meals')
+def _daily_log_links_changed(sender, instance, action, **kwargs):
+    # instance is the DailyLog, or the Workout/MealEntry on the reverse side; all carry user_id
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_user_generation(instance.user_id)
+
+
+# --- Personal records ---
+
+@receiver(post_delete, sender=Workout, dispatch_uid='personal_records_workout_deleted')
+def _workout_deleted(sender, instance, **kwargs):
+    # records held by this workout had their FK nulled by the delete; recompute them
+    recompute_orphaned_records(instance.user_id)
+
+
+# --- Muscle-group volume rollups ---
+
+@receiver(pre_delete, sender=Workout, dispatch_uid='muscle_rollups_workout_deleted')
+def _workout_deleting(sender, instance, **kwargs):
+    # runs inside the delete's transaction, while the workout's sets still exist
+    remove_workout_from_rollups(instance)
+
+
+# --- Content-addressed picture files ---
+
+@receiver(post_init, sender=Picture, dispatch_uid='media_refs_snapshot')
+def _picture_loaded(sender, instance, **kwargs):
+    # file names as last saved, to diff against on the next save
+    instance._media_names = picture_file_names(instance) if instance.pk else []
+
+
+@receiver(post_save, sender=Picture, dispatch_uid='media_refs_saved')
+def _picture_saved(sender, instance, **kwargs):
+    names = Counter(picture_file_names(instance))
+    previous = Counter(instance._media_names)
+    acquire((names - previous).elements())
+    release((previous - names).elements())
+    instance._media_names = list(names.elements())
+
+
+@receiver(post_delete, sender=Picture, dispatch_uid='media_refs_deleted')
+def _picture_deleted(sender, instance, **kwargs):
+    release(picture_file_names(instance))
@@ -0,0 +1,52 @@
+"""
+SQLite connection tuning.
+
+Every new SQLite connection gets the pragmas from settings.SQLITE_PRAGMAS
+(merged over the defaults below) via the connection_created signal:
+
+* WAL lets readers keep reading while one writer commits, instead of
+  every page load queueing behind agent callbacks;
+* busy_timeout makes a blocked writer wait instead of failing with
+  "database is locked";
+* synchronous=NORMAL is durable under WAL except on power loss, and skips an
+  fsync per commit;
+* mmap_size, cache_size and temp_store keep hot pages and temp b-trees in memory.
+
+Write transactions should also start with BEGIN IMMEDIATE (DATABASES OPTIONS
+``transaction_mode``), so they take the write lock up front rather than
+failing on a lock upgrade halfway through. ``manage.py sqlite_maintenance``
+runs optimize and checkpoints the WAL.
+"""
+from django.conf import settings
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,           # ms
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,       # negative = KiB, i.e. 64 MiB
+    'temp_store': 'MEMORY',
+    'foreign_keys': 'ON',
+}
+
+
+def configured_pragmas():
+    return {**DEFAULT_PRAGMAS, **getattr(settings, 'SQLITE_PRAGMAS', {})}
+
+
+def pragma_statements(pragmas):
+    return [f'PRAGMA {name}={value}' for name, value in pragmas.items() if value is not None]
+
+
+def apply_pragmas(cursor, pragmas=None):
+    """Run the pragmas on a DB-API cursor (Django or plain sqlite3)"""
+    for statement in pragma_statements(configured_pragmas() if pragmas is None else pragmas):
+        cursor.execute(statement)
+
+
+def configure_connection(sender, connection, **kwargs):
+    """connection_created receiver: tune every new SQLite connection"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor)
@@ -0,0 +1,88 @@
+"""
+Content-addressed file storage for pump pics.
+
+Files are stored under their sha256, sharded two levels deep
+(``pump_pics/ab/cd/abcd….jpg``), so uploading the same bytes twice resolves
+to the existing file with a hash and an existence check and no second write.
+Since several Pictures can share one file, deleting a file is left to the
+reference counts in media.py rather than to the model that used it.
+
+Reusing an existing file is only safe if it cannot be collected before the
+new Picture's reference is counted. ``_save`` therefore checks for the file
+inside a transaction that locks its MediaBlob row (under SQLite's
+BEGIN IMMEDIATE, the database write lock), and Picture saves run in one
+transaction, so the check and the reference acquired by the post_save signal
+commit together; media.collect_garbage re-checks the count under the same
+lock before it unlinks anything.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def content_name(self, name, content):
+        """Hash-based storage name for content uploaded as ``name``; keeps its directory and extension"""
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        directory, filename = posixpath.split(name)
+        ext = os.path.splitext(filename)[1].lower()
+        return posixpath.join(directory, hexdigest[:2], hexdigest[2:4], hexdigest + ext)
+
+    def get_available_name(self, name, max_length=None):
+        # identical names mean identical content, so an existing file is reused, never suffixed
+        return name
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        with transaction.atomic():
+            return self._save_locked(name, content)
+
+    def _save_locked(self, name, content):
+        from .models import MediaBlob     # models import this module
+
+        # serializes with release() and collect_garbage() on the same name
+        MediaBlob.objects.select_for_update().filter(name=name).first()
+        if self.exists(name):
+            return name
+
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # write to a temp file and rename, so a reader never sees a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                for chunk in content.chunks():
+                    handle.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name
+
+
+_picture_storage = None
+
+
+def picture_storage():
+    """Storage for Picture files (callable so migrations don't capture its settings)"""
+    global _picture_storage
+    if _picture_storage is None:
+        _picture_storage = ContentAddressedStorage()
+    return _picture_storage
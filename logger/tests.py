@@ -1,3 +1,1600 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.db.utils import load_backend
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from PIL import Image
+
+from . import agent_client, agents, catalog, images, routers, storage
+from .agent_client import AgentClient
+from .conditional import conditional_stats
+from .dashboard import get_home_context
+from .export import DATASETS as EXPORT_DATASETS
+from .images import VARIANT_FIELDS, generate_variants
+from .importer import ImportFormatError, import_workouts
+from .management.commands import simulate_replica_lag
+from .media import PICTURE_FILE_FIELDS, collect_garbage, picture_file_names, rebuild_refcounts
+from .middleware import QueryRecorder, SQLInstrumentationMiddleware, sql_template
+from .models import (
+    AgentJob, BaseExercise, DailyLog, Equipment, Exercise, ExerciseProgress, IdempotencyKey, MealEntry, MediaBlob,
+    MuscleGroup, MuscleGroupVolume, PersonalRecord, Picture, Workout, WorkoutExercise,
+)
+from .queries import recent_workouts
+from .serializers import AIWorkoutCreateSerializer, WorkoutSerializer, workout_detail_queryset
+from .timeseries import lttb
+from .utils import _get_or_create_by_name, refresh_daily_totals, resolve_exercises, unlink_meal_from_daily_logs
+
+
+# the real FileBasedCache lives in the checkout; tests must not read or write it
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'logger-tests'}}
+
+
+class IsolatedStateMixin:
+    """
+    Starts every test with an empty cache and no process-wide catalog
+    snapshot, which would otherwise outlive the test's rolled-back rows.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        catalog._bump_version()
+        self.addCleanup(catalog._bump_version)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class LoggerTestCase(IsolatedStateMixin, TestCase):
+    pass
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class LoggerTransactionTestCase(IsolatedStateMixin, TransactionTestCase):
+    pass
+
+
+# --- Agent dispatch (stub n8n) ---
+
+class StubAgentHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the n8n webhooks; replies from the server's scripted queue"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        with server.lock:
+            server.received.append((self.path, json.loads(body or b'null')))
+            status, delay = server.script.pop(0) if server.script else (200, 0)
+        if delay:
+            time.sleep(delay)
+        payload = json.dumps({'ok': status < 400}).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass    # the client gave up (timeout test)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubAgentServerMixin:
+    """Runs StubAgentHandler for the class and points a fast-failing AgentClient at it"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubAgentHandler)
+        cls.server.lock = threading.Lock()
+        cls.server.daemon_threads = True
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.server.received = []
+        self.server.script = []
+        base = f'http://127.0.0.1:{self.server.server_address[1]}'
+        patcher = mock.patch.dict(agent_client.AGENT_URLS, {
+            'workout': f'{base}/webhook/workout-agent',
+            'meal': f'{base}/webhook/meal-agent',
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client_under_test = AgentClient({
+            'CONNECT_TIMEOUT': 1, 'READ_TIMEOUT': 0.3, 'RETRIES': 2, 'BACKOFF_FACTOR': 0, 'BACKOFF_JITTER': 0,
+        })
+        patcher = mock.patch.object(agents, 'get_agent_client', return_value=self.client_under_test)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user('lifter', password='pw')
+        self.client.force_login(self.user)
+
+    def _trigger(self, text='bench 3 sets of 5 at 100'):
+        response = self.client.post(
+            reverse('trigger_agent'), {'input': text, 'user_id': self.user.pk}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 202)
+        return AgentJob.objects.get(pk=response.json()['job_id'])
+
+
+@override_settings(AGENT_DISPATCH_INLINE=False)
+class AgentDispatchTests(StubAgentServerMixin, LoggerTestCase):
+    def _send_due(self):
+        return [agents.send_agent_job(job) for job in agents.claim_agent_jobs(10)]
+
+    def test_enqueue_then_outbox_send_succeeds(self):
+        job = self._trigger()
+        self.assertEqual(job.status, AgentJob.STATUS_QUEUED)
+
+        self.assertEqual(self._send_due(), [True])
+        job.refresh_from_db()
+        self.assertEqual(job.status, AgentJob.STATUS_DISPATCHED)
+        self.assertEqual(job.n8n_status, 200)
+        self.assertEqual(job.lease_token, '')
+        self.assertEqual(len(self.server.received), 1)
+        path, payload = self.server.received[0]
+        self.assertEqual(path, '/webhook/workout-agent')
+        self.assertEqual(payload['job_id'], job.pk)
+        # nothing left to send
+        self.assertEqual(self._send_due(), [])
+
+    def test_inline_enqueue_submits_after_commit(self):
+        executor = mock.Mock()
+        with override_settings(AGENT_DISPATCH_INLINE=True), \
+                mock.patch.object(agents, '_get_executor', return_value=executor), \
+                self.captureOnCommitCallbacks(execute=True):
+            job = self._trigger()
+        executor.submit.assert_called_once_with(agents.dispatch_agent_job, job.pk)
+
+    def test_server_error_is_retried_with_backoff(self):
+        job = self._trigger()
+        self.server.script = [(500, 0)]
+        before = timezone.now()
+        self.assertEqual(self._send_due(), [False])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, AgentJob.STATUS_QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.n8n_status, 500)
+        self.assertIn('HTTP 500', job.error)
+        # first retry waits between half and all of BACKOFF_BASE
+        base = agents.outbox_option('BACKOFF_BASE')
+        self.assertGreaterEqual(job.next_attempt_at, before + timedelta(seconds=base / 2))
+        self.assertLessEqual(job.next_attempt_at, timezone.now() + timedelta(seconds=base))
+        # not due yet
+        self.assertEqual(self._send_due(), [])
+
+        AgentJob.objects.filter(pk=job.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(self._send_due(), [True])
+        job.refresh_from_db()
+        self.assertEqual(job.status, AgentJob.STATUS_DISPATCHED)
+
+    def test_gateway_errors_are_retried_by_the_client(self):
+        job = self._trigger()
+        self.server.script = [(503, 0), (503, 0)]
+        self.assertEqual(self._send_due(), [True])
+        self.assertEqual(len(self.server.received), 3)
+        job.refresh_from_db()
+        self.assertEqual(job.status, AgentJob.STATUS_DISPATCHED)
+        stats = self.client_under_test.stats()['workout']
+        self.assertEqual((stats['requests'], stats['errors'], stats['retries']), (1, 0, 2))
+
+    def test_keep_alive_connections_are_reused(self):
+        for _ in range(3):
+            self.client_under_test.post('meal', {'input': 'oats'})
+        pool = self.client_under_test.pool_stats()
+        self.assertEqual(pool['requests'], 3)
+        self.assertEqual(pool['connections_opened'], 1)
+        self.assertEqual(pool['reused'], 2)
+
+    def test_timeout_is_retried_and_eventually_fails(self):
+        job = self._trigger()
+        self.server.script = [(200, 1.0)]
+        self.assertEqual(self._send_due(), [False])
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('Request error', job.error)
+        # a read timeout is never replayed, the request may have reached n8n
+        self.assertEqual(len(self.server.received), 1)
+
+        max_attempts = agents.outbox_option('MAX_ATTEMPTS')
+        AgentJob.objects.filter(pk=job.pk).update(attempts=max_attempts - 1, next_attempt_at=timezone.now())
+        self.server.script = [(500, 0)]
+        self.assertEqual(self._send_due(), [False])
+        job.refresh_from_db()
+        self.assertEqual(job.status, AgentJob.STATUS_FAILED)
+        self.assertEqual(job.attempts, max_attempts)
+
+    def test_expired_lease_is_reclaimed(self):
+        job = self._trigger()
+        [first] = agents.claim_agent_jobs(10)
+        # leased: a second dispatcher gets nothing
+        self.assertEqual(agents.claim_agent_jobs(10), [])
+
+        AgentJob.objects.filter(pk=job.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        [second] = agents.claim_agent_jobs(10)
+        self.assertNotEqual(first.lease_token, second.lease_token)
+
+        # the dead holder can no longer record an outcome
+        self.server.script = [(500, 0)]
+        agents.send_agent_job(first)
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 0)
+        self.assertEqual(job.lease_token, second.lease_token)
+
+        self.assertTrue(agents.send_agent_job(second))
+        job.refresh_from_db()
+        self.assertEqual(job.status, AgentJob.STATUS_DISPATCHED)
+
+    def _callback(self, job, key='n8n-run-1'):
+        return self.client.post(
+            reverse('create_workout_from_agent'),
+            {
+                'job_id': job.pk,
+                'user_id': self.user.pk,
+                'workout_name': 'Push',
+                'workout_date': '2026-03-02',
+                'exercises': [{'name': 'Bench Press', 'sets': 3, 'reps': 5, 'weight': 100}],
+            },
+            content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_completion_callback_and_duplicate(self):
+        job = self._trigger()
+        self._send_due()
+
+        first = self._callback(job)
+        self.assertEqual(first.status_code, 201)
+        job.refresh_from_db()
+        self.assertEqual(job.status, AgentJob.STATUS_COMPLETED)
+        workout = Workout.objects.get(user=self.user)
+        self.assertEqual(job.workout, workout)
+
+        duplicate = self._callback(job)
+        self.assertEqual(duplicate.status_code, 201)
+        self.assertEqual(duplicate['Idempotent-Replayed'], 'true')
+        self.assertEqual(duplicate.json(), first.json())
+        self.assertEqual(Workout.objects.filter(user=self.user).count(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.workout, workout)
+
+    def test_job_status_is_visible_to_its_owner_only(self):
+        job = self._trigger()
+        url = reverse('agent_job_status', args=[job.pk])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], AgentJob.STATUS_QUEUED)
+
+        other = User.objects.create_user('other', password='pw')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+
+@override_settings(AGENT_DISPATCH_INLINE=False)
+class OutboxWorkerTests(StubAgentServerMixin, LoggerTransactionTestCase):
+    """run_agent_outbox sends from worker threads, which only see committed rows"""
+
+    def _run(self, *args):
+        out = io.StringIO()
+        call_command('run_agent_outbox', *args, stdout=out)
+        return out.getvalue()
+
+    def test_once_drains_due_jobs_and_leaves_failures_queued(self):
+        jobs = [self._trigger(f'set {n}') for n in range(3)]
+        later = self._trigger('not yet')
+        AgentJob.objects.filter(pk=later.pk).update(next_attempt_at=timezone.now() + timedelta(hours=1))
+        self.server.script = [(500, 0)]
+
+        output = self._run('--once', '--batch-size', '2', '--concurrency', '2')
+        self.assertIn('claimed 3, sent 2', output)
+        self.assertEqual(len(self.server.received), 3)
+        statuses = sorted(AgentJob.objects.filter(pk__in=[j.pk for j in jobs]).values_list('status', flat=True))
+        self.assertEqual(statuses, sorted([AgentJob.STATUS_DISPATCHED] * 2 + [AgentJob.STATUS_QUEUED]))
+        retry = AgentJob.objects.get(pk__in=[j.pk for j in jobs], status=AgentJob.STATUS_QUEUED)
+        self.assertEqual((retry.attempts, retry.lease_token), (1, ''))
+        self.assertGreater(retry.next_attempt_at, timezone.now())
+        self.assertEqual(AgentJob.objects.get(pk=later.pk).attempts, 0)
+
+    def test_stats_report_queue_depth(self):
+        self._trigger()
+        stats = json.loads(self._run('--stats'))
+        self.assertEqual(stats['depth'][AgentJob.STATUS_QUEUED], 1)
+        self.assertEqual(stats['depth'][AgentJob.STATUS_DISPATCHED], 0)
+        self.assertGreaterEqual(stats['oldest_queued_seconds'], 0)
+
+
+# --- Content-addressed pump pics ---
+
+def png_bytes(color='red', size=(8, 8)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class MediaTestCase(LoggerTestCase):
+    """Pictures stored under a throwaway MEDIA_ROOT"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # the storage is built once per process and caches its location
+        patcher = mock.patch.object(storage, '_picture_storage', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('lifter', password='pw')
+
+    def _picture(self, data=None, name='pump.png', user=None):
+        upload = SimpleUploadedFile(name, data or png_bytes(), content_type='image/png')
+        return Picture.objects.create(user=user or self.user, image=upload)
+
+
+class MediaDedupTests(MediaTestCase):
+    def test_identical_uploads_share_one_counted_file(self):
+        first = self._picture(name='a.png')
+        second = self._picture(name='b.png')
+        self.assertEqual(first.image.name, second.image.name)
+        blob = MediaBlob.objects.get(name=first.image.name)
+        self.assertEqual(blob.refcount, 2)
+        self.assertEqual(blob.size, len(png_bytes()))
+
+        other = self._picture(png_bytes('blue'))
+        self.assertNotEqual(other.image.name, first.image.name)
+        self.assertEqual(MediaBlob.objects.get(name=other.image.name).refcount, 1)
+
+    def test_release_keeps_shared_file_and_collects_the_last_reference(self):
+        first = self._picture()
+        second = self._picture()
+        name = first.image.name
+        path = first.image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 1)
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_reupload_before_collection_keeps_the_file(self):
+        first = self._picture()
+        name, path = first.image.name, first.image.path
+        with self.captureOnCommitCallbacks() as callbacks:
+            first.delete()
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+        # same bytes uploaded again before the deferred collection runs
+        again = self._picture()
+        self.assertEqual(again.image.name, name)
+        for callback in callbacks:
+            callback()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 1)
+
+    def test_regenerated_variants_keep_one_reference_each(self):
+        picture = self._picture(png_bytes(size=(64, 48)))
+        generate_variants(picture)
+        names = picture_file_names(picture)
+        self.assertEqual(len(names), len(PICTURE_FILE_FIELDS))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_variants(Picture.objects.get(pk=picture.pk))
+        counts = dict(MediaBlob.objects.filter(name__in=names).values_list('name', 'refcount'))
+        # a picture smaller than every variant edge stores identical bytes twice
+        self.assertEqual(counts, dict(Counter(names)))
+
+    def test_gc_spares_files_of_pictures_without_blobs(self):
+        legacy = self._picture(png_bytes('purple'))
+        orphan = self._picture(png_bytes('orange'))
+        orphan_path = orphan.image.path
+        # pictures uploaded before the refcounts existed have no blob rows
+        MediaBlob.objects.all().delete()
+        Picture.objects.filter(pk=orphan.pk).delete()
+        call_command('media_storage_report', '--gc', '--min-age', '0', stdout=io.StringIO())
+        self.assertTrue(os.path.exists(legacy.image.path))
+        self.assertFalse(os.path.exists(orphan_path))
+
+    def test_rebuild_backfills_blobs_for_existing_pictures(self):
+        first = self._picture()
+        self._picture()
+        other = self._picture(png_bytes('blue'))
+        MediaBlob.objects.all().delete()
+        MediaBlob.objects.create(name='pump_pics/gone.png', refcount=3)
+
+        self.assertEqual(rebuild_refcounts(), (2, 3))
+        counts = dict(MediaBlob.objects.values_list('name', 'refcount'))
+        self.assertEqual(counts, {first.image.name: 2, other.image.name: 1})
+        self.assertEqual(MediaBlob.objects.get(name=other.image.name).size, len(png_bytes('blue')))
+
+    def test_collect_garbage_skips_referenced_names(self):
+        kept = self._picture()
+        orphan = self._picture(png_bytes('green'))
+        MediaBlob.objects.filter(name=orphan.image.name).update(refcount=0)
+        freed = collect_garbage([kept.image.name, orphan.image.name])
+        self.assertEqual(freed, len(png_bytes('green')))
+        self.assertTrue(os.path.exists(kept.image.path))
+        self.assertFalse(os.path.exists(orphan.image.path))
+
+
+class PictureVariantTests(MediaTestCase):
+    def _stored_files(self):
+        root = storage.picture_storage().location
+        return sorted(os.path.relpath(os.path.join(path, name), root) for path, _, names in os.walk(root) for name in names)
+
+    def test_variants_are_resized_and_encoded_per_format(self):
+        picture = generate_variants(self._picture(png_bytes(size=(2000, 1000))))
+        for field, size, fmt in [('thumb_webp', (320, 160), 'WEBP'), ('thumb_jpeg', (320, 160), 'JPEG'),
+                                 ('medium_webp', (1280, 640), 'WEBP'), ('medium_jpeg', (1280, 640), 'JPEG')]:
+            with self.subTest(field=field), getattr(picture, field).open('rb') as handle:
+                variant = Image.open(handle)
+                self.assertEqual((variant.size, variant.format), (size, fmt))
+        self.assertIsNotNone(Picture.objects.get(pk=picture.pk).variants_processed_at)
+
+    def test_variants_drop_exif_after_applying_its_orientation(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6                # orientation: rotate 90 degrees clockwise
+        exif[0x010F] = 'Phone Maker'    # camera make
+        buffer = io.BytesIO()
+        Image.new('RGB', (200, 100), 'red').save(buffer, 'JPEG', exif=exif.tobytes())
+        picture = generate_variants(self._picture(buffer.getvalue(), name='pump.jpg'))
+
+        for field in VARIANT_FIELDS:
+            with self.subTest(field=field), getattr(picture, field).open('rb') as handle:
+                variant = Image.open(handle)
+                self.assertEqual(variant.size, (100, 200))
+                self.assertEqual(dict(variant.getexif()), {})
+                self.assertNotIn('exif', variant.info)
+
+    def test_picture_deleted_while_rendering_gets_no_variant_files(self):
+        picture = self._picture(png_bytes(size=(64, 48)))
+        render = images.render_variant
+
+        def delete_midway(*args):
+            Picture.objects.filter(pk=picture.pk).delete()
+            return render(*args)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch.object(images, 'render_variant', side_effect=delete_midway):
+                self.assertIsNone(generate_variants(picture))
+        self.assertEqual(self._stored_files(), [])
+        self.assertFalse(MediaBlob.objects.exists())
+
+
+class MediaServingTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.data = png_bytes(size=(32, 32))
+        self.picture = self._picture(self.data)
+        self.url = reverse('serve_media', args=[self.picture.image.name])
+        self.client.force_login(self.user)
+
+    def test_full_response_with_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        digest = os.path.splitext(os.path.basename(self.picture.image.name))[0]
+        self.assertEqual(response['ETag'], f'"{digest}"')
+        self.assertIn('immutable', response['Cache-Control'])
+
+        repeat = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat['ETag'], response['ETag'])
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.data[:10])
+        self.assertEqual(response['Content-Range'], f'bytes 0-9/{len(self.data)}')
+        self.assertEqual(response['Content-Length'], '10')
+
+        suffix = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(suffix.streaming_content), self.data[-5:])
+
+        unsatisfiable = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.data)}-')
+        self.assertEqual(unsatisfiable.status_code, 416)
+        self.assertEqual(unsatisfiable['Content-Range'], f'bytes */{len(self.data)}')
+
+    def test_stale_if_range_gets_the_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"someotherversion"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+
+    def test_offloaded_bodies(self):
+        with override_settings(MEDIA_ACCEL='nginx', MEDIA_ACCEL_PREFIX='/protected-media/'):
+            response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.picture.image.name)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
+
+        with override_settings(MEDIA_ACCEL='apache'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], self.picture.image.path)
+        self.assertEqual(response.content, b'')
+
+    def test_only_the_owner_can_fetch(self):
+        self.client.force_login(User.objects.create_user('other', password='pw'))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        # uploading the same bytes gives them a Picture of their own for the shared file
+        self._picture(self.data, user=User.objects.get(username='other'))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_unknown_and_missing_files_are_404(self):
+        self.assertEqual(self.client.get(reverse('serve_media', args=['pump_pics/nope.png'])).status_code, 404)
+        os.remove(self.picture.image.path)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+# --- Catalog resolution ---
+
+class ResolveExercisesTests(LoggerTestCase):
+    def test_db_fallback_matches_names_case_insensitively(self):
+        chest = MuscleGroup.objects.create(name='Chest')
+        ids = _get_or_create_by_name(MuscleGroup, {'chest': {}, ' CHEST ': {}, 'Back': {}}, known={})
+        self.assertEqual(ids['chest'], chest.pk)
+        self.assertEqual(ids[' CHEST '], chest.pk)
+        self.assertEqual(MuscleGroup.objects.count(), 2)
+        self.assertEqual(MuscleGroup.objects.get(pk=ids['Back']).name, 'Back')
+
+    def test_spellings_in_one_payload_create_one_row(self):
+        ids = _get_or_create_by_name(Equipment, {'Cable': {}, 'cable': {}}, known={})
+        self.assertEqual(ids['Cable'], ids['cable'])
+        self.assertEqual(Equipment.objects.filter(name__iexact='cable').count(), 1)
+
+    def test_resolve_reuses_differently_cased_exercise(self):
+        first = resolve_exercises([{'name': 'Bench Press', 'muscle_group': 'Chest', 'equipment': 'Barbell'}])
+        again = resolve_exercises([{'name': 'bench press', 'muscle_group': 'chest', 'equipment': 'barbell'}])
+        self.assertEqual(again['bench press'], first['Bench Press'])
+        self.assertEqual(Exercise.objects.count(), 1)
+
+
+    def test_known_exercises_are_resolved_before_the_write_transaction(self):
+        user = User.objects.create_user('lifter', password='pw')
+        resolve_exercises([BENCH])
+        catalog.get_catalog(force_check=True)
+        payload = {'user_id': user.pk, 'workout_name': 'Push', 'exercises': [BENCH, {**BENCH, 'sets': 5}]}
+
+        depth = []
+        load = catalog.Catalog.load
+        with mock.patch.object(catalog.Catalog, 'load', side_effect=lambda version: depth.append(
+                len(connection.atomic_blocks)) or load(version)):
+            # a miss on the process-wide snapshot reloads it, but not under the write lock
+            catalog._snapshot = None
+            serializer = AIWorkoutCreateSerializer(data=payload)
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            with self.assertNumQueries(10):
+                serializer.save()
+        self.assertEqual(depth, [len(connection.atomic_blocks)])
+        self.assertEqual(WorkoutExercise.objects.filter(workout__user=user).count(), 2)
+
+
+class CatalogInvalidationTests(LoggerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.chest = MuscleGroup.objects.create(name='Chest')
+        self.barbell = Equipment.objects.create(name='Barbell')
+
+    def _fresh(self):
+        return catalog.get_catalog(force_check=True)
+
+    def test_saves_invalidate_only_after_commit(self):
+        before = self._fresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            base = BaseExercise.objects.create(name='Bench Press', primary_muscle_group=self.chest)
+            # the bump waits for commit, so no process caches an uncommitted row
+            self.assertIs(self._fresh(), before)
+        after = self._fresh()
+        self.assertIsNot(after, before)
+        self.assertNotEqual(after.version, before.version)
+        self.assertEqual(after.base_exercises['bench press'], base.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            exercise = Exercise.objects.create(name='Bench Press (Barbell)', base_exercise=base, equipment=self.barbell)
+        info = catalog.get_exercise_info(exercise.pk)
+        self.assertEqual((info.primary_muscle_group, info.equipment), ('Chest', 'Barbell'))
+
+    def test_secondary_muscles_and_deletes_invalidate(self):
+        base = BaseExercise.objects.create(name='Dip', primary_muscle_group=self.chest)
+        exercise = Exercise.objects.create(name='Dip', base_exercise=base, equipment=self.barbell)
+        triceps = MuscleGroup.objects.create(name='Triceps')
+        self.assertEqual(self._fresh().exercise_info[exercise.pk].secondary_muscle_groups, ())
+        with self.captureOnCommitCallbacks(execute=True):
+            base.secondary_muscle_groups.add(triceps)
+        self.assertEqual(self._fresh().exercise_info[exercise.pk].secondary_muscle_groups, ('Triceps',))
+        with self.captureOnCommitCallbacks(execute=True):
+            exercise.delete()
+        self.assertIsNone(catalog.get_exercise_info(exercise.pk))
+
+    def test_bulk_inserts_invalidate(self):
+        before = self._fresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            ids = _get_or_create_by_name(MuscleGroup, {'Back': {}, 'Legs': {}}, known=before.muscle_groups)
+        after = self._fresh()
+        self.assertNotEqual(after.version, before.version)
+        self.assertEqual({'back': ids['Back'], 'legs': ids['Legs']}, {
+            key: after.muscle_groups[key] for key in ('back', 'legs')
+        })
+
+    def test_cache_hits_and_rollbacks_leave_the_snapshot(self):
+        before = self._fresh()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            _get_or_create_by_name(MuscleGroup, {'chest': {}}, known=before.muscle_groups)
+        self.assertEqual(callbacks, [])
+        with self.captureOnCommitCallbacks(execute=False):
+            MuscleGroup.objects.create(name='Rolled back')
+        self.assertIs(self._fresh(), before)
+
+
+# --- Derived workout data ---
+
+BENCH = {'name': 'Bench Press', 'muscle_group': 'Chest', 'equipment': 'Barbell'}
+
+
+class WorkoutDataTestCase(LoggerTestCase):
+    """Logs workouts through the n8n callback, like production does"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('lifter', password='pw')
+
+    def _log_workout(self, day, *sets, name='Push', user=None):
+        """sets are (exercise, sets, reps, weight); returns the created Workout"""
+        response = self.client.post(
+            reverse('create_workout_from_agent'),
+            {
+                'user_id': (user or self.user).pk,
+                'workout_name': name,
+                'workout_date': day.isoformat(),
+                'exercises': [
+                    {**exercise, 'sets': count, 'reps': reps, 'weight': weight}
+                    for exercise, count, reps, weight in sets
+                ],
+            },
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return Workout.objects.get(pk=response.json()['workout']['id'])
+
+
+class ExerciseProgressTests(WorkoutDataTestCase):
+    def test_upsert_merges_workouts_on_the_same_day(self):
+        day = date(2026, 3, 2)
+        self._log_workout(day, (BENCH, 3, 5, 100))
+        self._log_workout(day, (BENCH, 2, 8, 80), (BENCH, 1, 10, 60), name='Pump')
+
+        progress = ExerciseProgress.objects.get(user=self.user, date=day)
+        self.assertEqual(progress.total_sets, 6)
+        self.assertEqual(progress.total_reps, 15 + 16 + 10)
+        self.assertAlmostEqual(progress.total_volume, 1500 + 1280 + 600)
+        # sets-weighted mean over every set of the day
+        self.assertAlmostEqual(progress.avg_weight, (3 * 100 + 2 * 80 + 60) / 6)
+        self.assertAlmostEqual(progress.one_rep_max_est, 100 * (1 + 5 / 30))
+
+    def test_each_day_gets_its_own_row(self):
+        self._log_workout(date(2026, 3, 2), (BENCH, 3, 5, 100))
+        self._log_workout(date(2026, 3, 4), (BENCH, 3, 5, 105))
+        rows = ExerciseProgress.objects.filter(user=self.user).order_by('date')
+        self.assertEqual([row.avg_weight for row in rows], [100, 105])
+        self.assertEqual([row.total_sets for row in rows], [3, 3])
+
+    def test_unweighted_sets_pull_the_average_down(self):
+        day = date(2026, 3, 2)
+        self._log_workout(day, (BENCH, 2, 5, 100))
+        self._log_workout(day, (BENCH, 2, 20, None), name='Finisher')
+        progress = ExerciseProgress.objects.get(user=self.user, date=day)
+        self.assertEqual(progress.total_sets, 4)
+        self.assertAlmostEqual(progress.avg_weight, 50)
+        self.assertAlmostEqual(progress.total_volume, 1000)
+
+
+class PersonalRecordTests(WorkoutDataTestCase):
+    def _records(self):
+        return {
+            record.record_type: (record.value, record.workout_id)
+            for record in PersonalRecord.objects.filter(user=self.user)
+        }
+
+    def test_records_follow_the_best_set(self):
+        first = self._log_workout(date(2026, 3, 2), (BENCH, 3, 5, 100))
+        second = self._log_workout(date(2026, 3, 4), (BENCH, 3, 3, 110), (BENCH, 1, 12, 40))
+        records = self._records()
+        self.assertEqual(records[PersonalRecord.HEAVIEST_WEIGHT], (110, second.pk))
+        self.assertAlmostEqual(records[PersonalRecord.ONE_REP_MAX][0], 110 * (1 + 3 / 30))
+        # 100 x 5 still beats both later sets on volume
+        self.assertEqual(records[PersonalRecord.BEST_SET_VOLUME], (500, first.pk))
+
+    def test_deleting_the_record_workout_recomputes_from_the_rest(self):
+        first = self._log_workout(date(2026, 3, 2), (BENCH, 3, 5, 100))
+        second = self._log_workout(date(2026, 3, 4), (BENCH, 3, 3, 110))
+        self.client.force_login(self.user)
+        self.client.get(reverse('delete_workout', args=[second.pk]))
+        self.assertFalse(Workout.objects.filter(pk=second.pk).exists())
+
+        records = self._records()
+        self.assertEqual(records[PersonalRecord.HEAVIEST_WEIGHT], (100, first.pk))
+        self.assertAlmostEqual(records[PersonalRecord.ONE_REP_MAX][0], 100 * (1 + 5 / 30))
+        self.assertEqual(records[PersonalRecord.BEST_SET_VOLUME], (500, first.pk))
+        self.assertEqual(PersonalRecord.objects.get(
+            user=self.user, record_type=PersonalRecord.HEAVIEST_WEIGHT
+        ).date, date(2026, 3, 2))
+
+    def test_deleting_the_only_workout_removes_its_records(self):
+        workout = self._log_workout(date(2026, 3, 2), (BENCH, 3, 5, 100))
+        other = User.objects.create_user('other', password='pw')
+        self._log_workout(date(2026, 3, 2), (BENCH, 1, 1, 200), user=other)
+        workout.delete()
+        self.assertFalse(PersonalRecord.objects.filter(user=self.user).exists())
+        self.assertEqual(PersonalRecord.objects.filter(user=other).count(), 3)
+
+
+class MuscleRollupTests(WorkoutDataTestCase):
+    def setUp(self):
+        super().setUp()
+        self.chest = MuscleGroup.objects.create(name='Chest')
+        self.triceps = MuscleGroup.objects.create(name='Triceps')
+        base = BaseExercise.objects.create(name='Bench Press', primary_muscle_group=self.chest)
+        base.secondary_muscle_groups.add(self.triceps)
+        Exercise.objects.create(
+            name='Bench Press', base_exercise=base, equipment=Equipment.objects.create(name='Barbell')
+        )
+
+    def _volumes(self, period=MuscleGroupVolume.WEEK):
+        return {
+            (row.muscle_group_id, row.period_start): (row.volume, row.sets, row.reps)
+            for row in MuscleGroupVolume.objects.filter(user=self.user, period=period)
+        }
+
+    def test_sets_are_credited_to_primary_and_secondary_groups(self):
+        monday = date(2026, 3, 2)
+        self._log_workout(monday, (BENCH, 3, 5, 100))
+        self._log_workout(date(2026, 3, 4), (BENCH, 2, 10, 50))
+        self.assertEqual(self._volumes(), {
+            (self.chest.pk, monday): (2500, 5, 35),
+            (self.triceps.pk, monday): (1250, 2.5, 17.5),
+        })
+        month = self._volumes(MuscleGroupVolume.MONTH)
+        self.assertEqual(month[(self.chest.pk, date(2026, 3, 1))], (2500, 5, 35))
+
+    def test_exercises_new_to_the_catalog_are_rolled_up(self):
+        squat = {'name': 'Back Squat', 'muscle_group': 'Quads', 'equipment': 'Barbell'}
+        self._log_workout(date(2026, 3, 2), (squat, 3, 5, 140))
+        quads = MuscleGroup.objects.get(name='Quads')
+        self.assertEqual(self._volumes()[(quads.pk, date(2026, 3, 2))], (2100, 3, 15))
+
+    def test_deleting_a_workout_subtracts_its_sets(self):
+        monday = date(2026, 3, 2)
+        keep = self._log_workout(monday, (BENCH, 3, 5, 100))
+        drop = self._log_workout(date(2026, 3, 4), (BENCH, 2, 10, 50))
+        self._log_workout(date(2026, 3, 9), (BENCH, 1, 5, 100), name='Next week')
+
+        drop.delete()
+        volumes = self._volumes()
+        self.assertEqual(volumes[(self.chest.pk, monday)], (1500, 3, 15))
+        self.assertEqual(volumes[(self.triceps.pk, monday)], (750, 1.5, 7.5))
+        self.assertEqual(volumes[(self.chest.pk, date(2026, 3, 9))], (500, 1, 5))
+
+        keep.delete()
+        # emptied periods are removed, not left at zero
+        self.assertEqual(set(self._volumes()), {(self.chest.pk, date(2026, 3, 9)), (self.triceps.pk, date(2026, 3, 9))})
+        self.assertEqual(
+            set(MuscleGroupVolume.objects.filter(user=self.user, period=MuscleGroupVolume.MONTH)
+                .values_list('period_start', flat=True)),
+            {date(2026, 3, 1)},
+        )
+
+
+class IdempotentCallbackTests(WorkoutDataTestCase):
+    def _meal(self, key=None, **fields):
+        payload = {'user_id': self.user.pk, 'meal_name': 'Oats', 'meal_date': '2026-03-02', 'calories': 400, **fields}
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post(reverse('create_meal_from_agent'), payload, content_type='application/json', **headers)
+
+    def test_identical_payloads_without_a_key_replay(self):
+        first = self._meal()
+        again = self._meal()
+        self.assertEqual((first.status_code, again.status_code), (201, 201))
+        self.assertNotIn('Idempotent-Replayed', first)
+        self.assertEqual(again['Idempotent-Replayed'], 'true')
+        self.assertEqual(MealEntry.objects.filter(user=self.user).count(), 1)
+        # a different payload is a different request
+        self.assertEqual(self._meal(calories=500).status_code, 201)
+        self.assertEqual(MealEntry.objects.filter(user=self.user).count(), 2)
+
+    def test_explicit_keys_win_over_the_payload(self):
+        self._meal(key='run-1')
+        self._meal(key='run-2')
+        self.assertEqual(MealEntry.objects.filter(user=self.user).count(), 2)
+        replay = self._meal(key='run-1', calories=999)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(MealEntry.objects.filter(user=self.user).count(), 2)
+
+    def test_keys_are_scoped_per_endpoint(self):
+        self._meal(key='run-1')
+        response = self.client.post(
+            reverse('create_workout_from_agent'),
+            {'user_id': self.user.pk, 'workout_name': 'Push', 'workout_date': '2026-03-02',
+             'exercises': [{**BENCH, 'sets': 3, 'reps': 5, 'weight': 100}]},
+            content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY='run-1',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_failures_are_not_stored(self):
+        failed = self._meal(key='run-1', meal_name='')
+        self.assertEqual(failed.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        retry = self._meal(key='run-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', retry)
+
+    def test_expired_keys_run_again_and_are_purged(self):
+        self._meal(key='run-1')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        again = self._meal(key='run-1')
+        self.assertNotIn('Idempotent-Replayed', again)
+        self.assertEqual(MealEntry.objects.filter(user=self.user).count(), 2)
+        # the rerun replaced the expired row
+        self.assertEqual(IdempotencyKey.objects.filter(expires_at__gt=timezone.now()).count(), 1)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        call_command('purge_idempotency_keys', stdout=io.StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+
+class BatchCallbackTests(WorkoutDataTestCase):
+    def _batch(self, body):
+        return self.client.post(reverse('create_batch_from_agent'), body, content_type='application/json')
+
+    def _workout(self, name, **fields):
+        return {
+            'user_id': self.user.pk, 'workout_name': name, 'workout_date': '2026-03-02',
+            'exercises': [{**BENCH, 'sets': 3, 'reps': 5, 'weight': 100}], **fields,
+        }
+
+    def test_a_bare_array_is_a_batch_of_workouts(self):
+        response = self._batch([self._workout('Push'), self._workout('Pull')])
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(
+            sorted(Workout.objects.filter(user=self.user).values_list('name', flat=True)), ['Pull', 'Push']
+        )
+
+    def test_other_bodies_are_rejected(self):
+        for body in ('"workouts"', '42', '{"workouts": {"name": "Push"}}'):
+            response = self.client.post(reverse('create_batch_from_agent'), body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+
+    def test_unknown_users_are_answered_like_the_single_endpoints(self):
+        missing = self.user.pk + 100
+        single = self.client.post(
+            reverse('create_meal_from_agent'),
+            {'user_id': missing, 'meal_name': 'Oats', 'calories': 400},
+            content_type='application/json',
+        )
+        response = self._batch({
+            'workouts': [self._workout('Push', user_id=missing)],
+            'meals': [{'user_id': missing, 'meal_name': 'Oats', 'calories': 400}],
+        })
+        self.assertEqual(response.status_code, 207)
+        results = response.json()['results']
+        # a workout for an unknown user goes to the first user, as in create_workout_from_agent
+        self.assertEqual(results['workouts'][0]['status'], 201)
+        self.assertEqual(Workout.objects.get(pk=results['workouts'][0]['id']).user, User.objects.first())
+        self.assertEqual(results['meals'][0], {'status': single.status_code, 'error': single.json()['error']})
+
+
+
+class DailyTotalsTests(WorkoutDataTestCase):
+    day = date(2026, 3, 2)
+
+    def _log_meal(self, name, calories, protein, carbs, fats, day=None):
+        response = self.client.post(
+            reverse('create_meal_from_agent'),
+            {
+                'user_id': self.user.pk, 'meal_name': name, 'meal_date': (day or self.day).isoformat(),
+                'calories': calories, 'protein': protein, 'carbs': carbs, 'fats': fats,
+            },
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return MealEntry.objects.get(user=self.user, name=name)
+
+    def _totals(self, day=None):
+        log = DailyLog.objects.get(user=self.user, date=day or self.day)
+        return log.total_calories, log.total_protein, log.total_carbs, log.total_fats
+
+    def test_meals_add_to_their_days_totals(self):
+        self._log_meal('Oats', 400, 15, 60, 8)
+        self._log_meal('Chicken', 550, 50, 40, 18)
+        self._log_meal('Tomorrow', 100, 1, 1, 1, day=self.day + timedelta(days=1))
+        self.assertEqual(self._totals(), (950, 65, 100, 26))
+        self.assertEqual(self._totals(self.day + timedelta(days=1)), (100, 1, 1, 1))
+
+    def test_deleting_a_meal_subtracts_it(self):
+        self._log_meal('Oats', 400, 15, 60, 8)
+        chicken = self._log_meal('Chicken', 550, 50, 40, 18)
+        self.client.force_login(self.user)
+        self.client.get(reverse('delete_meal', args=[chicken.pk]))
+        self.assertFalse(MealEntry.objects.filter(pk=chicken.pk).exists())
+        self.assertEqual(self._totals(), (400, 15, 60, 8))
+
+    def test_totals_never_go_negative(self):
+        oats = self._log_meal('Oats', 400, 15, 60, 8)
+        DailyLog.objects.filter(user=self.user).update(total_calories=100)
+        unlink_meal_from_daily_logs(oats)
+        self.assertEqual(self._totals(), (0, 0, 0, 0))
+
+    def test_refresh_recomputes_from_linked_meals(self):
+        self._log_meal('Oats', 400, 15, 60, 8)
+        self._log_meal('Chicken', 550, 50, 40, 18)
+        DailyLog.objects.filter(user=self.user).update(total_calories=1, total_protein=2, total_carbs=3, total_fats=4)
+        refresh_daily_totals(DailyLog.objects.filter(user=self.user).values_list('pk', flat=True))
+        self.assertEqual(self._totals(), (950, 65, 100, 26))
+
+    def test_batch_callback_keeps_totals(self):
+        meal = {'user_id': self.user.pk, 'meal_date': self.day.isoformat(), 'protein': 10, 'carbs': 20, 'fats': 5}
+        response = self.client.post(
+            reverse('create_batch_from_agent'),
+            {'meals': [{**meal, 'meal_name': 'A', 'calories': 300}, {**meal, 'meal_name': 'B', 'calories': 200}]},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self._totals(), (500, 20, 40, 10))
+
+
+
+class ConditionalGetTests(WorkoutDataTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._log_workout(date(2026, 3, 2), (BENCH, 3, 5, 100))
+
+    def _get(self, url, etag=None, **params):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, params, **headers)
+
+    def test_unchanged_data_is_answered_with_304(self):
+        url = reverse('personal_records')
+        first = self._get(url)
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertIn('no-cache', first['Cache-Control'])
+        self.assertIn('private', first['Cache-Control'])
+
+        before = conditional_stats.snapshot()['views'].get('personal_records_api', {}).get('not_modified', 0)
+        repeat = self._get(url, etag)
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat.content, b'')
+        self.assertEqual(conditional_stats.snapshot()['views']['personal_records_api']['not_modified'], before + 1)
+
+    def test_tag_varies_with_the_query_string(self):
+        url = reverse('personal_records')
+        etag = self._get(url)['ETag']
+        exercise = Exercise.objects.get(name='Bench Press')
+        filtered = self._get(url, etag, exercise=exercise.pk)
+        self.assertEqual(filtered.status_code, 200)
+        self.assertNotEqual(filtered['ETag'], etag)
+
+    def test_a_write_invalidates_the_tag(self):
+        url = reverse('workout_history')
+        etag = self._get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self._log_workout(date(2026, 3, 4), (BENCH, 3, 5, 105))
+        after = self._get(url, etag)
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after['ETag'], etag)
+        self.assertEqual(len(after.json()['results']), 2)
+        self.assertEqual(self._get(url, after['ETag']).status_code, 304)
+
+    def test_deleting_a_workout_invalidates_the_tag(self):
+        url = reverse('progress_series')
+        exercise = Exercise.objects.get(name='Bench Press')
+        etag = self._get(url, exercise=exercise.pk)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Workout.objects.get(user=self.user).delete()
+        self.assertEqual(self._get(url, etag, exercise=exercise.pk).status_code, 200)
+
+    def test_other_users_writes_keep_the_tag(self):
+        url = reverse('personal_records')
+        etag = self._get(url)['ETag']
+        other = User.objects.create_user('other', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            self._log_workout(date(2026, 3, 4), (BENCH, 1, 1, 200), user=other)
+        self.assertEqual(self._get(url, etag).status_code, 304)
+
+    def test_errors_carry_no_tag(self):
+        response = self._get(reverse('personal_records'), exercise='abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('ETag', response)
+
+
+class HomeCacheTests(WorkoutDataTestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+
+    def _context(self):
+        return get_home_context(self.user, self.today)
+
+    def test_repeat_loads_are_served_from_the_cache(self):
+        _, hit = self._context()
+        self.assertFalse(hit)
+        with self.assertNumQueries(0):
+            _, hit = self._context()
+        self.assertTrue(hit)
+
+    def test_writes_invalidate_after_commit(self):
+        self._context()
+        with self.captureOnCommitCallbacks(execute=True):
+            self._log_workout(self.today, (BENCH, 3, 5, 100))
+        context, hit = self._context()
+        self.assertFalse(hit)
+        self.assertEqual([w.name for w in context['workouts']], ['Push'])
+        self.assertEqual(context['personal_records'][0]['exercise'], 'Bench Press')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Workout.objects.get(user=self.user).delete()
+        context, hit = self._context()
+        self.assertFalse(hit)
+        self.assertEqual(context['workouts'], [])
+
+    def test_rolled_back_writes_keep_the_entry(self):
+        self._context()
+        with self.captureOnCommitCallbacks(execute=False):
+            self._log_workout(self.today, (BENCH, 3, 5, 100))
+        # the bump waits for a commit that never happens
+        self.assertTrue(self._context()[1])
+
+    def test_batch_ingest_invalidates_despite_sending_no_signals(self):
+        self._context()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('create_batch_from_agent'),
+                {'meals': [{
+                    'user_id': self.user.pk, 'meal_name': 'Oats', 'meal_date': self.today.isoformat(),
+                    'calories': 400, 'protein': 15, 'carbs': 60, 'fats': 8,
+                }]},
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 201)
+        context, hit = self._context()
+        self.assertFalse(hit)
+        self.assertEqual([meal.name for meal in context['meals']], ['Oats'])
+        self.assertEqual(context['daily_log'].total_calories, 400)
+
+    def test_other_users_are_unaffected(self):
+        other = User.objects.create_user('other', password='pw')
+        self._context()
+        with self.captureOnCommitCallbacks(execute=True):
+            self._log_workout(self.today, (BENCH, 3, 5, 100), user=other)
+        self.assertTrue(self._context()[1])
+
+
+class WorkoutSerializerQueryTests(WorkoutDataTestCase):
+    """Serializing workouts costs the same two queries however many are returned"""
+
+    EXERCISES = [
+        BENCH,
+        {'name': 'Overhead Press', 'muscle_group': 'Shoulders', 'equipment': 'Barbell'},
+        {'name': 'Dip', 'muscle_group': 'Chest', 'equipment': 'Bodyweight'},
+    ]
+
+    def _serialize(self, queryset):
+        catalog.get_catalog(force_check=True)
+        with self.assertNumQueries(2):
+            return WorkoutSerializer(queryset, many=True).data
+
+    def test_recent_workouts_query_count_is_constant(self):
+        self._log_workout(date(2026, 3, 1), (BENCH, 3, 5, 100))
+        self.assertEqual(len(self._serialize(recent_workouts(self.user))), 1)
+
+        for day in range(2, 6):
+            self._log_workout(date(2026, 3, day), *[(ex, 3, 8, 50) for ex in self.EXERCISES])
+        data = self._serialize(recent_workouts(self.user))
+        self.assertEqual(len(data), 5)
+        self.assertEqual(data[0]['exercise_count'], 3)
+        self.assertEqual(data[0]['workout_exercises'][1]['exercise_name'], 'Overhead Press')
+
+    def test_workout_detail_query_count_is_constant(self):
+        single = self._log_workout(date(2026, 3, 1), (BENCH, 3, 5, 100))
+        full = self._log_workout(date(2026, 3, 2), *[(ex, 3, 8, 50) for ex in self.EXERCISES])
+        for workout, count in [(single, 1), (full, 3)]:
+            with self.subTest(exercises=count):
+                data = self._serialize(workout_detail_queryset(Workout.objects.filter(pk=workout.pk)))
+                self.assertEqual(len(data[0]['workout_exercises']), count)
+
+
+class ProgressSeriesTests(WorkoutDataTestCase):
+    @staticmethod
+    def _lttb(values, threshold):
+        return lttb(list(enumerate(values)), threshold, x=lambda p: p[0], y=lambda p: p[1])
+
+    def test_lttb_keeps_the_point_budget_ends_and_peaks(self):
+        values = [i % 7 for i in range(1000)]
+        values[500] = 100
+        sampled = self._lttb(values, 50)
+        self.assertEqual(len(sampled), 50)
+        self.assertEqual((sampled[0], sampled[-1]), ((0, values[0]), (999, values[999])))
+        xs = [x for x, _ in sampled]
+        self.assertEqual(xs, sorted(set(xs)))
+        self.assertIn((500, 100), sampled)
+
+    def test_lttb_leaves_short_and_empty_series_alone(self):
+        points = list(enumerate([3, 1, 4, 1, 5]))
+        for threshold in (5, 10, 2):
+            with self.subTest(threshold=threshold):
+                sampled = lttb(points, threshold, x=lambda p: p[0], y=lambda p: p[1])
+                self.assertEqual(sampled, points)
+                self.assertIsNot(sampled, points)
+        self.assertEqual(self._lttb([], 10), [])
+
+    def test_api_downsamples_to_max_points(self):
+        exercise_id = resolve_exercises([BENCH])['Bench Press']
+        start = date(2026, 1, 1)
+        ExerciseProgress.objects.bulk_create([
+            ExerciseProgress(user=self.user, exercise_id=exercise_id, date=start + timedelta(days=i),
+                             total_volume=1000 + (i % 5) * 100, total_sets=3, total_reps=15)
+            for i in range(60)
+        ])
+        self.client.force_login(self.user)
+        url = reverse('progress_series')
+
+        data = self.client.get(url, {'exercise': exercise_id, 'bucket': 'day', 'max_points': 10}).json()
+        self.assertEqual((data['total_buckets'], len(data['points'])), (60, 10))
+        self.assertEqual(data['points'][0]['period'], '2026-01-01')
+        self.assertEqual(data['points'][-1]['period'], '2026-03-01')
+
+        weekly = self.client.get(url, {'exercise': exercise_id, 'bucket': 'week', 'max_points': 100}).json()
+        self.assertEqual(len(weekly['points']), weekly['total_buckets'])
+
+        empty = self.client.get(url, {'exercise': exercise_id, 'start': '2027-01-01'}).json()
+        self.assertEqual((empty['total_buckets'], empty['points']), (0, []))
+
+
+class ExportTests(WorkoutDataTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create_user('other', password='pw')
+        self._log_workout(date(2026, 3, 2), (BENCH, 3, 5, 100))
+        self._log_workout(date(2026, 3, 2), (BENCH, 3, 5, 80), name='Secret', user=self.other)
+        MealEntry.objects.create(user=self.user, name='Oats', calories=400, protein=20, carbs=60, fats=8, date=date(2026, 3, 2))
+        MealEntry.objects.create(user=self.other, name='Secret meal', calories=1, protein=1, carbs=1, fats=1, date=date(2026, 3, 2))
+        self.client.force_login(self.user)
+
+    def _download(self, **params):
+        response = self.client.get(reverse('export_data'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def _records(self, content):
+        return [json.loads(line) for line in content.decode().splitlines()]
+
+    def test_csv_holds_one_dataset_with_a_header(self):
+        response, content = self._download(format='csv', dataset='workouts')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('filename="workouts.csv"', response['Content-Disposition'])
+        header, *rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual(header, ['id', 'user_id', 'name', 'date', 'notes', 'created_at'])
+        self.assertEqual([(row[1], row[2]) for row in rows], [(str(self.user.pk), 'Push')])
+
+        self.assertEqual(self.client.get(reverse('export_data'), {'format': 'csv', 'dataset': 'all'}).status_code, 400)
+
+    def test_ndjson_tags_every_dataset_and_only_holds_the_users_rows(self):
+        _, content = self._download()
+        records = self._records(content)
+        self.assertEqual(
+            Counter(record['dataset'] for record in records),
+            {'workouts': 1, 'exercises': 1, 'meals': 1, 'progress': 1},
+        )
+        self.assertEqual({record['user_id'] for record in records}, {self.user.pk})
+        self.assertNotIn(b'Secret', content)
+
+    def test_gzip_wraps_the_same_lines(self):
+        _, plain = self._download(format='ndjson')
+        response, compressed = self._download(format='ndjson', gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('filename="all.ndjson.gz"', response['Content-Disposition'])
+        self.assertEqual(gzip.decompress(compressed), plain)
+
+    def test_streaming_query_count_does_not_grow_with_rows(self):
+        def streamed_queries():
+            response = self.client.get(reverse('export_data'))
+            with CaptureQueriesContext(connection) as queries:
+                lines = b''.join(response.streaming_content).count(b'\n')
+            return len(queries), lines
+
+        few, few_lines = streamed_queries()
+        for day in range(3, 13):
+            self._log_workout(date(2026, 3, day), (BENCH, 3, 5, 100))
+        many, many_lines = streamed_queries()
+        self.assertEqual(few, len(EXPORT_DATASETS))
+        self.assertEqual(many, few)
+        self.assertEqual(many_lines, few_lines + 30)
+
+
+# --- Workout history (keyset pagination) ---
+
+class WorkoutHistoryTests(LoggerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('lifter', password='pw')
+        self.client.force_login(self.user)
+        stamp = timezone.now()
+        # three workouts share date and created_at, so only the id breaks the tie
+        self.workouts = []
+        for day, name in [(date(2026, 3, 4), 'A'), (date(2026, 3, 4), 'B'), (date(2026, 3, 4), 'C'),
+                          (date(2026, 3, 3), 'D'), (date(2026, 3, 2), 'E')]:
+            self.workouts.append(Workout.objects.create(user=self.user, name=name, date=day))
+        Workout.objects.filter(date=date(2026, 3, 4)).update(created_at=stamp)
+        Workout.objects.create(user=User.objects.create_user('other', password='pw'), name='X', date=date(2026, 3, 4))
+
+    def _pages(self, page_size, **params):
+        ids, cursor = [], None
+        while True:
+            query = {'page_size': page_size, **params}
+            if cursor:
+                query['cursor'] = cursor
+            response = self.client.get(reverse('workout_history'), query)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            self.assertLessEqual(len(body['results']), page_size)
+            ids.extend(workout['id'] for workout in body['results'])
+            cursor = body['next_cursor']
+            if cursor is None:
+                return ids
+
+    def test_pages_walk_ties_in_order_without_gaps_or_repeats(self):
+        a, b, c, d, e = (w.pk for w in self.workouts)
+        expected = [c, b, a, d, e]
+        for page_size in (1, 2, 3, 5):
+            self.assertEqual(self._pages(page_size), expected)
+
+    def test_cursor_is_stable_when_newer_workouts_arrive(self):
+        first = self.client.get(reverse('workout_history'), {'page_size': 2}).json()
+        # a new workout on the same day sorts before the cursor, so it can't shift later pages
+        Workout.objects.create(user=self.user, name='Late', date=date(2026, 3, 4))
+        rest = self.client.get(
+            reverse('workout_history'), {'page_size': 10, 'cursor': first['next_cursor']}
+        ).json()
+        a, b, c, d, e = (w.pk for w in self.workouts)
+        self.assertEqual([w['id'] for w in first['results']], [c, b])
+        self.assertEqual([w['id'] for w in rest['results']], [a, d, e])
+        self.assertIsNone(rest['next_cursor'])
+
+    def test_date_range_and_bad_cursor(self):
+        a, b, c, d, e = (w.pk for w in self.workouts)
+        self.assertEqual(self._pages(2, start='2026-03-03', end='2026-03-04'), [c, b, a, d])
+        response = self.client.get(reverse('workout_history'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+# --- Tracker CSV import ---
+
+STRONG_CSV = """Date,Workout Name,Exercise Name,Weight (lbs),Reps,Notes
+2026-03-02 07:30:00,Push,Bench Press (Barbell),100,5,
+2026-03-02 07:30:00,Push,Bench Press (Barbell),100,5,paused
+2026-03-02 07:30:00,Push,Cable Crossover (Cable),50,12,
+2026-03-04 07:30:00,Pull,Seal Row (Barbell),135,8,
+"""
+
+
+@override_settings(WEIGHT_UNIT='kg')
+class ImportWorkoutsTests(LoggerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('lifter', password='pw')
+        self.chest = MuscleGroup.objects.create(name='Chest')
+        self.bench = BaseExercise.objects.create(name='Bench Press', primary_muscle_group=self.chest)
+
+    def _import(self, text):
+        return import_workouts(self.user, io.StringIO(text))
+
+    def test_equipment_suffix_maps_onto_the_existing_movement(self):
+        self._import(STRONG_CSV)
+        variant = Exercise.objects.get(name='Bench Press (Barbell)')
+        self.assertEqual(variant.base_exercise, self.bench)
+        self.assertEqual(variant.equipment.name, 'Barbell')
+        self.assertEqual(Exercise.objects.get(name='Cable Crossover (Cable)').equipment.name, 'Cable')
+        self.assertEqual(BaseExercise.objects.filter(name='Bench Press').count(), 1)
+
+    def test_weights_are_converted_to_kilograms(self):
+        self._import(STRONG_CSV)
+        bench = WorkoutExercise.objects.get(exercise__name='Bench Press (Barbell)')
+        self.assertEqual((bench.sets, bench.reps), (2, 5))
+        self.assertAlmostEqual(float(bench.weight), 45.36, places=2)
+        self.assertEqual(bench.notes, 'paused')
+
+        self._import("date,exercise,weight,weight_unit,reps\n2026-03-09,Deadlift,60,kg,5\n2026-03-09,Squat,220.5,lbs,5\n")
+        weights = dict(WorkoutExercise.objects.filter(workout__date=date(2026, 3, 9)).values_list('exercise__name', 'weight'))
+        self.assertAlmostEqual(float(weights['Deadlift']), 60)
+        self.assertAlmostEqual(float(weights['Squat']), 100.02, places=2)
+
+    def test_reimport_skips_workouts_already_imported(self):
+        first = self._import(STRONG_CSV)
+        self.assertEqual((first.workouts, first.duplicates), (2, 0))
+        again = self._import(STRONG_CSV + "2026-03-06 07:30:00,Legs,Squat (Barbell),225,5,\n")
+        self.assertEqual((again.workouts, again.duplicates), (1, 2))
+        self.assertEqual(Workout.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(WorkoutExercise.objects.filter(workout__name='Push').count(), 2)
+
+    def test_malformed_rows_are_skipped(self):
+        result = self._import(
+            "Date,Workout Name,Exercise Name,Weight (kg),Reps\n"
+            "not a date,Push,Bench Press (Barbell),60,5\n"
+            "2026-03-02,Push,,60,5\n"
+            "2026-03-02,Push,Rowing Machine,,\n"
+            "2026-03-02,Push,Bench Press (Barbell),sixty,5\n"
+        )
+        self.assertEqual((result.rows, result.skipped, result.workouts), (4, 3, 1))
+        self.assertIsNone(WorkoutExercise.objects.get().weight)
+
+    def test_malformed_files_are_rejected(self):
+        with self.assertRaisesMessage(ImportFormatError, 'missing required column(s): reps'):
+            self._import("date,exercise\n2026-03-02,Bench Press\n")
+        with self.assertRaisesMessage(ImportFormatError, "Unknown weight unit: 'stone'"):
+            self._import("date,exercise,weight,weight_unit,reps\n2026-03-02,Bench Press,10,stone,5\n")
+
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('export.csv', b"date,exercise\n2026-03-02,Bench Press\n", content_type='text/csv')
+        response = self.client.post(reverse('import_workouts'), {'file': upload})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Workout.objects.exists())
+
+    def test_new_movements_without_a_muscle_group_leave_it_unset(self):
+        self._import(STRONG_CSV)
+        self.assertEqual(list(MuscleGroup.objects.values_list('name', flat=True)), ['Chest'])
+        self.assertIsNone(BaseExercise.objects.get(name='Seal Row').primary_muscle_group)
+        workout = Workout.objects.get(name='Pull')
+        data = WorkoutSerializer(workout_detail_queryset(Workout.objects.filter(pk=workout.pk)).get()).data
+        self.assertIsNone(data['workout_exercises'][0]['primary_muscle_group'])
+
+
+# --- Query plans ---
+
+class HotQueryPlanTests(WorkoutDataTestCase):
+    def test_hot_queries_are_served_by_indexes(self):
+        self._log_workout(timezone.localdate(), (BENCH, 3, 5, 100))
+        out = io.StringIO()
+        call_command('explain_hot_queries', '--user', str(self.user.pk), stdout=out)
+        self.assertNotIn('[CHECK]', out.getvalue())
+        self.assertIn('All hot queries are served by an index.', out.getvalue())
+
+
+# --- Replica routing (two SQLite files) ---
+
+class ReplicaTestCase(LoggerTransactionTestCase):
+    """
+    Adds an "analytics" alias backed by a second SQLite file, filled from the
+    primary by ``simulate_replica_lag --once``. Transactional, because the copy
+    only sees committed rows.
+    """
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        replica = {
+            **connections.settings['default'],
+            'NAME': os.path.join(directory, 'replica.sqlite3'),
+            'OPTIONS': {'timeout': 5, 'init_command': 'PRAGMA query_only=ON'},
+        }
+        # registered as a live connection but kept out of settings.DATABASES, so
+        # the test runner never creates, flushes or guards it; analytics_alias()
+        # is pointed at it instead
+        connections['analytics'] = load_backend(replica['ENGINE']).DatabaseWrapper(replica, 'analytics')
+        self.addCleanup(self._drop_replica)
+        for module in (routers, simulate_replica_lag):
+            patcher = mock.patch.object(module, 'analytics_alias', return_value='analytics')
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user('lifter', password='pw')
+        self.client.force_login(self.user)
+
+    def _drop_replica(self):
+        connections['analytics'].close()
+        del connections['analytics']
+
+    def _replicate(self):
+        call_command('simulate_replica_lag', '--once', stdout=io.StringIO())
+        # a fresh copy replaced the file under any open connection
+        connections['analytics'].close()
+
+    def _forget_writes(self):
+        """Jump past the sticky window"""
+        cache.delete(routers._last_write_key(self.user.pk))
+
+    def _history_names(self, **headers):
+        response = self.client.get(reverse('workout_history'), **headers)
+        self.assertEqual(response.status_code, 200)
+        return response, [workout['name'] for workout in response.json()['results']]
+
+
+class ReplicaRoutingTests(ReplicaTestCase):
+    def setUp(self):
+        super().setUp()
+        Workout.objects.create(user=self.user, name='Replicated', date=date(2026, 3, 2))
+        self._replicate()
+        Workout.objects.create(user=self.user, name='Primary only', date=date(2026, 3, 3))
+
+    def test_reads_inside_the_sticky_window_go_to_the_primary(self):
+        self.assertTrue(routers.recently_wrote(self.user.pk))
+        _, names = self._history_names()
+        self.assertEqual(names, ['Primary only', 'Replicated'])
+
+    def test_reads_after_the_window_go_to_the_replica(self):
+        self._forget_writes()
+        _, names = self._history_names()
+        self.assertEqual(names, ['Replicated'])
+
+        with override_settings(REPLICA_STICKY_SECONDS=0):
+            Workout.objects.create(user=self.user, name='Another', date=date(2026, 3, 4))
+            self.assertFalse(routers.recently_wrote(self.user.pk))
+            self.assertEqual(self._history_names()[1], ['Replicated'])
+
+    def test_only_stale_read_views_use_the_replica(self):
+        self._forget_writes()
+        # plain code and views without @allow_stale_reads read the primary
+        self.assertEqual(routers.read_alias(), routers.PRIMARY)
+        self.assertEqual(Workout.objects.filter(user=self.user).count(), 2)
+        response = self.client.get(reverse('get_recent_workouts'), {'user_id': self.user.pk})
+        self.assertEqual(len(response.json()), 2)
+
+        @routers.allow_stale_reads
+        def view(request):
+            return routers.read_alias(), Workout.objects.filter(user=self.user).count()
+
+        request = mock.Mock(user=self.user)
+        self.assertEqual(view(request), ('analytics', 1))
+        with routers.primary_reads():
+            self.assertEqual(routers.read_alias(), routers.PRIMARY)
+
+    def test_writes_and_transactions_stay_on_the_primary(self):
+        self._forget_writes()
+
+        @routers.allow_stale_reads
+        def view(request):
+            with transaction.atomic():
+                inside = routers.read_alias()
+                Workout.objects.create(user=self.user, name='From a stale view', date=date(2026, 3, 5))
+            return inside
+
+        self.assertEqual(view(mock.Mock(user=self.user)), routers.PRIMARY)
+        self.assertTrue(Workout.objects.using(routers.PRIMARY).filter(name='From a stale view').exists())
+        self.assertFalse(Workout.objects.using('analytics').filter(name='From a stale view').exists())
+
+    def test_replica_reads_are_not_tagged(self):
+        url = reverse('muscle_volume')
+        tagged = self.client.get(url)
+        self.assertIn('ETag', tagged)
+
+        self._forget_writes()
+        replica_read = self.client.get(url, HTTP_IF_NONE_MATCH=tagged['ETag'])
+        self.assertEqual(replica_read.status_code, 200)
+        self.assertNotIn('ETag', replica_read)
+
+    def test_replica_refuses_writes(self):
+        with self.assertRaises(OperationalError):
+            with connections['analytics'].cursor() as cursor:
+                cursor.execute("DELETE FROM logger_workout")
+
+
+# --- SQL instrumentation ---
+
+class SQLInstrumentationTests(LoggerTestCase):
+    def _instrumented(self, view):
+        middleware = SQLInstrumentationMiddleware(view)
+        request = RequestFactory().get('/probe/')
+        with self.assertLogs('logger.sql', 'DEBUG') as logs:
+            response = middleware(request)
+        return response, [(record.levelname, json.loads(record.getMessage())) for record in logs.records]
+
+    def test_sql_template_collapses_literals_and_in_lists(self):
+        self.assertEqual(
+            sql_template("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'it''s' AND n > 42.5"),
+            "SELECT * FROM t WHERE id IN (...) AND name = ? AND n > ?",
+        )
+        self.assertEqual(sql_template('SELECT a FROM t WHERE id IN (%s)'), 'SELECT a FROM t WHERE id IN (...)')
+
+    def test_repeats_below_the_threshold_are_not_suspects(self):
+        recorder = QueryRecorder(n_plus_one_threshold=3)
+        run = lambda sql, params, many, context: None
+        for pk in (1, 2):
+            recorder(run, f'SELECT * FROM t WHERE id = {pk}', None, False, {})
+        recorder(run, 'UPDATE t SET n = 1', None, False, {})
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual([row[:2] for row in recorder.repeated()], [('SELECT * FROM t WHERE id = ?', 2)])
+        self.assertEqual(recorder.n_plus_one(), [])
+
+        recorder(run, 'SELECT * FROM t WHERE id = 3', None, False, {})
+        (template, count, _, origin), = recorder.n_plus_one()
+        self.assertEqual((template, count), ('SELECT * FROM t WHERE id = ?', 3))
+        self.assertRegex(origin, r'^logger/tests\.py:\d+ in test_repeats_below_the_threshold_are_not_suspects$')
+
+    @override_settings(SQL_INSTRUMENTATION_SAMPLE_RATE=1.0, SQL_N_PLUS_ONE_THRESHOLD=5)
+    def test_n_plus_one_is_logged_with_its_origin(self):
+        users = [User.objects.create_user(f'user{i}').pk for i in range(5)]
+
+        def view(request):
+            for pk in users:
+                User.objects.filter(pk=pk).exists()
+            return HttpResponse()
+
+        response, logs = self._instrumented(view)
+        (level, request_line), (suspect_level, suspect) = logs
+        self.assertEqual(level, 'DEBUG')
+        self.assertEqual(request_line['queries'], 5)
+        self.assertEqual(suspect_level, 'WARNING')
+        self.assertEqual((suspect['event'], suspect['count']), ('n_plus_one', 5))
+        self.assertRegex(suspect['origin'], r'^logger/tests\.py:\d+ in view$')
+
+    @override_settings(SQL_INSTRUMENTATION_SAMPLE_RATE=1.0)
+    def test_sampled_responses_get_a_server_timing_header(self):
+        def view(request):
+            User.objects.count()
+            response = HttpResponse()
+            response['Server-Timing'] = 'render;dur=1.0'
+            return response
+
+        response, logs = self._instrumented(view)
+        self.assertEqual([level for level, _ in logs], ['DEBUG'])
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^render;dur=1\.0, db;dur=\d+\.\d;desc="1 queries", app;dur=\d+\.\d$',
+        )
+
+    @override_settings(SQL_INSTRUMENTATION_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_left_alone(self):
+        response = SQLInstrumentationMiddleware(lambda request: HttpResponse())(RequestFactory().get('/probe/'))
+        self.assertNotIn('Server-Timing', response)
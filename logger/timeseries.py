@@ -0,0 +1,98 @@
+"""
+Chart data for exercise progress.
+
+Metrics are aggregated in SQL per day/week/month bucket, then capped to a
+maximum number of points with Largest-Triangle-Three-Buckets downsampling so
+long histories stay cheap to ship and render.
+"""
+from datetime import date
+
+from django.db.models import Avg, Count, Max, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from .models import ExerciseProgress
+
+BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+METRICS = (
+    'total_volume', 'max_volume', 'avg_volume',
+    'max_one_rep_max', 'avg_one_rep_max',
+    'total_sets', 'avg_sets', 'total_reps', 'avg_reps',
+)
+
+
+def lttb(points, threshold, x, y):
+    """
+    Largest-Triangle-Three-Buckets: keep ``threshold`` points that preserve the
+    visual shape of the series. ``x``/``y`` pull numeric coordinates from a point.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # average of the next bucket is the third triangle vertex
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        span = avg_end - avg_start
+        avg_x = sum(x(p) for p in points[avg_start:avg_end]) / span
+        avg_y = sum(y(p) for p in points[avg_start:avg_end]) / span
+
+        ax, ay = x(points[a]), y(points[a])
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (y(points[j]) - ay) - (ax - x(points[j])) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def progress_series(user, exercise_id, bucket='week', start=None, end=None, max_points=200, metric='total_volume'):
+    """
+    Bucketed ExerciseProgress metrics for one exercise, oldest first.
+    Returns (points, total_buckets) where points has at most max_points entries.
+    """
+    rows = ExerciseProgress.objects.filter(user=user, exercise_id=exercise_id)
+    if start:
+        rows = rows.filter(date__gte=start)
+    if end:
+        rows = rows.filter(date__lte=end)
+
+    # aggregates are aliased with a prefix so they don't clash with the model fields
+    buckets = (
+        rows.annotate(period=BUCKETS[bucket]('date'))
+        .values('period')
+        .annotate(
+            agg_total_volume=Sum('total_volume'),
+            agg_max_volume=Max('total_volume'),
+            agg_avg_volume=Avg('total_volume'),
+            agg_max_one_rep_max=Max('one_rep_max_est'),
+            agg_avg_one_rep_max=Avg('one_rep_max_est'),
+            agg_total_sets=Sum('total_sets'),
+            agg_avg_sets=Avg('total_sets'),
+            agg_total_reps=Sum('total_reps'),
+            agg_avg_reps=Avg('total_reps'),
+            sessions=Count('id'),
+        )
+        .order_by('period')
+    )
+    points = [
+        {
+            'period': row['period'].isoformat(),
+            'sessions': row['sessions'],
+            **{name: round(float(row[f'agg_{name}'] or 0), 2) for name in METRICS},
+        }
+        for row in buckets
+    ]
+    sampled = lttb(points, max_points, x=lambda p: date.fromisoformat(p['period']).toordinal(), y=lambda p: p[metric])
+    return sampled, len(points)
@@ -1,20 +1,29 @@
 from django.urls import path
 from . import views
 from django.conf import settings
-from django.conf.urls.static import static
 
 urlpatterns = [
     path('register/', views.register, name='register'),
     path('', views.home, name='home'),
     path('api/trigger-agent/', views.trigger_agent, name='trigger_agent'),
+    path('api/agent-jobs/<int:job_id>/', views.agent_job_status, name='agent_job_status'),
     path('api/create-workout-from-agent/', views.create_workout_from_agent, name='create_workout_from_agent'),
     path('api/create-meal-from-agent/', views.create_meal_from_agent, name='create_meal_from_agent'),
+    path('api/create-batch-from-agent/', views.create_batch_from_agent, name='create_batch_from_agent'),
     path('api/recent-workouts/', views.get_recent_workouts, name='get_recent_workouts'),
+    path('api/workouts/history/', views.workout_history, name='workout_history'),
+    path('api/import-workouts/', views.import_workouts_api, name='import_workouts'),
+    path('api/cache-stats/', views.cache_stats, name='cache_stats'),
     path('progress/', views.progress, name='progress'),
+    path('export/', views.export_data, name='export_data'),
+    path('api/progress/series/', views.progress_series_api, name='progress_series'),
+    path('api/personal-records/', views.personal_records_api, name='personal_records'),
+    path('api/muscle-volume/', views.muscle_volume_api, name='muscle_volume'),
     path('upload-picture/', views.upload_picture, name='upload_picture'),
     path('delete-picture/<int:pic_id>/', views.delete_picture, name='delete_picture'),
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:name>", views.serve_media, name='serve_media'),
     path('delete/workout/<int:workout_id>/', views.delete_workout, name='delete_workout'),
     path('delete/meal/<int:meal_id>/', views.delete_meal, name='delete_meal'),
     path('about/', views.about, name='about'),
     
-]   + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+]
\ No newline at end of file
@@ -0,0 +1,69 @@
+"""
+Per-user cache generations.
+
+Each user has a generation counter in the shared Django cache. Any write to
+that user's dashboard data bumps it (signals.py, plus explicit calls from bulk
+write paths that bypass signals), so cache entries keyed on the generation go
+stale without ever being deleted.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .routers import mark_user_write
+
+
+def _generation_key(user_id):
+    return f'logger:user:{user_id}:gen'
+
+
+def get_user_generation(user_id):
+    generation = cache.get(_generation_key(user_id))
+    if generation is None:
+        # seed with a timestamp so a lost key can never reuse an old generation
+        cache.add(_generation_key(user_id), time.time_ns(), timeout=None)
+        generation = cache.get(_generation_key(user_id))
+    return generation
+
+
+def _bump(user_id):
+    try:
+        cache.incr(_generation_key(user_id))
+    except ValueError:
+        cache.set(_generation_key(user_id), time.time_ns(), timeout=None)
+    # keep the user's stale-read views on the primary for a while (routers.py)
+    mark_user_write(user_id)
+
+
+def bump_user_generation(*user_ids):
+    """Invalidate cached data for these users once the current transaction commits"""
+    for user_id in set(user_ids):
+        if user_id is not None:
+            transaction.on_commit(lambda user_id=user_id: _bump(user_id))
+
+
+class HitCounter:
+    """Per-process cache hit/miss counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            }
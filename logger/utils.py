@@ -1,34 +1,296 @@
 # utils.py (recommended)
 from math import ceil
-from .models import ExerciseProgress
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from .models import DailyLog, ExerciseProgress, MuscleGroup, Equipment, BaseExercise, Exercise, WorkoutExercise
+from .catalog import get_catalog, invalidate_catalog, normalize_name
+from .records import apply_record_candidates
+from .rollups import apply_rollup_entries
+from .user_cache import bump_user_generation
 
-def update_exercise_progress(user, workout):
+
+def _get_or_create_by_name(model, rows, known):
+    """
+    Bulk get-or-create for catalog models keyed on a unique ``name``.
+    rows maps name -> dict of defaults used only when the row is missing;
+    known maps normalized name -> pk from the catalog cache.
+    Names are matched like the catalog matches them (normalize_name), so
+    "bench press" finds "Bench Press" instead of creating a duplicate.
+    Returns {name: pk}. Cache hits cost no queries; misses cost two
+    case-insensitive lookups plus one bulk insert at most.
+    """
+    found = {}
+    lookup = {}     # normalized name -> requested names
+    for name in rows:
+        key = normalize_name(name)
+        pk = known.get(key)
+        if pk is not None:
+            found[name] = pk
+        else:
+            lookup.setdefault(key, []).append(name)
+    if not lookup:
+        return found
+
+    def fetch(keys):
+        query = Q()
+        for key in keys:
+            query |= Q(name__iexact=' '.join(lookup[key][0].split()))
+        for db_name, pk in model.objects.filter(query).values_list('name', 'id'):
+            for name in lookup.get(normalize_name(db_name), ()):
+                found.setdefault(name, pk)
+
+    fetch(lookup)
+    # one row per normalized name, spelled as first requested
+    missing = [model(name=' '.join(names[0].split()), **rows[names[0]]) for names in lookup.values() if names[0] not in found]
+    if missing:
+        # ignore_conflicts covers a concurrent writer inserting the same name
+        model.objects.bulk_create(missing, ignore_conflicts=True)
+        fetch([normalize_name(obj.name) for obj in missing])
+        # bulk_create sends no post_save, so invalidate the catalog ourselves
+        invalidate_catalog()
+    return found
+
+
+def resolve_exercises(exercises_data):
+    """
+    Map every exercise in an AI payload onto catalog rows, creating only the
+    missing MuscleGroup/Equipment/BaseExercise/Exercise entries.
+    An exercise may name its movement in ``base_exercise`` (e.g. "Bench Press"
+    for "Bench Press (Barbell)"); it then maps onto that base exercise's
+    variant with the same equipment, or becomes a new variant of it.
+    Query count is constant regardless of how many exercises are passed in,
+    and zero when every name is already in the catalog cache.
+    Returns {exercise name: Exercise id}.
     """
-    Aggregate workout data into ExerciseProgress entries.
-    """
-    for we in workout.workoutexercise_set.all():
-        total_volume = (we.weight or 0) * (we.reps or 0) * (we.sets or 0)
-        total_reps = (we.reps or 0) * (we.sets or 0)
-        avg_weight = we.weight or 0
-        one_rep_max_est = (we.weight or 0) * (1 + (we.reps or 0) / 30.0)
-
-        progress, _ = ExerciseProgress.objects.get_or_create(
-            user=user,
-            exercise=we.exercise,
-            date=workout.date,
-            defaults={
-                'total_volume': total_volume,
-                'avg_weight': avg_weight,
-                'total_sets': we.sets,
-                'total_reps': total_reps,
-                'one_rep_max_est': one_rep_max_est
-            }
+    catalog = get_catalog()
+
+    # first occurrence of a name decides its muscle group / equipment
+    first_seen = {}
+    for ex in exercises_data:
+        first_seen.setdefault(ex['name'], ex)
+
+    exercise_ids = {}
+    for name, ex in first_seen.items():
+        exercise_id = catalog.exercises.get(normalize_name(name))
+        if exercise_id is None and ex.get('base_exercise'):
+            exercise_id = catalog.exercise_variants.get((
+                catalog.base_exercises.get(normalize_name(ex['base_exercise'])),
+                catalog.equipment.get(normalize_name(ex.get('equipment') or 'Bodyweight')),
+            ))
+        if exercise_id is not None:
+            exercise_ids[name] = exercise_id
+    pending = {name: ex for name, ex in first_seen.items() if name not in exercise_ids}
+    if not pending:
+        return exercise_ids
+
+    # exercises without a muscle group (e.g. tracker imports) leave it unset
+    muscle_ids = _get_or_create_by_name(MuscleGroup, {
+        ex['muscle_group']: {} for ex in pending.values() if ex.get('muscle_group')
+    }, catalog.muscle_groups)
+    equipment_ids = _get_or_create_by_name(Equipment, {
+        ex.get('equipment') or 'Bodyweight': {} for ex in pending.values()
+    }, catalog.equipment)
+
+    # base exercise represents generic movement
+    base_ids = _get_or_create_by_name(BaseExercise, {
+        ex.get('base_exercise') or name: {'primary_muscle_group_id': muscle_ids.get(ex.get('muscle_group'))}
+        for name, ex in pending.items()
+    }, catalog.base_exercises)
+
+    # leaf Exercise is instance with specific equipment
+    exercise_ids.update(_get_or_create_by_name(Exercise, {
+        name: {
+            'base_exercise_id': base_ids[ex.get('base_exercise') or name],
+            'equipment_id': equipment_ids[ex.get('equipment') or 'Bodyweight'],
+        }
+        for name, ex in pending.items()
+    }, catalog.exercises))
+    return exercise_ids
+
+
+def build_workout_exercises(workout, exercises_data, exercise_ids):
+    """Unsaved WorkoutExercise rows for a workout's validated AI exercises, ready for bulk_create"""
+    return [
+        WorkoutExercise(
+            user_id=workout.user_id,
+            name=ex['name'],
+            workout=workout,
+            exercise_id=exercise_ids[ex['name']],
+            sets=int(ex.get('sets', 3)),
+            reps=int(ex.get('reps', 10)),
+            weight=float(ex['weight']) if ex.get('weight') is not None else None,
+            rest_seconds=int(ex['rest_seconds']) if ex.get('rest_seconds') else None,
+            notes=ex.get('notes') or "",
+            order=order
         )
+        for order, ex in enumerate(exercises_data)
+    ]
+
+
+PROGRESS_UPDATE_FIELDS = ['total_volume', 'avg_weight', 'total_sets', 'total_reps', 'one_rep_max_est']
+
+
+def _fold_progress_entries(entries):
+    """
+    Fold (user_id, exercise_id, date, sets, reps, weight) entries into one delta
+    per ExerciseProgress key, so duplicate exercises in a workout are written once.
+    """
+    deltas = {}
+    for user_id, exercise_id, day, sets, reps, weight in entries:
+        sets = sets or 0
+        weight = float(weight or 0)
+        total_reps = (reps or 0) * sets
+        delta = deltas.setdefault((user_id, exercise_id, day), {
+            'total_volume': 0.0, 'weight_sets': 0.0, 'total_sets': 0,
+            'total_reps': 0, 'one_rep_max_est': 0.0,
+        })
+        delta['total_volume'] += weight * total_reps
+        delta['weight_sets'] += weight * sets
+        delta['total_sets'] += sets
+        delta['total_reps'] += total_reps
+        delta['one_rep_max_est'] = max(delta['one_rep_max_est'], weight * (1 + (reps or 0) / 30.0))
+    return deltas
+
+
+def apply_progress_entries(entries):
+    """
+    Batched ExerciseProgress upsert engine.
+    Loads every existing row for the touched (user, exercise, date) keys in one
+    query, merges the deltas in memory and writes everything back with a single
+    bulk_create(update_conflicts=True) on the unique_together key, all in one
+    transaction.
+    avg_weight is kept as a sets-weighted mean. Returns the folded deltas.
+    """
+    deltas = _fold_progress_entries(entries)
+    if not deltas:
+        return deltas
+
+    user_ids = {key[0] for key in deltas}
+    exercise_ids = {key[1] for key in deltas}
+    dates = {key[2] for key in deltas}
 
-        # If progress exists, update it
-        progress.total_volume += total_volume
-        progress.total_sets += we.sets
-        progress.total_reps += total_reps
-        progress.avg_weight = (progress.avg_weight + avg_weight) / 2
-        progress.one_rep_max_est = max(progress.one_rep_max_est, one_rep_max_est)
-        progress.save()
+    # read-modify-write in one transaction: BEGIN IMMEDIATE (SQLite) or the row
+    # locks (other backends) keep a concurrent callback from merging into the
+    # same old row and overwriting this one's totals
+    with transaction.atomic():
+        existing = {
+            (p.user_id, p.exercise_id, p.date): p
+            for p in ExerciseProgress.objects.select_for_update().filter(
+                user_id__in=user_ids, exercise_id__in=exercise_ids, date__in=dates
+            )
+        }
+
+        rows = []
+        for key, delta in deltas.items():
+            progress = existing.get(key)
+            if progress is None:
+                progress = ExerciseProgress(user_id=key[0], exercise_id=key[1], date=key[2])
+            weight_sets = progress.avg_weight * progress.total_sets + delta['weight_sets']
+            progress.total_volume += delta['total_volume']
+            progress.total_sets += delta['total_sets']
+            progress.total_reps += delta['total_reps']
+            progress.avg_weight = weight_sets / progress.total_sets if progress.total_sets else 0
+            progress.one_rep_max_est = max(progress.one_rep_max_est, delta['one_rep_max_est'])
+            rows.append(progress)
+
+        ExerciseProgress.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['user', 'exercise', 'date'],
+            update_fields=PROGRESS_UPDATE_FIELDS,
+        )
+    return deltas
+
+
+def update_exercise_progress(user, workout):
+    """
+    Aggregate workout data into ExerciseProgress entries, personal records and
+    muscle-group rollups. A constant number of queries regardless of workout
+    size: read the workout's exercises, then one load and one upsert for each.
+    """
+    sets_data = list(workout.workoutexercise_set.values_list('exercise_id', 'sets', 'reps', 'weight'))
+    apply_progress_entries(
+        (user.id, exercise_id, workout.date, sets, reps, weight)
+        for exercise_id, sets, reps, weight in sets_data
+    )
+    apply_record_candidates(
+        (user.id, exercise_id, workout.pk, workout.date, reps, weight)
+        for exercise_id, sets, reps, weight in sets_data
+    )
+    apply_rollup_entries(
+        (user.id, exercise_id, workout.date, sets, reps, weight)
+        for exercise_id, sets, reps, weight in sets_data
+    )
+    # the upserts send no signals, and the workout's own bump may already have
+    # fired, so move the user's data version past the derived rows too
+    bump_user_generation(user.id)
+
+
+# --- DailyLog macro totals ---
+
+MACRO_TOTAL_FIELDS = {
+    'calories': 'total_calories',
+    'protein': 'total_protein',
+    'carbs': 'total_carbs',
+    'fats': 'total_fats',
+}
+
+
+def _adjust_daily_totals(daily_logs, meal, sign):
+    """
+    Atomically add (sign=1) or subtract (sign=-1) a meal's macros from the
+    given DailyLog queryset with F() expressions, clamped at zero.
+    """
+    return daily_logs.update(**{
+        total: Greatest(F(total) + sign * (getattr(meal, field) or 0), Value(0))
+        for field, total in MACRO_TOTAL_FIELDS.items()
+    })
+
+
+def link_meal_to_daily_log(meal):
+    """Attach a meal to its user's DailyLog for meal.date and add it to the totals"""
+    with transaction.atomic():
+        daily_log, _ = DailyLog.objects.get_or_create(user_id=meal.user_id, date=meal.date)
+        daily_log.meals.add(meal)
+        _adjust_daily_totals(DailyLog.objects.filter(pk=daily_log.pk), meal, 1)
+    return daily_log
+
+
+def unlink_meal_from_daily_logs(meal):
+    """
+    Detach a meal from every DailyLog it is linked to and subtract it from their totals.
+    meal must carry the macros currently stored in the database.
+    """
+    through = DailyLog.meals.through
+    with transaction.atomic():
+        links = through.objects.filter(mealentry_id=meal.pk)
+        log_ids = list(links.values_list('dailylog_id', flat=True))
+        if log_ids:
+            links.delete()
+            _adjust_daily_totals(DailyLog.objects.filter(pk__in=log_ids), meal, -1)
+    return log_ids
+
+
+def refresh_daily_totals(log_ids, chunk_size=500):
+    """
+    Recompute macro totals for the given DailyLogs from their linked meals,
+    with one correlated-subquery UPDATE per chunk. Used by bulk write paths,
+    where per-log F() increments would cost a query per log.
+    """
+    log_ids = list(log_ids)
+    through = DailyLog.meals.through
+    updates = {
+        total: Coalesce(
+            Subquery(
+                through.objects.filter(dailylog_id=OuterRef('pk'))
+                .values('dailylog_id')
+                .annotate(amount=Sum(f'mealentry__{field}'))
+                .values('amount')[:1]
+            ),
+            Value(0),
+        )
+        for field, total in MACRO_TOTAL_FIELDS.items()
+    }
+    for start in range(0, len(log_ids), chunk_size):
+        DailyLog.objects.filter(pk__in=log_ids[start:start + chunk_size]).update(**updates)
@@ -1,31 +1,51 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse, HttpResponseBadRequest
+from django.http import JsonResponse, HttpResponseBadRequest, StreamingHttpResponse, Http404
+from django.db.models import Q
 from django.contrib.auth.models import User
 from django.views.decorators.http import require_POST
 from django.utils import timezone
 from django.contrib import messages
 from django.contrib.auth import login
+from django.db import transaction
+from django.conf import settings
 
 
 from datetime import date
-import requests
+import io
 import os
 
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 
-from .models import MuscleGroup, Equipment, Exercise, DailyLog, Workout, WorkoutExercise, UserProfile, ExerciseProgress, StageWorkout, Picture, MealEntry
-from .serializers import WorkoutSerializer, AIWorkoutCreateSerializer, AIMealCreateSerializer, MealEntrySerializer
-from .utils import update_exercise_progress
+from .models import MuscleGroup, Equipment, Exercise, DailyLog, Workout, WorkoutExercise, UserProfile, StageWorkout, Picture, MealEntry, AgentJob, PersonalRecord, MuscleGroupVolume
+from .serializers import WorkoutSerializer, AIWorkoutCreateSerializer, AIMealCreateSerializer, MealEntrySerializer, AgentJobSerializer, PersonalRecordSerializer, workout_detail_queryset
+from .utils import update_exercise_progress, link_meal_to_daily_log, unlink_meal_from_daily_logs
 from .forms import RegisterForm
+from .agent_client import agent_http_stats
+from .agents import enqueue_agent_job, complete_agent_job, complete_agent_jobs
+from .ingest import bulk_create_workouts, bulk_create_meals
+from .importer import ImportFormatError, import_workouts
+from .images import enqueue_picture_variants
+from .media import PICTURE_FILE_FIELDS
+from .serving import file_response
+from .storage import picture_storage
+from .routers import allow_stale_reads, read_alias
+from .conditional import conditional_stats, etag_by_user_version
+from .idempotency import idempotent
+from .dashboard import get_home_context, home_cache_stats
+from .timeseries import BUCKETS, METRICS, progress_series
+from .rollups import ROLLUP_UPDATE_FIELDS, period_starts
+from .pagination import InvalidCursor, keyset_page
+from .export import DATASETS as EXPORT_DATASETS, FORMATS as EXPORT_FORMATS, encode_chunks, export_filename, export_lines
+from .catalog import get_exercise_info
+from .queries import daily_log_meals, daily_log_workouts, daily_logs, progress_exercise_choices, recent_progress, recent_workouts
 
 
-WORKOUT_AGENT_URL = 'http://143.198.113.171:5678/webhook/workout-agent'
-MEAL_AGENT_URL = 'http://143.198.113.171:5678/webhook/meal-agent'
-
 
 def register(request):
     if request.method == 'POST':
@@ -42,23 +62,25 @@ def register(request):
 
 @login_required
 def home(request):
-    daily_log, _ = DailyLog.objects.get_or_create(
-        user=request.user,
-        date=timezone.localdate()
-    )
-    workouts = daily_log.workouts.all().order_by('-date', '-created_at')
-    meals = daily_log.meals.all().order_by('-date', '-created_at')
-    pictures = Picture.objects.filter(user=request.user).order_by('-uploaded_at')[:9]
+    # served from the per-user versioned cache; rebuilt only after a write
+    context, hit = get_home_context(request.user, timezone.localdate())
+    response = render(request, "logger/home.html", context)
+    response['X-Dashboard-Cache'] = 'hit' if hit else 'miss'
+    return response
 
-    staged = StageWorkout.objects.filter(user=request.user).first()
-    staged_data = staged.data if staged else None
-    
-    return render(request, "logger/home.html", {
-        "daily_log": daily_log,
-        "workouts": workouts,
-        "meals": meals,
-        "staged_workout": staged_data,
-        "pictures": pictures
+
+@api_view(['GET'])
+def cache_stats(request):
+    """
+    Hit rates of this process's dashboard cache, share of API GETs answered
+    304 Not Modified, and the n8n client's pool/retry counters (staff only)
+    """
+    if not request.user.is_staff:
+        return Response({'error': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
+    return Response({
+        'home_dashboard': home_cache_stats.snapshot(),
+        'conditional_get': conditional_stats.snapshot(),
+        'agent_http': agent_http_stats(),
     })
 
 @login_required
@@ -69,7 +91,9 @@ def upload_picture(request):
     if not image_file:
         return JsonResponse({'error': 'No image provided'}, status=400)
 
-    Picture.objects.create(user=request.user, image=image_file)
+    picture = Picture.objects.create(user=request.user, image=image_file)
+    # resized variants are generated off the request thread
+    enqueue_picture_variants(picture)
     return redirect('home')
 
 @login_required
@@ -79,8 +103,30 @@ def delete_picture(request, pic_id):
     pic.delete()
     return redirect('home')
 
+@login_required
+def serve_media(request, name):
+    """
+    Serve a pump pic file to its owner with ETag/Last-Modified, 304s and byte
+    ranges; the body can be offloaded to nginx/Apache (see serving.py).
+    Ownership is one Picture query over the user's index.
+    """
+    owned = Q()
+    for field in PICTURE_FILE_FIELDS:
+        owned |= Q(**{field: name})
+    if not Picture.objects.filter(owned, user=request.user).exists():
+        raise Http404("No such picture")
+    try:
+        return file_response(request, picture_storage(), name)
+    except OSError:
+        raise Http404("No such picture")
+
 @api_view(['POST'])
 def trigger_agent(request):
+    """
+    Queue the user's input for the workout/meal agent and return 202 right away.
+    The n8n webhook call happens on the background dispatcher (see agents.py);
+    poll the returned status_url for the outcome.
+    """
     try:
         user_input = request.data.get('input', '')
         user_id = request.data.get('user_id', 1)
@@ -97,45 +143,54 @@ def trigger_agent(request):
 
         input_lower = user_input.lower()
         if any(word in input_lower for word in meal_keywords):
-            target_url = MEAL_AGENT_URL
             agent_type = "meal"
         else:
-            target_url = WORKOUT_AGENT_URL
             agent_type = "workout"
-        
-        # callback_url = "https://manlike-dextrously-aracely.ngrok-free.dev/api/create-workout-from-agent/"
-        
-        payload = {
-            'input': user_input,
-            'user_id': user_id,
-            'date': input_date,
-            'callback_url': f"http://www.moresore.com/api/create-{agent_type}-from-agent/"
-        }
-        
-        # Test 3: Try the network request with detailed error info
-        try:
-            response = requests.post(target_url, json=payload, timeout=10)  # Shorter timeout for testing
-            
-            return Response({
-                'message': f"{agent_type.capitalize()} agent triggered successfully!",
-                'n8n_status': response.status_code,
-                'n8n_response': response.text[:500],  # First 500 chars only
-                'payload_sent': payload
-            })
-            
-        except requests.exceptions.ConnectTimeout:
-            return Response({'error': 'Connection timeout to n8n'}, status=500)
-        except requests.exceptions.ConnectionError as e:
-            return Response({'error': f'Connection error to n8n: {str(e)}'}, status=500)
-        except requests.exceptions.RequestException as e:
-            return Response({'error': f'Request error: {str(e)}'}, status=500)
-            
+
+        with transaction.atomic():
+            job = AgentJob.objects.create(
+                user=User.objects.filter(pk=user_id).first(),
+                agent_type=agent_type,
+                payload={},
+            )
+            # n8n echoes job_id back to the callback so the job can be linked to its result
+            job.payload = {
+                'input': user_input,
+                'user_id': user_id,
+                'date': input_date,
+                'job_id': job.pk,
+                'callback_url': f"http://www.moresore.com/api/create-{agent_type}-from-agent/"
+            }
+            job.save(update_fields=['payload'])
+            enqueue_agent_job(job)
+
+        return Response({
+            'message': f"{agent_type.capitalize()} agent request queued.",
+            'job_id': job.pk,
+            'status': job.status,
+            'status_url': reverse('agent_job_status', args=[job.pk]),
+        }, status=status.HTTP_202_ACCEPTED)
+
     except Exception as e:
         return Response({'error': f'Unexpected error: {str(e)}'}, status=500)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def agent_job_status(request, job_id):
+    """
+    Report the state of one of the current user's agent requests and link the
+    workout or meal it produced. Other users' jobs are reported as not found.
+    """
+    job = AgentJob.objects.filter(pk=job_id, user=request.user).first()
+    if job is None:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(AgentJobSerializer(job).data)
     
 
 @csrf_exempt
 @api_view(['POST'])
+@idempotent('create_workout_from_agent')
 def create_workout_from_agent(request):
     """
     This endpoint receives the processed workout data back from n8n and creates the actual workout in the database
@@ -156,10 +211,12 @@ def create_workout_from_agent(request):
                 date=workout.date,
             )
             daily_log.workouts.add(workout)
-            workout_serialized = WorkoutSerializer(workout)
             update_exercise_progress(workout.user, workout)
+            workout_serialized = WorkoutSerializer(workout_detail_queryset().get(pk=workout.pk))
+            complete_agent_job(workout_data.get('job_id'), workout=workout)
             return Response({'message': 'Workout created successfully', 'workout': workout_serialized.data}, status=status.HTTP_201_CREATED)
         else:
+            complete_agent_job(workout_data.get('job_id'), error=serializer.errors)
             return Response({'error': 'Invalid data', 'details': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': 'Failed to create workout', 'details': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -188,6 +245,7 @@ def discard_staged_workout(request):
     
 @csrf_exempt
 @api_view(['POST'])
+@idempotent('create_meal_from_agent')
 def create_meal_from_agent(request):
     """
     Receives structured meal data from n8n and creates a MealEntry + links to DailyLog.
@@ -196,27 +254,117 @@ def create_meal_from_agent(request):
         meal_data = request.data
         serializer = AIMealCreateSerializer(data=meal_data)
         if serializer.is_valid():
-            meal = serializer.save()
+            with transaction.atomic():
+                meal = serializer.save()
 
-            # meal_date = timezone.localdate()
-            # invalid_dates = {None, date(1900,1,1), date(2024,1,1)}
-            # if meal.date not in invalid_dates:
-            #     meal_date = meal.date
+                # meal_date = timezone.localdate()
+                # invalid_dates = {None, date(1900,1,1), date(2024,1,1)}
+                # if meal.date not in invalid_dates:
+                #     meal_date = meal.date
 
-            daily_log, _ = DailyLog.objects.get_or_create(
-                user=meal.user, 
-                date=meal.date
-            )
-            daily_log.meals.add(meal)
-            daily_log.save()
+                # links the meal and bumps the DailyLog totals with F() increments
+                link_meal_to_daily_log(meal)
             meal_serialized = MealEntrySerializer(meal)
+            complete_agent_job(meal_data.get('job_id'), meal=meal)
             return Response({'message': 'Meal created successfully'}, status=201)
         else:
+            complete_agent_job(meal_data.get('job_id'), error=serializer.errors)
             return Response({'error': 'Invalid data', 'details': serializer.errors}, status=400)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
+@csrf_exempt
+@api_view(['POST'])
+@idempotent('create_batch_from_agent')
+def create_batch_from_agent(request):
+    """
+    Batch version of create_workout_from_agent / create_meal_from_agent for
+    backfills and n8n queue replays. Accepts {"workouts": [...], "meals": [...]}
+    (or a bare array of workouts) with the same item payloads, validates every item, resolves users and
+    catalog entries once and bulk-inserts all valid items in one transaction.
+    Returns per-item results in input order.
+    """
+    if isinstance(request.data, list):
+        # a bare array is a batch of workouts
+        workouts_data, meals_data = request.data, []
+    elif isinstance(request.data, dict):
+        workouts_data = request.data.get('workouts') or []
+        meals_data = request.data.get('meals') or []
+    else:
+        return Response({'error': 'Expected an object or an array of workouts'}, status=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(workouts_data, list) or not isinstance(meals_data, list):
+        return Response({'error': 'workouts and meals must be arrays'}, status=status.HTTP_400_BAD_REQUEST)
+    max_items = getattr(settings, 'AGENT_BATCH_MAX_ITEMS', 10000)
+    if len(workouts_data) + len(meals_data) > max_items:
+        return Response({'error': f'At most {max_items} items per batch'}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = {'workouts': [None] * len(workouts_data), 'meals': [None] * len(meals_data)}
+    valid = {'workouts': [], 'meals': []}
+    for kind, items, serializer_class in (
+        ('workouts', workouts_data, AIWorkoutCreateSerializer),
+        ('meals', meals_data, AIMealCreateSerializer),
+    ):
+        for index, item in enumerate(items):
+            serializer = serializer_class(data=item)
+            if serializer.is_valid():
+                valid[kind].append((index, item, serializer.validated_data))
+            else:
+                results[kind][index] = {'status': 400, 'error': 'Invalid data', 'details': serializer.errors}
+
+    users = User.objects.in_bulk({
+        data.get('user_id', 1) for kind in valid for _, _, data in valid[kind]
+    })
+    # unknown users are answered like the single-item endpoints: a workout
+    # falls back to the first user, a meal fails
+    missing_workout_user = any(data.get('user_id', 1) not in users for _, _, data in valid['workouts'])
+    fallback_user = User.objects.first() if missing_workout_user else None
+    entries = {'workouts': [], 'meals': []}
+    for kind in valid:
+        for index, item, data in valid[kind]:
+            user = users.get(data.get('user_id', 1))
+            if user is None and kind == 'workouts':
+                user = fallback_user
+            if user is None:
+                results[kind][index] = {'status': 500, 'error': 'User matching query does not exist.'}
+            else:
+                entries[kind].append((index, item, user, data))
+
+    try:
+        with transaction.atomic():
+            workouts = bulk_create_workouts([(user, data) for _, _, user, data in entries['workouts']])
+            meals = bulk_create_meals([(user, data) for _, _, user, data in entries['meals']])
+
+            job_outcomes = {}
+            for (index, item, _, _), workout in zip(entries['workouts'], workouts):
+                results['workouts'][index] = {'status': 201, 'id': workout.pk}
+                if item.get('job_id'):
+                    job_outcomes[item['job_id']] = {'workout': workout}
+            for (index, item, _, _), meal in zip(entries['meals'], meals):
+                results['meals'][index] = {'status': 201, 'id': meal.pk}
+                if item.get('job_id'):
+                    job_outcomes[item['job_id']] = {'meal': meal}
+            complete_agent_jobs(job_outcomes)
+    except Exception as e:
+        return Response({'error': 'Failed to ingest batch', 'details': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    created = len(workouts) + len(meals)
+    total = len(workouts_data) + len(meals_data)
+    if created == total:
+        response_status = status.HTTP_201_CREATED
+    elif created:
+        response_status = status.HTTP_207_MULTI_STATUS
+    else:
+        response_status = status.HTTP_400_BAD_REQUEST
+    return Response({'created': created, 'failed': total - created, 'results': results}, status=response_status)
+
+
+def _recent_workouts_owner(request):
+    user_id = str(request.GET.get('user_id', 1))
+    return int(user_id) if user_id.isdigit() else None
+
+
 @api_view(['GET'])
+@etag_by_user_version(user_id=_recent_workouts_owner)
 def get_recent_workouts(request):
     """
     Helper endpoint to get recent workouts (for your chatbot to show)
@@ -224,7 +372,7 @@ def get_recent_workouts(request):
     user_id = request.GET.get('user_id', 1)
     try:
         user = User.objects.get(id=user_id)
-        workouts = user.workout_set.all()[:5]  # Last 5 workouts
+        workouts = recent_workouts(user)  # Last 5 workouts
         serializer = WorkoutSerializer(workouts, many=True)
         return Response(serializer.data)
     except User.DoesNotExist:
@@ -232,6 +380,195 @@ def get_recent_workouts(request):
                       status=status.HTTP_404_NOT_FOUND)
     
 
+@allow_stale_reads
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@etag_by_user_version
+def workout_history(request):
+    """
+    The current user's workouts, newest first, one keyset page at a time:
+    ?cursor=<next_cursor>&page_size=N&start=YYYY-MM-DD&end=YYYY-MM-DD.
+    Each page costs the same few queries however deep it is.
+    """
+    try:
+        page_size = min(max(int(request.GET.get('page_size', 20)), 1), 100)
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+    except ValueError:
+        return Response({'error': 'Invalid page_size, start or end'}, status=status.HTTP_400_BAD_REQUEST)
+
+    workouts = Workout.objects.filter(user=request.user)
+    if start:
+        workouts = workouts.filter(date__gte=start)
+    if end:
+        workouts = workouts.filter(date__lte=end)
+    try:
+        page, next_cursor = keyset_page(workouts.only('id', 'date', 'created_at'), request.GET.get('cursor'), page_size)
+    except InvalidCursor:
+        return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # details are loaded by primary key for just this page, so the GROUP BY in
+    # workout_detail_queryset never runs over the rest of the history
+    details = workout_detail_queryset(Workout.objects.filter(pk__in=[w.pk for w in page])).in_bulk()
+    serializer = WorkoutSerializer([details[w.pk] for w in page], many=True)
+    return Response({'results': serializer.data, 'next_cursor': next_cursor})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@etag_by_user_version
+def personal_records_api(request):
+    """
+    The current user's personal records, optionally for one ?exercise=<id>.
+    Reads the maintained PersonalRecord rows, at most three per exercise.
+    """
+    records = PersonalRecord.objects.filter(user=request.user).order_by('exercise_id', 'record_type')
+    exercise_id = request.GET.get('exercise')
+    if exercise_id:
+        if not exercise_id.isdigit():
+            return Response({'error': 'Invalid exercise'}, status=status.HTTP_400_BAD_REQUEST)
+        records = records.filter(exercise_id=exercise_id)
+    return Response(PersonalRecordSerializer(records, many=True).data)
+
+
+@allow_stale_reads
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@etag_by_user_version
+def progress_series_api(request):
+    """
+    Time series for the progress charts: ?exercise=<id>&bucket=day|week|month
+    &start=YYYY-MM-DD&end=YYYY-MM-DD&max_points=N&metric=<name>.
+    Aggregated in SQL and downsampled to at most max_points points.
+    """
+    exercise_id = request.GET.get('exercise')
+    bucket = request.GET.get('bucket', 'week')
+    metric = request.GET.get('metric', 'total_volume')
+    if not exercise_id or not exercise_id.isdigit():
+        return Response({'error': 'exercise is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if bucket not in BUCKETS:
+        return Response({'error': f"bucket must be one of {', '.join(BUCKETS)}"}, status=status.HTTP_400_BAD_REQUEST)
+    if metric not in METRICS:
+        return Response({'error': f"metric must be one of {', '.join(METRICS)}"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+        max_points = min(max(int(request.GET.get('max_points', 200)), 3), 1000)
+    except ValueError:
+        return Response({'error': 'Invalid start, end or max_points'}, status=status.HTTP_400_BAD_REQUEST)
+
+    points, total = progress_series(
+        request.user, int(exercise_id), bucket=bucket, start=start, end=end, max_points=max_points, metric=metric
+    )
+    info = get_exercise_info(int(exercise_id))
+    return Response({
+        'exercise': {'id': int(exercise_id), 'name': info.name if info else None},
+        'bucket': bucket,
+        'metric': metric,
+        'total_buckets': total,
+        'points': points,
+    })
+
+
+@allow_stale_reads
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@etag_by_user_version
+def muscle_volume_api(request):
+    """
+    Muscle-group heatmap/trend data from the MuscleGroupVolume rollups:
+    ?period=week|month&start=YYYY-MM-DD&end=YYYY-MM-DD&metric=volume|sets|reps
+    &muscle_group=<id>. Returns one value per period for each muscle group.
+    """
+    period = request.GET.get('period', MuscleGroupVolume.WEEK)
+    metric = request.GET.get('metric', 'volume')
+    if period not in dict(MuscleGroupVolume.PERIOD_CHOICES):
+        return Response({'error': 'period must be week or month'}, status=status.HTTP_400_BAD_REQUEST)
+    if metric not in ROLLUP_UPDATE_FIELDS:
+        return Response({'error': f"metric must be one of {', '.join(ROLLUP_UPDATE_FIELDS)}"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+    except ValueError:
+        return Response({'error': 'Invalid start or end'}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = MuscleGroupVolume.objects.filter(user=request.user, period=period)
+    if start:
+        # include the period that contains start
+        rows = rows.filter(period_start__gte=dict(period_starts(start))[period])
+    if end:
+        rows = rows.filter(period_start__lte=end)
+    muscle_group = request.GET.get('muscle_group')
+    if muscle_group:
+        if not muscle_group.isdigit():
+            return Response({'error': 'Invalid muscle_group'}, status=status.HTTP_400_BAD_REQUEST)
+        rows = rows.filter(muscle_group_id=muscle_group)
+
+    values = rows.values_list('muscle_group_id', 'muscle_group__name', 'period_start', metric)
+    periods = sorted({row[2] for row in values})
+    index = {p: i for i, p in enumerate(periods)}
+    groups = {}
+    for mg_id, mg_name, period_start, value in values:
+        group = groups.setdefault(mg_id, {'id': mg_id, 'name': mg_name, 'values': [0.0] * len(periods), 'total': 0.0})
+        group['values'][index[period_start]] = round(value, 2)
+        group['total'] += value
+    muscle_groups = sorted(groups.values(), key=lambda g: -g['total'])
+    for group in muscle_groups:
+        group['total'] = round(group['total'], 2)
+
+    return Response({
+        'period': period,
+        'metric': metric,
+        'periods': [p.isoformat() for p in periods],
+        'muscle_groups': muscle_groups,
+    })
+
+
+@allow_stale_reads
+@login_required
+def export_data(request):
+    """
+    Stream the current user's history as a download:
+    ?dataset=workouts|exercises|meals|progress|all&format=csv|ndjson&gzip=1.
+    CSV takes a single dataset; NDJSON defaults to all of them.
+    """
+    fmt = request.GET.get('format', 'ndjson')
+    dataset = request.GET.get('dataset', 'all' if fmt == 'ndjson' else '')
+    compress = request.GET.get('gzip') in ('1', 'true')
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("format must be csv or ndjson")
+    datasets = list(EXPORT_DATASETS) if dataset == 'all' else [dataset]
+    if any(name not in EXPORT_DATASETS for name in datasets) or (fmt == 'csv' and len(datasets) != 1):
+        return HttpResponseBadRequest(f"dataset must be one of {', '.join(EXPORT_DATASETS)}" + (" or all" if fmt == 'ndjson' else ""))
+
+    # rows stream after the view returns, so pin the alias chosen for this request
+    lines = export_lines(datasets, fmt, user_ids=[request.user.pk], using=read_alias())
+    response = StreamingHttpResponse(
+        encode_chunks(lines, compress=compress),
+        content_type='application/gzip' if compress else EXPORT_FORMATS[fmt],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(datasets, fmt, compress)}"'
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def import_workouts_api(request):
+    """
+    Import a Strong/Hevy-style CSV export (multipart field "file") into the
+    current user's history. The upload is parsed as a stream and written in
+    chunked bulk transactions; returns row counts and rows/sec.
+    """
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        result = import_workouts(request.user, io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''))
+    except (ImportFormatError, UnicodeDecodeError) as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(result.as_dict(), status=status.HTTP_201_CREATED)
+
+
 @login_required
 def delete_workout(request, workout_id):
     """
@@ -255,14 +592,10 @@ def delete_meal(request, meal_id):
     Delete meal function and removes it from daily log
     """
     meal = get_object_or_404(MealEntry, id=meal_id, user=request.user)
-    daily_log = DailyLog.objects.filter(
-        user=request.user,
-        date=meal.date
-    ).first()
-
-    if daily_log:
-        daily_log.meals.remove(meal)
-    meal.delete()
+    with transaction.atomic():
+        # removes the meal from its daily log(s) and decrements their totals
+        unlink_meal_from_daily_logs(meal)
+        meal.delete()
     return redirect(request.META.get('HTTP_REFERER', 'home'))
 
     
@@ -293,6 +626,7 @@ def delete_meal(request, meal_id):
 #     }
 #     return render(request, "logger/view_logs_by_date.html", context)
 
+@allow_stale_reads
 @login_required
 def progress(request):
     """
@@ -304,39 +638,34 @@ def progress(request):
 
     # --- 1. Handle date picker for daily logs ---
     selected_date = request.GET.get("date", timezone.localdate().isoformat())
-    daily_log = DailyLog.objects.filter(user=request.user, date=selected_date).first()
+    daily_log = daily_logs(request.user, selected_date).first()
 
-    meals = daily_log.meals.all() if daily_log else []
-    workouts = daily_log.workouts.all() if daily_log else []
+    meals = daily_log_meals(daily_log) if daily_log else []
+    workouts = daily_log_workouts(daily_log) if daily_log else []
 
-    total_calories = sum(m.calories for m in meals)
-    total_protein = sum(m.protein for m in meals)
-    total_carbs = sum(m.carbs for m in meals)
-    total_fats = sum(m.fats for m in meals)
+    # totals are maintained incrementally on the DailyLog row
+    total_calories = daily_log.total_calories if daily_log else 0
+    total_protein = daily_log.total_protein if daily_log else 0
+    total_carbs = daily_log.total_carbs if daily_log else 0
+    total_fats = daily_log.total_fats if daily_log else 0
 
     # --- 2. Handle exercise progress filtering ---
+    # the selected exercise's chart and table are fetched lazily from
+    # progress_series_api, so only the recent overview is queried here
     selected_exercise_id = request.GET.get("exercise")
-    progresses = ExerciseProgress.objects.filter(user=request.user).select_related("exercise")
+    selected_exercise_name = None
 
     grouped_progress = defaultdict(list)
     if selected_exercise_id:
-        progresses = progresses.filter(exercise__id=selected_exercise_id)
-        exercise_name = progresses.first().exercise.name if progresses.exists() else None
-        grouped_progress[exercise_name] = list(progresses.order_by("date"))
+        info = get_exercise_info(int(selected_exercise_id)) if selected_exercise_id.isdigit() else None
+        selected_exercise_name = info.name if info else None
     else:
         # Default: show recent 5 exercises (optional)
-        recent = progresses.order_by("-date")[:50]
-        for p in recent:
+        for p in recent_progress(request.user):
             grouped_progress[p.exercise.name].append(p)
 
     # --- 3. Get exercise list for dropdown ---
-    all_exercises = (
-        ExerciseProgress.objects.filter(user=request.user)
-        .select_related("exercise")
-        .order_by("exercise__name")
-        .values_list("exercise__id", "exercise__name")
-        .distinct()
-    )
+    all_exercises = progress_exercise_choices(request.user)
 
     context = {
         # Daily log data
@@ -352,6 +681,7 @@ def progress(request):
         "grouped_progress": grouped_progress,
         "all_exercises": all_exercises,
         "selected_exercise_id": selected_exercise_id,
+        "selected_exercise_name": selected_exercise_name,
     }
 
     return render(request, "logger/progress.html", context)